@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the hot paths of parsing, filtering and building a graph.
+
+Each stage is run once to measure throughput and once more under tracemalloc
+to measure peak memory, so that tracing doesn't skew the throughput.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+# Make `bigquery_lineage` and `synthetic` importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bigquery_lineage.auditlog.auditlog import Auditlog, read_auditlog, read_lines
+from bigquery_lineage.auditlog.block_index import BlockIndex
+from bigquery_lineage.auditlog.dot_writer import write_dot
+from bigquery_lineage.auditlog.projection import loads, read_job_lineages
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.config import Config, ConfigFilters
+from synthetic import generate_auditlog  # pylint: disable=import-error
+
+# Exclusion rules in the shape of bql-config.yml.tmpl
+FILTERS = {
+    "excluded_principal_emails": ["@example0\\.com", "^robot-"],
+    "excluded_tables": [
+        {"dataset_regexp": "^_.*$"},
+        {"dataset_regexp": "^tmp.*$"},
+        {"dataset_regexp": "^temp.*$"},
+        {"dataset_regexp": "looker"},
+        {"table_regexp": "^tmp_"},
+        {"table_regexp": "^temp_"},
+        {"table_regexp": "^stg_"},
+        {"table_regexp": "^__TABLES__$"},
+        {"table_regexp": "^z_"},
+        {"project_regexp": "^sandbox-"},
+    ],
+}
+
+
+class Stage:
+    """A stage to benchmark.
+
+    `run` returns a dict of counts, such as lines and edges, to compute throughput with.
+    """
+
+    def __init__(self, name: str, run: Callable[[], Dict[str, int]]):
+        self.name = name
+        self.run = run
+
+    def measure(self, memory: bool = True) -> Dict[str, Any]:
+        start = time.perf_counter()
+        counts = self.run()
+        elapsed = time.perf_counter() - start
+        result = {"stage": self.name, "seconds": elapsed}
+        for unit, count in counts.items():
+            result[unit] = count
+            result["{}/s".format(unit)] = count / elapsed if elapsed > 0 else float("inf")
+        if memory:
+            tracemalloc.start()
+            self.run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["peak_memory_mb"] = peak / 1024 / 1024
+        return result
+
+
+def build_config() -> Config:
+    return Config(start="2020-01-01", end="2020-12-31", filters=ConfigFilters.parse(FILTERS))
+
+
+def build_stages(file: str) -> List[Stage]:
+    """Build stages over a file of auditlog."""
+    config = build_config()
+    tables: List[Tuple[str, str, str]] = []
+    for job_lineage in read_job_lineages(file=file):
+        tables.append(job_lineage.destination)
+        tables.extend(job_lineage.sources)
+    builder = PydotBuilderV1(config=config)
+    for job_lineage in read_job_lineages(file=file):
+        builder.update_with_job_lineage(job_lineage=job_lineage)
+
+    def decode_json():
+        lines = 0
+        for line in read_lines(file=file):
+            loads(line)
+            lines += 1
+        return {"lines": lines}
+
+    def parse_auditlog():
+        lines = 0
+        for line in read_lines(file=file):
+            Auditlog.parse(json.loads(line))
+            lines += 1
+        return {"lines": lines}
+
+    def read_auditlog_stage():
+        lines = sum(1 for _ in read_auditlog(file=file))
+        return {"lines": lines}
+
+    def read_job_lineages_stage():
+        lines = 0
+        edges = 0
+        for job_lineage in read_job_lineages(file=file):
+            lines += 1
+            edges += len(job_lineage.sources)
+        return {"lines": lines, "edges": edges}
+
+    def build_block_index():
+        block_index = BlockIndex.build(file)
+        return {"lines": sum(x.lines for x in block_index.blocks)}
+
+    def is_excluded_table_uncached():
+        filters = ConfigFilters(excluded_tables=config.filters.excluded_tables)
+        for (project, dataset, table) in tables:
+            any(x.match(project=project, dataset=dataset, table=table) for x in filters.excluded_tables)
+        return {"tables": len(tables)}
+
+    def is_excluded_table():
+        filters = ConfigFilters(excluded_tables=config.filters.excluded_tables)
+        for (project, dataset, table) in tables:
+            filters.is_excluded_table(project=project, dataset=dataset, table=table)
+        return {"tables": len(tables)}
+
+    def update_builder():
+        stage_builder = PydotBuilderV1(config=build_config())
+        lines = 0
+        for job_lineage in read_job_lineages(file=file):
+            stage_builder.update_with_job_lineage(job_lineage=job_lineage)
+            lines += 1
+        return {"lines": lines, "edges": len(stage_builder.bigquery_references)}
+
+    def build_lineage_graph():
+        builder.build_lineage_graph()
+        return {"edges": len(builder.bigquery_references)}
+
+    lineage_graph = builder.build_lineage_graph()
+
+    def render_graph():
+        builder.render(lineage_graph)
+        return {"edges": lineage_graph.num_edges()}
+
+    def write_dot_stage():
+        with open(os.devnull, "w") as fp:
+            write_dot(lineage_graph=lineage_graph, fp=fp)
+        return {"edges": lineage_graph.num_edges()}
+
+    def build_graph():
+        builder.build()
+        return {"edges": len(builder.bigquery_references)}
+
+    return [
+        Stage("json.loads", decode_json),
+        Stage("Auditlog.parse", parse_auditlog),
+        Stage("read_auditlog", read_auditlog_stage),
+        Stage("read_job_lineages", read_job_lineages_stage),
+        Stage("BlockIndex.build", build_block_index),
+        Stage("ExcludedTable.match", is_excluded_table_uncached),
+        Stage("ConfigFilters.is_excluded_table", is_excluded_table),
+        Stage("PydotBuilderV1.update", update_builder),
+        Stage("PydotBuilderV1.build_lineage_graph", build_lineage_graph),
+        Stage("PydotBuilderV1.render", render_graph),
+        Stage("PydotBuilderV1.build", build_graph),
+        Stage("write_dot", write_dot_stage),
+    ]
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Format results as a table."""
+    header = "{:<36} {:>10} {:>14} {:>14} {:>14} {:>10}".format(
+        "stage", "seconds", "lines/s", "edges/s", "tables/s", "peak MB")
+    rows = [header, "-" * len(header)]
+    for result in results:
+        rows.append("{:<36} {:>10.3f} {:>14} {:>14} {:>14} {:>10}".format(
+            result["stage"],
+            result["seconds"],
+            "{:,.0f}".format(result["lines/s"]) if "lines/s" in result else "-",
+            "{:,.0f}".format(result["edges/s"]) if "edges/s" in result else "-",
+            "{:,.0f}".format(result["tables/s"]) if "tables/s" in result else "-",
+            "{:,.1f}".format(result["peak_memory_mb"]) if "peak_memory_mb" in result else "-"))
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input", default=None,
+                        help="a file of auditlog. A synthetic file is generated, if not given.")
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--datasets", type=int, default=10)
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--fan_in", type=int, default=3)
+    parser.add_argument("--stages", nargs="*", default=None, help="names of stages to run")
+    parser.add_argument("--skip_memory", action="store_true", help="skip measuring peak memory")
+    parser.add_argument("--output", default=None, help="a JSON file to write results to")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = args.input
+        if file is None:
+            file = os.path.join(tmp_dir, "auditlog.json")
+            generate_auditlog(path=file, lines=args.lines, projects=args.projects,
+                              datasets=args.datasets, tables=args.tables, fan_in=args.fan_in)
+        results = []
+        for stage in build_stages(file=file):
+            if args.stages and stage.name not in args.stages:
+                continue
+            results.append(stage.measure(memory=not args.skip_memory))
+            print(format_results(results[-1:]).splitlines()[-1], flush=True)
+
+    print()
+    print(format_results(results))
+    if args.output is not None:
+        with open(args.output, "w") as fp:
+            json.dump({"args": vars(args), "results": results}, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Generate synthetic audit logs in the shape of a jobCompletedEvent of a query job."""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+# Make `bigquery_lineage` importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bigquery_lineage.utils import get_project_root, load_json
+
+TEMPLATE_PATH = os.path.join(
+    get_project_root(), "tests", "resources", "auditlog", "job_completed_event", "query.json")
+
+# Some of names match typical excluded tables such as `^tmp_` and `^stg_`.
+DATASET_PREFIXES = ["raw", "stg_", "mart", "tmp_", "analytics"]
+TABLE_PREFIXES = ["events", "orders", "users", "stg_orders", "tmp_report", "_sessions"]
+
+_PLACEHOLDERS = ["__TIMESTAMP__", "__EMAIL__", "__DESTINATION__", "__REFERENCED_TABLES__"]
+
+
+def build_line_template() -> Tuple[List[str], List[str]]:
+    """Build a line of JSON split at placeholders, so that lines can be rendered cheaply.
+
+    Returns:
+        the parts of the line and the placeholders between them in order of appearance.
+    """
+    block = load_json(TEMPLATE_PATH)
+    block["timestamp"] = _PLACEHOLDERS[0]
+    block["protopayload_auditlog"]["authenticationInfo"]["principalEmail"] = _PLACEHOLDERS[1]
+    job = block["protopayload_auditlog"]["servicedata_v1_bigquery"]["jobCompletedEvent"]["job"]
+    job["jobConfiguration"]["query"]["destinationTable"] = _PLACEHOLDERS[2]
+    job["jobStatistics"]["referencedTables"] = _PLACEHOLDERS[3]
+    text = json.dumps(block)
+    placeholders = sorted(_PLACEHOLDERS, key=lambda x: text.index('"{}"'.format(x)))
+    parts = []
+    for placeholder in placeholders:
+        before, text = text.split('"{}"'.format(placeholder))
+        parts.append(before)
+    parts.append(text)
+    return parts, placeholders
+
+
+def build_tables(projects: int, datasets: int, tables: int) -> List[Tuple[str, str, str]]:
+    """Build (project, dataset, table) of the synthetic estate."""
+    keys = []
+    for p in range(projects):
+        for d in range(datasets):
+            dataset = "{}{}".format(DATASET_PREFIXES[d % len(DATASET_PREFIXES)], d)
+            for t in range(tables):
+                table = "{}{}".format(TABLE_PREFIXES[t % len(TABLE_PREFIXES)], t)
+                keys.append(("project-{}".format(p), dataset, table))
+    return keys
+
+
+def to_table_reference(key: Tuple[str, str, str]) -> dict:
+    return {"projectId": key[0], "datasetId": key[1], "tableId": key[2]}
+
+
+def generate_auditlog(
+        path: str,
+        lines: int,
+        projects: int = 10,
+        datasets: int = 10,
+        tables: int = 100,
+        fan_in: int = 3,
+        principals: int = 20,
+        seed: int = 0) -> int:
+    """Generate a file of synthetic audit logs.
+
+    Args:
+        path: path to a file to write
+        lines: the number of lines
+        projects: the number of projects
+        datasets: the number of datasets per project
+        tables: the number of tables per dataset
+        fan_in: the maximum number of referenced tables per job
+        principals: the number of principal emails
+        seed: a random seed
+
+    Returns:
+        the number of bytes written
+    """
+    rng = random.Random(seed)
+    parts, placeholders = build_line_template()
+    keys = build_tables(projects=projects, datasets=datasets, tables=tables)
+    references = [json.dumps(to_table_reference(key)) for key in keys]
+    emails = [json.dumps("user{}@example{}.com".format(i, i % 3)) for i in range(principals)]
+    start = datetime(year=2020, month=1, day=1, tzinfo=timezone.utc)
+    step = timedelta(seconds=max(1, 365 * 24 * 3600 // max(lines, 1)))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    size = 0
+    with open(path, "w") as fp:
+        for i in range(lines):
+            timestamp = json.dumps((start + step * i).isoformat())
+            destination = rng.randrange(len(keys))
+            sources = rng.sample(range(len(keys)), rng.randint(1, max(fan_in, 1)))
+            values = {
+                "__TIMESTAMP__": timestamp,
+                "__EMAIL__": rng.choice(emails),
+                "__DESTINATION__": references[destination],
+                "__REFERENCED_TABLES__": "[{}]".format(
+                    ", ".join(references[x] for x in sources if x != destination)),
+            }
+            chunks = [parts[0]]
+            for placeholder, part in zip(placeholders, parts[1:]):
+                chunks.append(values[placeholder])
+                chunks.append(part)
+            chunks.append("\n")
+            line = "".join(chunks)
+            fp.write(line)
+            size += len(line)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", required=True, help="path to a file to write")
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--datasets", type=int, default=10)
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--fan_in", type=int, default=3)
+    parser.add_argument("--principals", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    size = generate_auditlog(
+        path=args.output, lines=args.lines, projects=args.projects, datasets=args.datasets,
+        tables=args.tables, fan_in=args.fan_in, principals=args.principals, seed=args.seed)
+    print("Wrote {} lines ({} bytes) to {}".format(args.lines, size, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,116 @@
 from __future__ import absolute_import, division, print_function
 
 import json
+import mmap
+import os
 from dataclasses import dataclass
-from typing import Dict, Any, List
-
-
-def read_auditlog(file: str):
-    """Read a file of auditlog."""
-    with open(file, "r") as fp:
-        for line in fp:
-            yield Auditlog.parse(json.loads(line))
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from bigquery_lineage.compression import get_compression, iter_decompressed_lines
+from bigquery_lineage.utils import parse_timestamp
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+PARQUET_SUFFIX = ".parquet"
+
+
+def read_auditlog(file: str, start: int = 0, end: int = None):
+    """Read a file of auditlog.
+
+    Args:
+        file: path to a newline-delimited JSON file, which may be compressed with gzip or zstd, or a Parquet file
+        start: byte offset of the first line to read. It has to be at a frame of a compressed file.
+        end: byte offset to stop reading at. It reads until the end of the file, if None.
+    """
+    if is_parquet_file(file):
+        for block in read_parquet_blocks(file=file):
+            yield Auditlog.parse(block)
+        return
+    for line in read_lines(file=file, start=start, end=end):
+        yield Auditlog.parse(json.loads(line))
+
+
+def is_parquet_file(file: str) -> bool:
+    """Check if a file of auditlog is a Parquet file."""
+    return file.endswith(PARQUET_SUFFIX)
+
+
+def read_parquet_blocks(file: str) -> Iterator[Dict[str, Any]]:
+    """Read rows of a Parquet file as dicts, batch by batch."""
+    if pq is None:
+        raise ImportError("pyarrow is required to read {}".format(file))
+    parquet_file = pq.ParquetFile(file)
+    for batch in parquet_file.iter_batches():
+        for block in batch.to_pylist():
+            yield block
+
+
+def read_lines(file: str, start: int = 0, end: int = None):
+    """Read non-empty lines as bytes in a byte range of a file.
+
+    A compressed file is decompressed as a stream from a frame at `start`.
+    """
+    compression = get_compression(file)
+    if compression is not None:
+        for _, line in iter_decompressed_lines(file=file, compression=compression, start=start, end=end):
+            if line.strip():
+                yield line
+        return
+    for _, line in iter_lines_with_offsets(file=file, start=start, end=end):
+        yield line
+
+
+def iter_lines_with_offsets(file: str, start: int = 0, end: int = None) -> Iterator[Tuple[int, bytes]]:
+    """Iterate non-empty lines in a byte range of a memory-mapped file with their byte offsets.
+
+    Lines are sliced out of the mapping without going through buffered file objects,
+    and a re-run scan is served from the page cache.
+    A line which starts before `end` is read to its end.
+    """
+    if os.path.getsize(file) == 0:
+        return
+    with open(file, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        end = size if end is None else min(end, size)
+        position = start
+        while position < end:
+            newline = mm.find(b"\n", position)
+            next_position = size if newline < 0 else newline + 1
+            line = mm[position:next_position]
+            if line.strip():
+                yield position, line
+            position = next_position
+
+
+def split_auditlog_file(file: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split a file of auditlog into byte ranges aligned to line boundaries.
+
+    Args:
+        file: path to a newline-delimited JSON file
+        chunk_size: approximate size of each byte range
+
+    Returns:
+        list of (start, end) byte offsets which can be passed to `read_auditlog`.
+        A Parquet file isn't split, because it is read as a whole.
+        A compressed file is split only at its frames with a block index.
+    """
+    file_size = os.path.getsize(file)
+    if is_parquet_file(file) or get_compression(file) is not None:
+        return [(0, file_size)]
+    ranges = []
+    with open(file, "rb") as fp:
+        start = 0
+        while start < file_size:
+            fp.seek(min(start + max(chunk_size, 1), file_size))
+            # Move forward to the next line boundary.
+            fp.readline()
+            end = min(fp.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return ranges
 
 
 @dataclass()
@@ -132,6 +233,21 @@ class JobCompleteEvent:
         )
 
 
+@dataclass()
+class JobInsertResponse:
+    """An insert response of a job, whose resource has the same configuration and statistics as a completed one."""
+    jobConfiguration: JobCompleteEvent.JobConfiguration = None
+    jobStatistics: JobCompleteEvent.JobStatistics = None
+
+    @classmethod
+    def parse(cls, block: Dict[str, Any]):
+        resource = block.get("resource") or {}
+        return JobInsertResponse(
+            jobConfiguration=JobCompleteEvent.JobConfiguration.parse(resource.get("jobConfiguration") or {}),
+            jobStatistics=JobCompleteEvent.JobStatistics.parse(resource.get("jobStatistics") or {}),
+        )
+
+
 @dataclass()
 class AuthenticationInfo:
     principalEmail: str
@@ -146,6 +262,7 @@ class AuthenticationInfo:
 @dataclass()
 class ServicedataV1Bigquery:
     jobCompletedEvent: JobCompleteEvent = None
+    jobInsertResponse: JobInsertResponse = None
 
     @classmethod
     def parse(cls, block: Dict[str, Any]):
@@ -153,8 +270,10 @@ class ServicedataV1Bigquery:
                                if "jobCompletedEvent" in block.keys()
                                   and block["jobCompletedEvent"] is not None
                                else {})
+        job_insert_response = block.get("jobInsertResponse") or {}
         return ServicedataV1Bigquery(
             jobCompletedEvent=JobCompleteEvent.parse(job_completed_event),
+            jobInsertResponse=JobInsertResponse.parse(job_insert_response),
         )
 
 
@@ -189,10 +308,21 @@ class Resource:
 class Auditlog:
     resource: Resource = None
     protopayload_auditlog: ProtopayloadAuditlog = None
+    timestamp: str = None
 
     @classmethod
     def parse(cls, block: Dict[str, Any]):
         return Auditlog(
             resource=Resource.parse(block["resource"]),
             protopayload_auditlog=ProtopayloadAuditlog.parse(block["protopayload_auditlog"]),
+            timestamp=block.get("timestamp", None),
         )
+
+    def get_unix_timestamp(self) -> Optional[float]:
+        """Get the timestamp of the log entry as UNIX time, or the end time of the job without it."""
+        timestamp = parse_timestamp(self.timestamp)
+        if timestamp is None and self.protopayload_auditlog is not None:
+            servicedata_v1_bigquery = self.protopayload_auditlog.servicedata_v1_bigquery
+            timestamp = parse_timestamp(servicedata_v1_bigquery.jobCompletedEvent.jobStatistics.endTime
+                                        or servicedata_v1_bigquery.jobInsertResponse.jobStatistics.endTime)
+        return timestamp.timestamp() if timestamp is not None else None
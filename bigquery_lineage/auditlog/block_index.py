@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional, Tuple
+
+from bigquery_lineage.auditlog.auditlog import is_parquet_file, iter_lines_with_offsets, read_parquet_blocks
+from bigquery_lineage.auditlog.projection import get_unix_timestamp, loads
+from bigquery_lineage.auditlog.time_index import TimeWindow
+from bigquery_lineage.compression import get_compression, iter_decompressed_lines
+
+BLOCK_INDEX_SUFFIX = ".blockindex.json"
+BLOCK_INDEX_VERSION = 1
+
+# 4MB
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def get_block_index_path(file: str, cache_dir: str = None) -> str:
+    """Get the path to the block index of a file of auditlog.
+
+    It is a sidecar file next to the file, or a file named after the hash of its absolute path in a cache directory.
+    """
+    if cache_dir is None:
+        return file + BLOCK_INDEX_SUFFIX
+    key = hashlib.sha1(os.path.abspath(file).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + BLOCK_INDEX_SUFFIX)
+
+
+class Block(NamedTuple):
+    """A byte range of whole lines in a file of auditlog."""
+    start: int
+    end: int
+    lines: int
+    # UNIX time of the log entries in the block
+    min_timestamp: Optional[float] = None
+    max_timestamp: Optional[float] = None
+
+
+@dataclass
+class BlockIndex:
+    """An index of blocks of lines with their byte ranges and time ranges.
+
+    It is persisted in a sidecar file or in a cache directory,
+    and it is valid as long as the size and the mtime of the file don't change.
+    A Parquet file has a single block, because it is read as a whole.
+    Blocks of a compressed file are byte ranges of whole frames which start at lines.
+    """
+    size: int
+    mtime: float
+    blocks: List[Block]
+
+    @classmethod
+    def build(cls, file: str, block_size: int = DEFAULT_BLOCK_SIZE):
+        """Build a block index by scanning a file of auditlog."""
+        stat = os.stat(file)
+        if is_parquet_file(file):
+            timestamps = [get_unix_timestamp(block) for block in read_parquet_blocks(file=file)]
+            blocks = [make_block(0, stat.st_size, timestamps)] if timestamps else []
+            return BlockIndex(size=stat.st_size, mtime=stat.st_mtime, blocks=blocks)
+
+        compression = get_compression(file)
+        if compression is not None:
+            # Only the first line of a frame can start a block.
+            lines = ((offset, line) for offset, line
+                     in iter_decompressed_lines(file=file, compression=compression) if line.strip())
+        else:
+            lines = iter_lines_with_offsets(file=file)
+        blocks = []
+        start = 0
+        timestamps = []
+        for offset, line in lines:
+            if offset is not None and offset - start >= block_size and timestamps:
+                blocks.append(make_block(start, offset, timestamps))
+                start = offset
+                timestamps = []
+            timestamps.append(get_unix_timestamp(loads(line)))
+        if timestamps:
+            blocks.append(make_block(start, stat.st_size, timestamps))
+        return BlockIndex(size=stat.st_size, mtime=stat.st_mtime, blocks=blocks)
+
+    @classmethod
+    def load(cls, file: str, cache_dir: str = None):
+        """Load the block index of a file. It returns None, if it doesn't exist or it is stale."""
+        index_path = get_block_index_path(file, cache_dir=cache_dir)
+        if not os.path.isfile(index_path):
+            return None
+        with open(index_path, "r") as fp:
+            block = json.load(fp)
+        stat = os.stat(file)
+        if (block.get("version") != BLOCK_INDEX_VERSION
+                or block["size"] != stat.st_size or block["mtime"] != stat.st_mtime):
+            return None
+        return BlockIndex(
+            size=block["size"],
+            mtime=block["mtime"],
+            blocks=[Block(*x) for x in block["blocks"]],
+        )
+
+    def save(self, file: str, cache_dir: str = None) -> str:
+        """Save the block index of a file atomically."""
+        index_path = get_block_index_path(file, cache_dir=cache_dir)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = "{}.tmp".format(index_path)
+        with open(tmp_path, "w") as fp:
+            json.dump({
+                "version": BLOCK_INDEX_VERSION,
+                "size": self.size,
+                "mtime": self.mtime,
+                "blocks": [list(x) for x in self.blocks],
+            }, fp)
+        os.replace(tmp_path, index_path)
+        return index_path
+
+    @property
+    def min_timestamp(self) -> Optional[float]:
+        return min((x.min_timestamp for x in self.blocks if x.min_timestamp is not None), default=None)
+
+    @property
+    def max_timestamp(self) -> Optional[float]:
+        return max((x.max_timestamp for x in self.blocks if x.max_timestamp is not None), default=None)
+
+    def overlaps(self, time_window: TimeWindow) -> bool:
+        return any(time_window.overlaps(x.min_timestamp, x.max_timestamp) for x in self.blocks)
+
+    def get_ranges(self, chunk_size: int, time_window: TimeWindow = None) -> List[Tuple[int, int]]:
+        """Get disjoint byte ranges of blocks in a time window.
+
+        Adjacent blocks are coalesced into a range up to about `chunk_size` bytes.
+        """
+        time_window = TimeWindow() if time_window is None else time_window
+        ranges = []
+        for x in self.blocks:
+            if not time_window.overlaps(x.min_timestamp, x.max_timestamp):
+                continue
+            if ranges and ranges[-1][1] == x.start and x.end - ranges[-1][0] <= max(chunk_size, 1):
+                ranges[-1] = (ranges[-1][0], x.end)
+            else:
+                ranges.append((x.start, x.end))
+        return ranges
+
+
+def make_block(start: int, end: int, timestamps: List[Optional[float]]) -> Block:
+    """Make a block of lines with the timestamps of them."""
+    lines = len(timestamps)
+    timestamps = [x for x in timestamps if x is not None]
+    return Block(
+        start=start,
+        end=end,
+        lines=lines,
+        min_timestamp=min(timestamps, default=None),
+        max_timestamp=max(timestamps, default=None),
+    )
+
+
+def load_or_build_block_index(file: str, block_size: int = DEFAULT_BLOCK_SIZE, cache_dir: str = None) -> BlockIndex:
+    """Load the block index of a file, or build and save it, if it doesn't exist or it is stale.
+
+    It is saved next to the file, or in a cache directory if given.
+    """
+    block_index = BlockIndex.load(file, cache_dir=cache_dir)
+    if block_index is None:
+        block_index = BlockIndex.build(file, block_size=block_size)
+        try:
+            block_index.save(file, cache_dir=cache_dir)
+        except OSError:
+            # A read-only directory only loses the cache.
+            pass
+    return block_index
+
+
+def find_block_index(file: str, cache_dir: str = None) -> Optional[BlockIndex]:
+    """Find a fresh block index of a file next to it, or in a cache directory if given."""
+    block_index = BlockIndex.load(file)
+    if block_index is None and cache_dir is not None:
+        block_index = BlockIndex.load(file, cache_dir=cache_dir)
+    return block_index
+
+
+def get_block_index(file: str, block_size: int = DEFAULT_BLOCK_SIZE, cache_dir: str = None) -> BlockIndex:
+    """Get the block index of a file to read it, without writing anything next to the file.
+
+    A missing block index is built in memory, and it is saved only in a cache directory if given.
+    """
+    block_index = find_block_index(file, cache_dir=cache_dir)
+    if block_index is not None:
+        return block_index
+    if cache_dir is not None:
+        return load_or_build_block_index(file, block_size=block_size, cache_dir=cache_dir)
+    return BlockIndex.build(file, block_size=block_size)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from typing import Callable, Dict, Iterable, TextIO
+
+from bigquery_lineage.auditlog.pydot_builder import (
+    COLOR_SCHEME, COLOR_BQ, COLOR_BQ_PROJECT, COLOR_BQ_DATASET, COLOR_BQ_TABLE,
+    get_bigquery_node_id, get_bigquery_node_label, get_dataset_cluster_label, get_project_cluster_label
+)
+from bigquery_lineage.lineage.graph import GRANULARITY_TABLE, GRANULARITY_PROJECT, LineageGraph
+
+CLUSTER_STYLE = "filled,setlinewidth(0)"
+
+
+def quote(value: str) -> str:
+    """Quote an ID of DOT."""
+    return '"{}"'.format(str(value).replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def format_attributes(attributes: Dict[str, str]) -> str:
+    return ", ".join("{}={}".format(key, quote(value)) for key, value in attributes.items())
+
+
+def write_cluster_header(fp: TextIO, name: str, label: str, fillcolor: str, indent: str):
+    fp.write("{}subgraph {} {{\n".format(indent, quote("cluster_" + name)))
+    fp.write("{}  graph [{}];\n".format(indent, format_attributes({
+        "label": label,
+        "colorscheme": COLOR_SCHEME,
+        "fillcolor": fillcolor,
+        "style": CLUSTER_STYLE,
+    })))
+
+
+def write_dot(lineage_graph: LineageGraph, fp: TextIO):
+    """Write a lineage graph as DOT text straight to a file handle.
+
+    It writes the same clustered layout as `PydotBuilderV1.render` without creating pydot objects.
+    Each edge is written in the innermost cluster which contains both ends of it.
+    """
+    nodes = lineage_graph.nodes
+    node_ids = [quote(get_bigquery_node_id(node)) for node in nodes]
+    granularity = lineage_graph.granularity
+
+    def write_edges(source_ids: Iterable[int], is_inner: Callable[[int, int], bool], indent: str):
+        for source_id in source_ids:
+            for destination_id in lineage_graph.successors[source_id]:
+                if not is_inner(source_id, destination_id):
+                    continue
+                if granularity == GRANULARITY_TABLE:
+                    fp.write("{}{} -> {};\n".format(indent, node_ids[source_id], node_ids[destination_id]))
+                else:
+                    # Weight an edge between folded nodes with the number of the jobs.
+                    count = lineage_graph.edge_stats[(source_id, destination_id)].count
+                    fp.write("{}{} -> {} [label={}];\n".format(
+                        indent, node_ids[source_id], node_ids[destination_id], quote(count)))
+
+    def write_node(node_id: int, indent: str):
+        fp.write("{}{} [label={}];\n".format(indent, node_ids[node_id], quote(get_bigquery_node_label(nodes[node_id]))))
+
+    fp.write("digraph {} {{\n".format(quote("Google Cloud Platform")))
+    fp.write("  graph [{}];\n".format(format_attributes({
+        "label": "Google Cloud Platform",
+        "overlap": "False",
+        "rankdir": "LR",
+    })))
+    write_cluster_header(fp, name="cluster_BigQuery", label="BigQuery", fillcolor=COLOR_BQ, indent="  ")
+    fp.write("    node [{}];\n".format(format_attributes({
+        "shape": "box",
+        "fillcolor": COLOR_BQ_TABLE,
+        "style": CLUSTER_STYLE,
+        "colorscheme": COLOR_SCHEME,
+    })))
+
+    for project, datasets in lineage_graph.datasets.items():
+        if granularity == GRANULARITY_PROJECT:
+            # A collapsed graph has no clusters for its own nodes.
+            for dataset_node_ids in datasets.values():
+                for node_id in dataset_node_ids:
+                    write_node(node_id, indent="    ")
+            continue
+        write_cluster_header(fp, name="cluster_bq_project_{}".format(project),
+                             label=get_project_cluster_label(project),
+                             fillcolor=COLOR_BQ_PROJECT, indent="    ")
+        for dataset, dataset_node_ids in datasets.items():
+            if granularity != GRANULARITY_TABLE:
+                for node_id in dataset_node_ids:
+                    write_node(node_id, indent="      ")
+                continue
+            write_cluster_header(fp, name="cluster_bq_dataset_{}_{}".format(project, dataset),
+                                 label=get_dataset_cluster_label(project, dataset),
+                                 fillcolor=COLOR_BQ_DATASET, indent="      ")
+            for node_id in dataset_node_ids:
+                write_node(node_id, indent="        ")
+            # Edges in the dataset
+            write_edges(dataset_node_ids, lambda src, dst: nodes[src][:2] == nodes[dst][:2], indent="        ")
+            fp.write("      }\n")
+        # Edges across datasets in the project
+        for dataset_node_ids in datasets.values():
+            write_edges(dataset_node_ids,
+                        lambda src, dst: nodes[src][0] == nodes[dst][0] and nodes[src][1] != nodes[dst][1],
+                        indent="      ")
+        fp.write("    }\n")
+
+    # Edges across projects, or all edges of a graph collapsed into projects
+    write_edges(range(len(nodes)),
+                lambda src, dst: granularity == GRANULARITY_PROJECT or nodes[src][0] != nodes[dst][0],
+                indent="    ")
+    fp.write("  }\n")
+    fp.write("}\n")
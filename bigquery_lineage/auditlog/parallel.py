@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from bigquery_lineage.auditlog.auditlog import split_auditlog_file
+from bigquery_lineage.auditlog.block_index import (
+    DEFAULT_BLOCK_SIZE, BlockIndex, find_block_index, get_block_index, load_or_build_block_index
+)
+from bigquery_lineage.auditlog.projection import read_job_lineages
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.auditlog.time_index import TimeWindow
+from bigquery_lineage.config import Config
+from bigquery_lineage.lineage.edges import LineageEdges
+
+# 256MB
+DEFAULT_CHUNK_SIZE = 256 * 1024 * 1024
+
+
+def build_tasks(files: List[str],
+                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                time_window: TimeWindow = None,
+                cache_dir: str = None,
+                block_indexes: Dict[str, BlockIndex] = None) -> List[Tuple[str, int, int]]:
+    """Build tasks of (file, start, end) so that large files are split at line boundaries.
+
+    A file with a block index is split at its blocks, and blocks out of a time window are skipped.
+    A block index is built, if a time window is given and the file doesn't have a fresh one.
+    It is saved only in `cache_dir`, so that reading files never writes next to them.
+
+    Args:
+        block_indexes: block indexes of files which have been built already
+    """
+    time_window = TimeWindow() if time_window is None else time_window
+    block_indexes = block_indexes or {}
+    tasks = []
+    for file in files:
+        if file in block_indexes:
+            block_index = block_indexes[file]
+        elif time_window.is_unbounded():
+            block_index = find_block_index(file, cache_dir=cache_dir)
+        else:
+            block_index = get_block_index(file, cache_dir=cache_dir)
+        if block_index is None:
+            ranges = split_auditlog_file(file=file, chunk_size=chunk_size)
+        else:
+            ranges = block_index.get_ranges(chunk_size=chunk_size, time_window=time_window)
+        for start, end in ranges:
+            tasks.append((file, start, end))
+    return tasks
+
+
+def build_block_indexes_in_parallel(
+        files: List[str],
+        workers: int,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        cache_dir: str = None) -> Iterator[Tuple[str, BlockIndex]]:
+    """Build and save block indexes of files which don't have fresh ones with a process pool.
+
+    They are saved next to the files, or in a cache directory if given.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(load_or_build_block_index, file, block_size, cache_dir): file for file in files}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def collect_bigquery_references(config: Config,
+                                file: str,
+                                start: int = 0,
+                                end: int = None,
+                                time_window: TimeWindow = None) -> LineageEdges:
+    """Collect reference relationships in a byte range of a file."""
+    builder = PydotBuilderV1(config=config, time_window=time_window)
+    for job_lineage in read_job_lineages(file=file, start=start, end=end):
+        builder.update_with_job_lineage(job_lineage=job_lineage)
+    return builder.bigquery_references
+
+
+def collect_bigquery_references_in_parallel(
+        config: Config,
+        files: List[str],
+        workers: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        time_window: TimeWindow = None,
+        cache_dir: str = None) -> Iterator[Tuple[Tuple[str, int, int], LineageEdges]]:
+    """Collect reference relationships with a process pool.
+
+    Args:
+        config: bql config
+        files: paths to files of auditlog
+        workers: the number of processes
+        chunk_size: approximate size of a byte range which a worker reads at once
+        time_window: only jobs in the window are collected, if given
+        cache_dir: a directory to save block indexes in, which are otherwise built only in memory
+
+    Yields:
+        tuples of a task and partial reference relationships as soon as the task completes.
+    """
+    time_window = TimeWindow() if time_window is None else time_window
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        block_indexes = {}
+        if not time_window.is_unbounded():
+            # Build missing block indexes in parallel before skipping blocks with them.
+            futures = {executor.submit(get_block_index, file, DEFAULT_BLOCK_SIZE, cache_dir): file for file in files}
+            for future in as_completed(futures):
+                block_indexes[futures[future]] = future.result()
+        tasks = build_tasks(files=files, chunk_size=chunk_size, time_window=time_window, cache_dir=cache_dir,
+                            block_indexes=block_indexes)
+        futures = {
+            executor.submit(collect_bigquery_references, config, file, start, end, time_window): (file, start, end)
+            for file, start, end in tasks
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
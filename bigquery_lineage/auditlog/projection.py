@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from bigquery_lineage.auditlog.auditlog import is_parquet_file, read_lines, read_parquet_blocks
+from bigquery_lineage.utils import parse_timestamp
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TableKey = Tuple[str, str, str]
+
+GCS_URI_PREFIX = "gs://"
+
+
+class JobLineage(NamedTuple):
+    """Lineage of a job."""
+    principal_email: str
+    destination: TableKey
+    sources: Tuple[TableKey, ...]
+    # UNIX time of the log entry
+    timestamp: Optional[float] = None
+    # The number of jobs. A job in an insert response is counted by its completed event.
+    job_count: int = 1
+
+
+def loads(line: bytes) -> Dict[str, Any]:
+    """Decode a line of JSON with orjson, if it is installed."""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def get_table_key(block: Optional[Dict[str, Any]]) -> Optional[TableKey]:
+    """Get a tuple of (project, dataset, table), if all of them have values."""
+    if not block:
+        return None
+    project = block.get("projectId")
+    dataset = block.get("datasetId")
+    table = block.get("tableId")
+    if project is None or dataset is None or table is None:
+        return None
+    return project, dataset, table
+
+
+def get_gcs_key(uri: Optional[str]) -> Optional[TableKey]:
+    """Get a tuple of (gs://bucket, directory, object) of a GCS URI, which may have a wildcard.
+
+    A bucket and a directory take the places of a project and a dataset,
+    so that a GCS object can be a node of lineage as well as a table.
+    """
+    if not uri or not uri.startswith(GCS_URI_PREFIX):
+        return None
+    bucket, _, path = uri[len(GCS_URI_PREFIX):].partition("/")
+    if not bucket or not path:
+        return None
+    directory, _, name = path.rpartition("/")
+    return GCS_URI_PREFIX + bucket, directory, name
+
+
+def is_gcs_key(key: TableKey) -> bool:
+    return key[0] is not None and key[0].startswith(GCS_URI_PREFIX)
+
+
+def extract_query_lineage(job: Dict[str, Any]) -> Optional[Tuple[TableKey, List[TableKey]]]:
+    """Extract the destination table and the referenced tables and views of a query job."""
+    query = (job.get("jobConfiguration") or {}).get("query") or {}
+    destination = get_table_key(query.get("destinationTable"))
+    if destination is None:
+        return None
+    job_statistics = job.get("jobStatistics") or {}
+    sources = []
+    for referenced in (job_statistics.get("referencedTables") or [],
+                       job_statistics.get("referencedViews") or []):
+        for table in referenced:
+            source = get_table_key(table)
+            if source is not None:
+                sources.append(source)
+    return destination, sources
+
+
+def extract_load_lineage(job: Dict[str, Any]) -> Optional[Tuple[TableKey, List[TableKey]]]:
+    """Extract the destination table and the GCS objects of a load job."""
+    load = (job.get("jobConfiguration") or {}).get("load") or {}
+    destination = get_table_key(load.get("destinationTable"))
+    if destination is None:
+        return None
+    sources = [get_gcs_key(uri) for uri in load.get("sourceUris") or []]
+    return destination, [source for source in sources if source is not None]
+
+
+# Extractors of lineage from a job, which are applied to a decoded line at once.
+EXTRACTORS: Tuple[Callable[[Dict[str, Any]], Optional[Tuple[TableKey, List[TableKey]]]], ...] = (
+    extract_query_lineage,
+    extract_load_lineage,
+)
+
+
+def iter_jobs(protopayload_auditlog: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Iterate jobs of a completed event and an insert response with the number of jobs to count.
+
+    A job in an insert response is counted as 0, because it has a completed event too.
+    """
+    servicedata_v1_bigquery = protopayload_auditlog.get("servicedata_v1_bigquery") or {}
+    job = (servicedata_v1_bigquery.get("jobCompletedEvent") or {}).get("job")
+    if job:
+        yield job, 1
+    job = (servicedata_v1_bigquery.get("jobInsertResponse") or {}).get("resource")
+    if job:
+        yield job, 0
+
+
+def project_job_lineages(block: Dict[str, Any]) -> List[JobLineage]:
+    """Project a decoded line of auditlog into lineage of query and load jobs.
+
+    Unlike `Auditlog.parse`, it picks only the principal email, the destination table
+    and the sources without materializing dataclasses.
+    Jobs in both `jobCompletedEvent` and `jobInsertResponse` are extracted from a single decode of the line.
+    """
+    protopayload_auditlog = block["protopayload_auditlog"]
+    job_lineages = []
+    for job, job_count in iter_jobs(protopayload_auditlog):
+        for extract in EXTRACTORS:
+            lineage = extract(job)
+            if lineage is None:
+                continue
+            destination, sources = lineage
+            job_lineages.append(JobLineage(
+                principal_email=protopayload_auditlog["authenticationInfo"]["principalEmail"],
+                destination=destination,
+                sources=tuple(sources),
+                timestamp=get_unix_timestamp(block, job_statistics=job.get("jobStatistics") or {}),
+                job_count=job_count,
+            ))
+    return job_lineages
+
+
+def get_unix_timestamp(block: Dict[str, Any], job_statistics: Dict[str, Any] = None) -> Optional[float]:
+    """Get the timestamp of a decoded line of auditlog as UNIX time.
+
+    It falls back to the end time of a job, if the log entry doesn't have a timestamp.
+    """
+    value = block.get("timestamp")
+    if not value:
+        if job_statistics is None:
+            job_statistics = {}
+            for job, _ in iter_jobs(block.get("protopayload_auditlog") or {}):
+                job_statistics = job.get("jobStatistics") or {}
+                break
+        value = job_statistics.get("endTime")
+    timestamp = parse_timestamp(value)
+    return timestamp.timestamp() if timestamp is not None else None
+
+
+def read_job_lineages(file: str, start: int = 0, end: int = None) -> Iterator[JobLineage]:
+    """Read lineage of jobs in a byte range of a file of auditlog."""
+    if is_parquet_file(file):
+        blocks = read_parquet_blocks(file=file)
+    else:
+        blocks = (loads(line) for line in read_lines(file=file, start=start, end=end))
+    for block in blocks:
+        yield from project_job_lineages(block)
@@ -2,12 +2,16 @@
 from __future__ import absolute_import, division, print_function
 
 from dataclasses import dataclass
-from typing import List, Tuple
 
 import pydot
 
-from bigquery_lineage.auditlog.auditlog import Auditlog
+from bigquery_lineage.auditlog.auditlog import Auditlog, JobCompleteEvent
+from bigquery_lineage.auditlog.projection import GCS_URI_PREFIX, JobLineage, TableKey, get_gcs_key, is_gcs_key
+from bigquery_lineage.auditlog.time_index import TimeWindow
 from bigquery_lineage.config import Config
+from bigquery_lineage.lineage.edges import LineageEdges
+from bigquery_lineage.lineage.graph import GRANULARITY_TABLE, GRANULARITY_PROJECT, LineageGraph
+from bigquery_lineage.lineage.store import StoredEdge
 
 COLOR_SCHEME = "gnbu6"
 COLOR_GCP = None
@@ -33,9 +37,9 @@ def create_bigquery_cluster() -> pydot.Cluster:
 
 
 def create_bigquery_project_cluster(project: str) -> pydot.Cluster:
-    """Create a cluster of a BigQuery project."""
+    """Create a cluster of a BigQuery project, or a GCS bucket."""
     name = "cluster_bq_project_{}".format(project)
-    label = "BigQuery project: {}".format(project)
+    label = get_project_cluster_label(project)
     cluster = pydot.Cluster(graph_name=name, label=label,
                             colorscheme=COLOR_SCHEME, fillcolor=COLOR_BQ_PROJECT,
                             style="filled,setlinewidth(0)")
@@ -43,9 +47,9 @@ def create_bigquery_project_cluster(project: str) -> pydot.Cluster:
 
 
 def create_dataset_project_cluster(project: str, dataset: str) -> pydot.Cluster:
-    """Create a cluster of a BigQuery dataset."""
+    """Create a cluster of a BigQuery dataset, or a directory of a GCS bucket."""
     name = "cluster_bq_dataset_{}_{}".format(project, dataset)
-    label = "BigQuery dataset: {}.{}".format(project, dataset)
+    label = get_dataset_cluster_label(project, dataset)
     cluster = pydot.Cluster(graph_name=name, label=label,
                             colorscheme=COLOR_SCHEME, fillcolor=COLOR_BQ_DATASET,
                             style="filled,setlinewidth(0)")
@@ -60,16 +64,58 @@ def create_bigquery_table_node(project: str, dataset: str, table: str) -> pydot.
     return node
 
 
+def create_bigquery_node(node: TableKey) -> pydot.Node:
+    """Create a node of a BigQuery table, or a dataset or project in a collapsed graph.
+
+    The name is quoted, because pydot takes a colon in a GCS URI for a port.
+    """
+    return pydot.Node(name='"{}"'.format(get_bigquery_node_id(node)), label=get_bigquery_node_label(node))
+
+
 def get_bigquery_full_table_id(project: str, dataset: str, table: str) -> str:
     """Get a BigQuery full table ID."""
     return '{}.{}.{}'.format(project, dataset, table)
 
 
+def get_bigquery_node_id(node: TableKey) -> str:
+    """Get an ID of a node, skipping the parts folded by collapsing.
+
+    An ID of a GCS object is its URI.
+    """
+    separator = "/" if is_gcs_key(node) else "."
+    return separator.join(part for part in node if part)
+
+
+def get_bigquery_node_label(node: TableKey) -> str:
+    """Get a label of a node, which is the innermost part of it."""
+    return [part for part in node if part][-1]
+
+
+def get_project_cluster_label(project: str) -> str:
+    if project.startswith(GCS_URI_PREFIX):
+        return "GCS bucket: {}".format(project)
+    return "BigQuery project: {}".format(project)
+
+
+def get_dataset_cluster_label(project: str, dataset: str) -> str:
+    if project.startswith(GCS_URI_PREFIX):
+        return "GCS directory: {}/{}".format(project, dataset)
+    return "BigQuery dataset: {}.{}".format(project, dataset)
+
+
 @dataclass()
 class PydotBuilderV1:
     config: Config
-    bigquery_references: List[Tuple[Tuple[str, str, str], Tuple[str, str, str]]] = None
+    bigquery_references: LineageEdges = None
     verbose: bool = False
+    # Only jobs in the window are collected.
+    time_window: TimeWindow = None
+
+    def __post_init__(self):
+        if self.bigquery_references is None:
+            self.bigquery_references = LineageEdges()
+        if self.time_window is None:
+            self.time_window = TimeWindow()
 
     # pylint: disable=inconsistent-return-statements
     def update(self, auditlog: Auditlog):
@@ -81,25 +127,32 @@ class PydotBuilderV1:
         if self.verbose is True:
             print(email)
 
-        # Update with jobCompletedEvent.query
-        self.update_with_job_completed_event_query(auditlog=auditlog)
+        # Update with jobCompletedEvent and jobInsertResponse
+        servicedata_v1_bigquery = auditlog.protopayload_auditlog.servicedata_v1_bigquery
+        timestamp = auditlog.get_unix_timestamp()
+        if not self.time_window.contains(timestamp):
+            return None
+        # A job in an insert response is counted by its completed event.
+        for job_configuration, job_statistics, job_count in [
+                (servicedata_v1_bigquery.jobCompletedEvent.jobConfiguration,
+                 servicedata_v1_bigquery.jobCompletedEvent.jobStatistics, 1),
+                (servicedata_v1_bigquery.jobInsertResponse.jobConfiguration,
+                 servicedata_v1_bigquery.jobInsertResponse.jobStatistics, 0)]:
+            self.update_with_query(query=job_configuration.query, job_statistics=job_statistics,
+                                   timestamp=timestamp, job_count=job_count)
+            self.update_with_load(load=job_configuration.load, timestamp=timestamp, job_count=job_count)
 
     # pylint: disable=inconsistent-return-statements
-    def update_with_job_completed_event_query(self, auditlog: Auditlog):
-        """Update reference relationships with jobCompletedEvent.query."""
-        job_statistics = (auditlog.protopayload_auditlog.servicedata_v1_bigquery
-                          .jobCompletedEvent.jobStatistics)
-        query = (auditlog.protopayload_auditlog.servicedata_v1_bigquery
-                 .jobCompletedEvent.jobConfiguration.query)
-
+    def update_with_query(self,
+                          query: JobCompleteEvent.JobConfiguration.Query,
+                          job_statistics: JobCompleteEvent.JobStatistics,
+                          timestamp: float = None,
+                          job_count: int = 1):
+        """Update reference relationships with the configuration of a query job."""
         # Check if a destination table exists.
         if not query.destinationTable.has_value():
             return None
 
-        # Initialize the array just in case, if necessary.
-        if self.bigquery_references is None:
-            self.bigquery_references = []
-
         # Check if a destination matches with any of excluded tables.
         (dst_project, dst_dataset, dst_table) = (
             query.destinationTable.project,
@@ -124,7 +177,8 @@ class PydotBuilderV1:
                             table=referenced_table.table):
                     continue
                 source_node_key = (referenced_table.project, referenced_table.dataset, referenced_table.table)
-                self.bigquery_references.append((source_node_key, destination_node_key))
+                self.bigquery_references.add(source_node_key, destination_node_key,
+                                             timestamp=timestamp, count=job_count)
         # Loop over referenced views
         if (job_statistics.referencedViews is not None
                 and len(job_statistics.referencedViews) > 0):
@@ -138,10 +192,96 @@ class PydotBuilderV1:
                         table=referenced_view.table):
                     continue
                 source_node_key = (referenced_view.project, referenced_view.dataset, referenced_view.table)
-                self.bigquery_references.append((source_node_key, destination_node_key))
+                self.bigquery_references.add(source_node_key, destination_node_key,
+                                             timestamp=timestamp, count=job_count)
+
+    def update_with_job_completed_event_query(self, auditlog: Auditlog):
+        """Update reference relationships with jobCompletedEvent.query.
+
+        It is kept for existing callers and delegates to `update_with_query`.
+        """
+        job_completed_event = auditlog.protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent
+        return self.update_with_query(query=job_completed_event.jobConfiguration.query,
+                                      job_statistics=job_completed_event.jobStatistics,
+                                      timestamp=auditlog.get_unix_timestamp())
+
+    # pylint: disable=inconsistent-return-statements
+    def update_with_load(self,
+                         load: JobCompleteEvent.JobConfiguration.Load,
+                         timestamp: float = None,
+                         job_count: int = 1):
+        """Update reference relationships with GCS objects loaded by a load job."""
+        if not load.destinationTable.has_value():
+            return None
+        destination_node_key = (load.destinationTable.project,
+                                load.destinationTable.dataset,
+                                load.destinationTable.table)
+        if self.config.filters.is_excluded_table(*destination_node_key):
+            return None
+        for source_uri in load.sourceUris or []:
+            source_node_key = get_gcs_key(source_uri)
+            if source_node_key is None or self.config.filters.is_excluded_table(*source_node_key):
+                continue
+            self.bigquery_references.add(source_node_key, destination_node_key,
+                                         timestamp=timestamp, count=job_count)
+
+    # pylint: disable=inconsistent-return-statements
+    def update_with_job_lineage(self, job_lineage: JobLineage):
+        """Update reference relationships with lineage projected from auditlog."""
+        if self.config.filters.is_excluded_principal_email(job_lineage.principal_email):
+            return None
+        if not self.time_window.contains(job_lineage.timestamp):
+            return None
+
+        if self.verbose is True:
+            print(job_lineage.principal_email)
+
+        # Check if a destination matches with any of excluded tables.
+        (dst_project, dst_dataset, dst_table) = job_lineage.destination
+        if self.config.filters.is_excluded_table(
+                project=dst_project, dataset=dst_dataset, table=dst_table):
+            return None
+
+        for source in job_lineage.sources:
+            (src_project, src_dataset, src_table) = source
+            if self.config.filters.is_excluded_table(
+                    project=src_project, dataset=src_dataset, table=src_table):
+                continue
+            self.bigquery_references.add(source, job_lineage.destination,
+                                         timestamp=job_lineage.timestamp, count=job_lineage.job_count)
+
+    # pylint: disable=inconsistent-return-statements
+    def update_with_stored_edge(self, edge: StoredEdge):
+        """Update reference relationships with an edge in an edge store."""
+        if self.config.filters.is_excluded_principal_email(edge.principal_email):
+            return None
+        if not self.time_window.overlaps(edge.first_seen, edge.last_seen):
+            return None
+        for (project, dataset, table) in [edge.source, edge.destination]:
+            if self.config.filters.is_excluded_table(project=project, dataset=dataset, table=table):
+                return None
+        self.bigquery_references.add(edge.source, edge.destination, count=edge.job_count,
+                                     first_seen=edge.first_seen, last_seen=edge.last_seen)
+
+    def merge(self, bigquery_references: LineageEdges):
+        """Merge reference relationships collected by another builder."""
+        if bigquery_references:
+            self.bigquery_references.merge(bigquery_references)
 
     def build(self) -> pydot.Dot:
         """Build a graph."""
+        return self.render(self.build_lineage_graph())
+
+    def build_lineage_graph(self) -> LineageGraph:
+        """Build an in-memory lineage graph from the reference relationships."""
+        return LineageGraph.from_edges(self.bigquery_references)
+
+    def render(self, lineage_graph: LineageGraph) -> pydot.Dot:
+        """Render a lineage graph as pydot objects.
+
+        Each cluster and each node is created exactly once, and each edge is registered
+        to the innermost cluster which contains both ends of it.
+        """
         graph = pydot.Dot(
             graph_name="Google Cloud Platform",
             label="Google Cloud Platform",
@@ -150,78 +290,58 @@ class PydotBuilderV1:
             rankdir="LR")
         subgraph_bq = create_bigquery_cluster()
 
+        # Create clusters and nodes
+        # A collapsed graph has no clusters for its own nodes.
         subgraph_bq_projects = {}
-        table_nodes = {}
-        # Create nodes and edges
-        for bq_reference in set(self.bigquery_references):
-            ((src_project, src_dataset, src_table),
-             (dst_project, dst_dataset, dst_table)) = bq_reference
+        subgraph_bq_datasets = {}
+        nodes = [None] * len(lineage_graph)
+        for project, datasets in lineage_graph.datasets.items():
+            if lineage_graph.granularity == GRANULARITY_PROJECT:
+                for node_ids in datasets.values():
+                    for node_id in node_ids:
+                        nodes[node_id] = create_bigquery_node(lineage_graph.nodes[node_id])
+                        subgraph_bq.add_node(nodes[node_id])
+                continue
+            subgraph_project = create_bigquery_project_cluster(project=project)
+            subgraph_bq_projects[project] = subgraph_project
+            for dataset, node_ids in datasets.items():
+                parent = subgraph_project
+                if lineage_graph.granularity == GRANULARITY_TABLE:
+                    parent = create_dataset_project_cluster(project=project, dataset=dataset)
+                    subgraph_bq_datasets[(project, dataset)] = parent
+                for node_id in node_ids:
+                    nodes[node_id] = create_bigquery_node(lineage_graph.nodes[node_id])
+                    parent.add_node(nodes[node_id])
+
+        # Create edges
+        for source_id, destination_id in lineage_graph.edges():
+            (src_project, src_dataset, _) = lineage_graph.nodes[source_id]
+            (dst_project, dst_dataset, _) = lineage_graph.nodes[destination_id]
 
             if self.verbose is True:
-                print(bq_reference)
-
-            # Create a source table ID and a destination table ID
-            source_node_id = get_bigquery_full_table_id(
-                project=src_project, dataset=src_dataset, table=src_table)
-            destination_node_id = get_bigquery_full_table_id(
-                project=dst_project, dataset=dst_dataset, table=dst_table)
-
-            # Initialize a BigQuery project for source.
-            if src_project not in subgraph_bq_projects:
-                subgraph_bq_projects[src_project] = {
-                    'subgraph': create_bigquery_project_cluster(project=src_project),
-                    'datasets': {},
-                }
-            # Initialize a BigQuery dataset for source.
-            if src_dataset not in subgraph_bq_projects[src_project]["datasets"]:
-                subgraph_bq_projects[src_project]["datasets"][src_dataset] = \
-                    create_dataset_project_cluster(project=src_project, dataset=src_dataset)
-            # Initialize a BigQuery project for destination
-            if dst_project not in subgraph_bq_projects:
-                subgraph_bq_projects[dst_project] = {
-                    'subgraph': create_bigquery_project_cluster(project=dst_project),
-                    'datasets': {},
-                }
-            # Initialize a BigQuery dataset for destination.
-            if dst_dataset not in subgraph_bq_projects[dst_project]["datasets"]:
-                subgraph_bq_projects[dst_project]["datasets"][dst_dataset] = \
-                    create_dataset_project_cluster(project=dst_project, dataset=dst_dataset)
-
-            # Create nodes
-            # Create a source node
-            if source_node_id not in table_nodes:
-                table_nodes[source_node_id] = create_bigquery_table_node(
-                    project=src_project, dataset=src_dataset, table=src_table)
-            source_node = table_nodes[source_node_id]
-            # Create a destination node
-            if destination_node_id not in table_nodes:
-                table_nodes[destination_node_id] = \
-                    create_bigquery_table_node(project=src_project, dataset=src_dataset, table=src_table)
-            destination_node = table_nodes[destination_node_id]
-            # Register the nodes.
-            subgraph_bq_projects[src_project]["datasets"][src_dataset].add_node(source_node)
-            subgraph_bq_projects[dst_project]["datasets"][dst_dataset].add_node(destination_node)
-            # Create an edge.
-            edge = pydot.Edge(source_node, destination_node)
+                print((lineage_graph.nodes[source_id], lineage_graph.nodes[destination_id]))
+
+            edge = pydot.Edge(nodes[source_id], nodes[destination_id])
+            if lineage_graph.granularity != GRANULARITY_TABLE:
+                # Weight an edge between folded nodes with the number of the jobs.
+                edge.set_label(str(lineage_graph.edge_stats[(source_id, destination_id)].count))
             # Register the edge.
-            if src_project == dst_project and src_dataset == dst_dataset:
-                subgraph_bq_projects[src_project]["datasets"][src_dataset].add_edge(edge)
-            elif src_project == dst_project:
-                subgraph_bq_projects[src_project]["subgraph"].add_edge(edge)
+            src_dataset_key = (src_project, src_dataset)
+            if src_dataset_key == (dst_project, dst_dataset) and src_dataset_key in subgraph_bq_datasets:
+                subgraph_bq_datasets[src_dataset_key].add_edge(edge)
+            elif src_project in subgraph_bq_projects and src_project == dst_project:
+                subgraph_bq_projects[src_project].add_edge(edge)
             else:
                 subgraph_bq.add_edge(edge)
 
         print("=======================================")
-        print("# nodes: {}".format(len(table_nodes)))
-        print("# edges: {}".format(len(self.bigquery_references)))
+        print("# nodes: {}".format(len(lineage_graph)))
+        print("# edges: {}".format(lineage_graph.num_edges()))
 
         # Link subgraphs
-        # pylint: disable=consider-iterating-dictionary
-        for project in subgraph_bq_projects.keys():
-            subgraph_project = subgraph_bq_projects[project]["subgraph"]
-            for dataset in subgraph_bq_projects[project]["datasets"].keys():
-                subgraph_dataset = subgraph_bq_projects[project]["datasets"][dataset]
-                subgraph_project.add_subgraph(subgraph_dataset)
+        for (project, _), subgraph_dataset in subgraph_bq_datasets.items():
+            subgraph_bq_projects[project].add_subgraph(subgraph_dataset)
+        for subgraph_project in subgraph_bq_projects.values():
             subgraph_bq.add_subgraph(subgraph_project)
         graph.add_subgraph(subgraph_bq)
         return graph
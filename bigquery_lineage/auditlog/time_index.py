@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class TimeWindow:
+    """A time range in UNIX time. An open bound is None."""
+    since: Optional[float] = None
+    until: Optional[float] = None
+
+    def is_unbounded(self) -> bool:
+        return self.since is None and self.until is None
+
+    def contains(self, timestamp: Optional[float]) -> bool:
+        """Check if a timestamp is in the window. A job without timestamp is only in an unbounded window."""
+        if timestamp is None:
+            return self.is_unbounded()
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp > self.until:
+            return False
+        return True
+
+    def overlaps(self, first: Optional[float], last: Optional[float]) -> bool:
+        """Check if a time range [first, last] overlaps with the window."""
+        if self.is_unbounded():
+            return True
+        if first is None or last is None:
+            return False
+        if self.since is not None and last < self.since:
+            return False
+        if self.until is not None and first > self.until:
+            return False
+        return True
@@ -5,8 +5,14 @@ import click
 
 #from google.cloud import logging_v2 as cloud_logging_v2
 
+from bigquery_lineage.compression import COMPRESSIONS
 from bigquery_lineage.config import Config
-from bigquery_lineage.data.bigquery import BigQueryDataCollector
+from bigquery_lineage.data.bigquery import (
+    BigQueryDataCollector, DEFAULT_MAX_WORKERS, DEFAULT_PAGE_SIZE, DEFAULT_PREFETCH_PAGES,
+    EXPORT_FORMAT_JSON, EXPORT_FORMATS
+)
+from bigquery_lineage.data.planner import OVER_BUDGET_REFUSE, OVER_BUDGETS
+from bigquery_lineage.data.sharding import DEFAULT_SHARD_RETRIES, SHARD_BYS
 from bigquery_lineage.utils import load_yaml
 
 
@@ -52,12 +58,64 @@ def data(context):
 @click.option("--output", type=str, required=True)
 @click.option("--config", type=click.Path(exists=True), required=True)
 @click.option("--dry_run", type=bool, help="dry run", default=False)
+@click.option("--page_size", type=int, default=DEFAULT_PAGE_SIZE,
+              help="The number of rows in a page of query results")
+@click.option("--prefetch_pages", type=int, default=DEFAULT_PREFETCH_PAGES,
+              help="The number of pages to fetch ahead while writing")
+@click.option("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+              help="The number of sources to export concurrently")
+@click.option("--incremental", type=bool, default=False,
+              help="Export only audit logs newer than the last export to date-partitioned files")
+@click.option("--lineage_only", type=bool, default=False,
+              help="Select only the columns which lineage needs")
+@click.option("--order_by", type=bool, default=True,
+              help="Sort the results by timestamp")
+@click.option("--fmt", type=click.Choice(EXPORT_FORMATS), default=EXPORT_FORMAT_JSON,
+              help="The format of exported files")
+@click.option("--compression", type=click.Choice(COMPRESSIONS), default=None,
+              help="Compress exported JSON files in independently decompressible frames")
+@click.option("--max_bytes", type=int, default=None,
+              help="The byte budget of a query of a source, which is checked with a dry run")
+@click.option("--over_budget", type=click.Choice(OVER_BUDGETS), default=OVER_BUDGET_REFUSE,
+              help="Refuse a source over the budget, or split its date range until each query fits")
+@click.option("--shard", type=click.Choice(SHARD_BYS), default=None,
+              help="Shard the date range of a source by day or week into concurrent queries of part files")
+@click.option("--max_rows_per_shard", type=int, default=None,
+              help="Split a shard which returns as many rows. It is the limit in the config by default")
+@click.option("--shard_retries", type=int, default=DEFAULT_SHARD_RETRIES,
+              help="The number of retries of a failed shard")
 def bigquery(
         output: str,
         config: str,
-        dry_run: bool):
+        dry_run: bool,
+        page_size: int,
+        prefetch_pages: int,
+        workers: int,
+        incremental: bool,
+        lineage_only: bool,
+        order_by: bool,
+        fmt: str,
+        compression: str,
+        max_bytes: int,
+        over_budget: str,
+        shard: str,
+        max_rows_per_shard: int,
+        shard_retries: int):
     """Collect data from BigQuery."""
     yaml_block = load_yaml(config)
     bql_config = Config.parse(yaml=yaml_block)
-    collector = BigQueryDataCollector(output=output, bql_config=bql_config)
-    collector.export_logs(dry_run=dry_run)
+    collector = BigQueryDataCollector(output=output, bql_config=bql_config,
+                                      page_size=page_size, prefetch_pages=prefetch_pages,
+                                      max_workers=workers, incremental=incremental,
+                                      lineage_only=lineage_only, order_by=order_by, export_format=fmt,
+                                      compression=compression, max_bytes=max_bytes, over_budget=over_budget,
+                                      shard_by=shard, max_rows_per_shard=max_rows_per_shard,
+                                      shard_retries=shard_retries)
+    try:
+        results = collector.export_logs(dry_run=dry_run)
+    finally:
+        collector.close()
+    failures = [result for result in results if result.error is not None]
+    if failures:
+        raise click.ClickException("Failed to {} {} of {} sources".format(
+            "plan" if dry_run else "export", len(failures), len(results)))
@@ -3,16 +3,36 @@
 from __future__ import absolute_import, division, print_function
 
 import glob
+import json
 import os
-from typing import List
+from typing import List, Union
 
 import click
 
-from bigquery_lineage.auditlog.auditlog import read_auditlog
-from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.auditlog.dot_writer import write_dot
+from bigquery_lineage.auditlog.parallel import (
+    DEFAULT_CHUNK_SIZE, build_block_indexes_in_parallel, build_tasks, collect_bigquery_references_in_parallel
+)
+from bigquery_lineage.auditlog.projection import read_job_lineages
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1, get_bigquery_node_id
+from bigquery_lineage.auditlog.time_index import TimeWindow
+from bigquery_lineage.compression import COMPRESSION_SUFFIXES
 from bigquery_lineage.config import Config
-from bigquery_lineage.data.bigquery import AUDITLOG_FILE_NAME
+from bigquery_lineage.data.bigquery import AUDITLOG_FILE_NAME, AUDITLOG_PARQUET_FILE_NAME
+from bigquery_lineage.lineage.columns import (
+    DEFAULT_CACHE_SIZE, ColumnLineageBuilder, ColumnLineageParser, read_query_jobs, sqlglot
+)
+from bigquery_lineage.lineage.graph import (
+    DIRECTIONS, DIRECTION_BOTH, DIRECTION_DOWNSTREAM, GRANULARITIES, GRANULARITY_TABLE, LineageGraph, parse_table_id
+)
+from bigquery_lineage.lineage.impact import ImpactAnalyzer
+from bigquery_lineage.lineage.snapshot import GraphSnapshot, write_snapshot
+from bigquery_lineage.lineage.store import EdgeStore
 from bigquery_lineage.logger import get_logger
+from bigquery_lineage.utils import parse_time_bound
+
+# Formats which are written by the DOT writer instead of pydot and Graphviz.
+DOT_FORMATS = ["dot", "raw"]
 
 
 @click.group()
@@ -28,30 +48,348 @@ def graph(context):
 @click.option("--output", type=str, required=True)
 @click.option("--fmt", type=str, required=False, default="png")
 @click.option("--verbose", type=bool, required=False, default=False)
+@click.option("--workers", type=int, required=False, default=1,
+              help="The number of processes to parse files of auditlog")
+@click.option("--chunk_size", type=int, required=False, default=DEFAULT_CHUNK_SIZE,
+              help="The approximate number of bytes a process parses at once")
+@click.option("--store", type=str, required=False, default=None,
+              help="A SQLite file of lineage edges. Only new or modified files are parsed. "
+                   "It can't be used with --since/--until.")
+@click.option("--snapshot", type=click.Path(exists=True), required=False, default=None,
+              help="A snapshot of a lineage graph to load instead of parsing files of auditlog")
+@click.option("--root", type=str, required=False, multiple=True,
+              help="A table ID such as project.dataset.table to render the reachable subgraph from")
+@click.option("--direction", type=click.Choice(DIRECTIONS), required=False, default=DIRECTION_BOTH,
+              help="The direction to traverse from the roots")
+@click.option("--depth", type=int, required=False, default=None,
+              help="The maximum number of hops from the roots")
+@click.option("--granularity", type=click.Choice(GRANULARITIES), required=False, default=GRANULARITY_TABLE,
+              help="Fold tables into datasets or projects with weighted edges")
+@click.option("--since", type=str, required=False, default=None,
+              help="Only jobs at or after the time, such as 2020-08-01 or 7d for the last 7 days")
+@click.option("--until", type=str, required=False, default=None,
+              help="Only jobs at or before the time, such as 2020-08-31T23:59:59")
+@click.option("--cache_dir", type=str, required=False, default=None,
+              help="A directory to save block indexes in, which skip blocks out of --since/--until next time")
 def pydot(
         data_dir: str,
         config: str,
         output: str,
         fmt: str,
-        verbose: bool):
+        verbose: bool,
+        workers: int,
+        chunk_size: int,
+        store: str,
+        snapshot: str,
+        root: List[str],
+        direction: str,
+        depth: int,
+        granularity: str,
+        since: str,
+        until: str,
+        cache_dir: str):
     """Visualize a graph with pydot."""
     logger = get_logger()
 
+    try:
+        time_window = TimeWindow(since=parse_time_bound(since), until=parse_time_bound(until))
+    except ValueError as e:
+        raise click.BadParameter(e.args[0], param_hint="--since/--until")
     bql_config = Config.load(path=config)
-    files = find_auditlog_files(data_dir=data_dir)
-    builder = PydotBuilderV1(config=bql_config, verbose=verbose)
-    for file in files:
-        logger.info("Read {}".format(file))
-        for auditlog in read_auditlog(file=file):
-            builder.update(auditlog=auditlog)
+    if snapshot is not None:
+        builder = PydotBuilderV1(config=bql_config, verbose=verbose)
+        with load_snapshot(path=snapshot, time_window=time_window) as graph_snapshot:
+            # Only the subgraph from the roots is materialized from the mapped snapshot.
+            if root:
+                lineage_graph = extract_subgraph(graph_snapshot, root=root, direction=direction, depth=depth)
+            else:
+                lineage_graph = graph_snapshot.to_lineage_graph()
+    else:
+        builder = collect_lineage(data_dir=data_dir, bql_config=bql_config, verbose=verbose, workers=workers,
+                                  chunk_size=chunk_size, store=store, time_window=time_window, cache_dir=cache_dir)
+        lineage_graph = builder.build_lineage_graph()
+        if root:
+            lineage_graph = extract_subgraph(lineage_graph, root=root, direction=direction, depth=depth)
     logger.info("Build a graph to {}".format(os.path.abspath(output)))
-    g = builder.build()
-    g.write(path=output, format=fmt)
+    if granularity != GRANULARITY_TABLE:
+        lineage_graph = lineage_graph.collapse(granularity=granularity)
+    if fmt in DOT_FORMATS:
+        # Write DOT text directly without pydot objects.
+        with open(output, "w") as fp:
+            write_dot(lineage_graph=lineage_graph, fp=fp)
+    else:
+        g = builder.render(lineage_graph)
+        g.write(path=output, format=fmt)
+
+
+@graph.command()
+@click.option("--data_dir", type=click.Path(exists=True), required=True, default="./data")
+@click.option("--config", type=click.Path(exists=True), required=True)
+@click.option("--tables", type=str, required=True, multiple=True,
+              help="Table IDs such as project.dataset.table, which can be separated by commas")
+@click.option("--output", type=str, required=True,
+              help="A JSON file to write, or - for the standard output")
+@click.option("--workers", type=int, required=False, default=1,
+              help="The number of processes to parse files of auditlog")
+@click.option("--chunk_size", type=int, required=False, default=DEFAULT_CHUNK_SIZE,
+              help="The approximate number of bytes a process parses at once")
+@click.option("--store", type=str, required=False, default=None,
+              help="A SQLite file of lineage edges. Only new or modified files are parsed. "
+                   "It can't be used with --since/--until.")
+@click.option("--snapshot", type=click.Path(exists=True), required=False, default=None,
+              help="A snapshot of a lineage graph to load instead of parsing files of auditlog")
+@click.option("--since", type=str, required=False, default=None,
+              help="Only jobs at or after the time, such as 2020-08-01 or 7d for the last 7 days")
+@click.option("--until", type=str, required=False, default=None,
+              help="Only jobs at or before the time, such as 2020-08-31T23:59:59")
+@click.option("--cache_dir", type=str, required=False, default=None,
+              help="A directory to save block indexes in, which skip blocks out of --since/--until next time")
+def impact(
+        data_dir: str,
+        config: str,
+        tables: List[str],
+        output: str,
+        workers: int,
+        chunk_size: int,
+        store: str,
+        snapshot: str,
+        since: str,
+        until: str,
+        cache_dir: str):
+    """Find all tables downstream of changed tables as JSON."""
+    logger = get_logger()
+
+    try:
+        time_window = TimeWindow(since=parse_time_bound(since), until=parse_time_bound(until))
+    except ValueError as e:
+        raise click.BadParameter(e.args[0], param_hint="--since/--until")
+    table_ids = [table_id.strip() for value in tables for table_id in value.split(",") if table_id.strip()]
+    try:
+        seeds = [parse_table_id(table_id) for table_id in table_ids]
+    except ValueError as e:
+        raise click.BadParameter(e.args[0], param_hint="--tables")
+    if snapshot is not None:
+        with load_snapshot(path=snapshot, time_window=time_window) as graph_snapshot:
+            # Tables in cycles with downstream tables are downstream as well,
+            # so only the downstream subgraph is materialized from the mapped snapshot.
+            known_seeds = [seed for seed in seeds if graph_snapshot.get_id(seed) is not None]
+            lineage_graph = graph_snapshot.subgraph(roots=known_seeds, direction=DIRECTION_DOWNSTREAM)
+    else:
+        bql_config = Config.load(path=config)
+        builder = collect_lineage(data_dir=data_dir, bql_config=bql_config, workers=workers,
+                                  chunk_size=chunk_size, store=store, time_window=time_window, cache_dir=cache_dir)
+        lineage_graph = builder.build_lineage_graph()
+    analyzer = ImpactAnalyzer(lineage_graph)
+
+    seed_ids = [lineage_graph.get_id(seed) for seed in seeds]
+    downstream_ids = analyzer.downstream(seed_id for seed_id in seed_ids if seed_id is not None)
+    result = {
+        "tables": table_ids,
+        "unknown_tables": [table_id for table_id, seed_id in zip(table_ids, seed_ids) if seed_id is None],
+        "downstream": [get_bigquery_node_id(lineage_graph.nodes[node_id]) for node_id in downstream_ids],
+        "cycles": [[get_bigquery_node_id(lineage_graph.nodes[node_id]) for node_id in cycle]
+                   for cycle in analyzer.cycles([x for x in seed_ids if x is not None] + downstream_ids)],
+    }
+    logger.info("Found {} tables downstream of {} tables".format(len(downstream_ids), len(table_ids)))
+    if output == "-":
+        click.echo(json.dumps(result, indent=2))
+    else:
+        with open(output, "w") as fp:
+            json.dump(result, fp, indent=2)
+
+
+@graph.command(name="snapshot")
+@click.option("--data_dir", type=click.Path(exists=True), required=True, default="./data")
+@click.option("--config", type=click.Path(exists=True), required=True)
+@click.option("--output", type=str, required=True,
+              help="A snapshot file to write, such as graph.bqlgraph")
+@click.option("--workers", type=int, required=False, default=1,
+              help="The number of processes to parse files of auditlog")
+@click.option("--chunk_size", type=int, required=False, default=DEFAULT_CHUNK_SIZE,
+              help="The approximate number of bytes a process parses at once")
+@click.option("--store", type=str, required=False, default=None,
+              help="A SQLite file of lineage edges. Only new or modified files are parsed. "
+                   "It can't be used with --since/--until.")
+@click.option("--since", type=str, required=False, default=None,
+              help="Only jobs at or after the time, such as 2020-08-01 or 7d for the last 7 days")
+@click.option("--until", type=str, required=False, default=None,
+              help="Only jobs at or before the time, such as 2020-08-31T23:59:59")
+@click.option("--cache_dir", type=str, required=False, default=None,
+              help="A directory to save block indexes in, which skip blocks out of --since/--until next time")
+def export_snapshot(
+        data_dir: str,
+        config: str,
+        output: str,
+        workers: int,
+        chunk_size: int,
+        store: str,
+        since: str,
+        until: str,
+        cache_dir: str):
+    """Export a lineage graph to a binary snapshot, which `--snapshot` of other commands loads."""
+    logger = get_logger()
+
+    try:
+        time_window = TimeWindow(since=parse_time_bound(since), until=parse_time_bound(until))
+    except ValueError as e:
+        raise click.BadParameter(e.args[0], param_hint="--since/--until")
+    bql_config = Config.load(path=config)
+    builder = collect_lineage(data_dir=data_dir, bql_config=bql_config, workers=workers,
+                              chunk_size=chunk_size, store=store, time_window=time_window, cache_dir=cache_dir)
+    lineage_graph = builder.build_lineage_graph()
+    write_snapshot(graph=lineage_graph, path=output)
+    logger.info("Exported {} nodes and {} edges to {}".format(
+        len(lineage_graph), lineage_graph.num_edges(), os.path.abspath(output)))
+
+
+@graph.command()
+@click.option("--data_dir", type=click.Path(exists=True), required=True, default="./data")
+@click.option("--config", type=click.Path(exists=True), required=True)
+@click.option("--output", type=str, required=True,
+              help="A JSON file to write, or - for the standard output")
+@click.option("--cache_size", type=int, required=False, default=DEFAULT_CACHE_SIZE,
+              help="The number of distinct parsed queries to keep in memory")
+@click.option("--since", type=str, required=False, default=None,
+              help="Only jobs at or after the time, such as 2020-08-01 or 7d for the last 7 days")
+@click.option("--until", type=str, required=False, default=None,
+              help="Only jobs at or before the time, such as 2020-08-31T23:59:59")
+def columns(data_dir: str, config: str, output: str, cache_size: int, since: str, until: str):
+    """Parse column-level lineage from query texts as JSON."""
+    logger = get_logger()
+
+    if sqlglot is None:
+        raise click.UsageError("sqlglot is required. Install bigquery-lineage[sql].")
+    try:
+        time_window = TimeWindow(since=parse_time_bound(since), until=parse_time_bound(until))
+    except ValueError as e:
+        raise click.BadParameter(e.args[0], param_hint="--since/--until")
+    bql_config = Config.load(path=config)
+    builder = ColumnLineageBuilder(config=bql_config, parser=ColumnLineageParser(cache_size=cache_size))
+    for file in find_auditlog_files(data_dir=data_dir):
+        logger.info("Read {}".format(file))
+        for query_job in read_query_jobs(file=file, time_window=time_window):
+            builder.update(query_job=query_job)
+    edges = builder.build()
+    result = [{
+        "source": get_bigquery_node_id(edge.source),
+        "source_column": edge.source_column,
+        "destination": get_bigquery_node_id(edge.destination),
+        "destination_column": edge.destination_column,
+        "job_count": job_count,
+    } for edge, job_count in sorted(edges.items())]
+    if output == "-":
+        click.echo(json.dumps(result, indent=2))
+    else:
+        with open(output, "w") as fp:
+            json.dump(result, fp, indent=2)
+
+
+@graph.command()
+@click.option("--data_dir", type=click.Path(exists=True), required=True, default="./data")
+@click.option("--store", type=str, required=True,
+              help="A SQLite file of lineage edges")
+def ingest(data_dir: str, store: str):
+    """Ingest new or modified files of auditlog into an edge store."""
+    files = find_auditlog_files(data_dir=data_dir)
+    with EdgeStore(path=store) as edge_store:
+        sync_edge_store(edge_store=edge_store, files=files)
+
+
+@graph.command()
+@click.option("--data_dir", type=click.Path(exists=True), required=True, default="./data")
+@click.option("--workers", type=int, required=False, default=1,
+              help="The number of processes to index files of auditlog")
+@click.option("--cache_dir", type=str, required=False, default=None,
+              help="A directory to save block indexes in, instead of next to files of auditlog")
+def index(data_dir: str, workers: int, cache_dir: str):
+    """Build block indexes of files of auditlog to split and skip them by time."""
+    logger = get_logger()
+    files = find_auditlog_files(data_dir=data_dir)
+    for file, block_index in build_block_indexes_in_parallel(files=files, workers=workers, cache_dir=cache_dir):
+        logger.info("Indexed {} with {} blocks".format(file, len(block_index.blocks)))
+
+
+def collect_lineage(data_dir: str,
+                    bql_config: Config,
+                    verbose: bool = False,
+                    workers: int = 1,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    store: str = None,
+                    time_window: TimeWindow = None,
+                    cache_dir: str = None) -> PydotBuilderV1:
+    """Collect lineage in files of auditlog through an edge store, processes or the current process.
+
+    Block indexes to skip blocks out of the time window are saved only in `cache_dir`,
+    because reading files of auditlog shouldn't write next to them.
+    """
+    logger = get_logger()
+
+    builder = PydotBuilderV1(config=bql_config, verbose=verbose, time_window=time_window)
+    time_window = builder.time_window
+    if store is not None and not time_window.is_unbounded():
+        # Edges in the store are aggregated over time, so they can't be filtered by time exactly.
+        raise click.BadParameter("It can't be used with --store", param_hint="--since/--until")
+    files = find_auditlog_files(data_dir=data_dir)
+    if store is not None:
+        with EdgeStore(path=store) as edge_store:
+            sync_edge_store(edge_store=edge_store, files=files)
+            for edge in edge_store.iter_edges():
+                builder.update_with_stored_edge(edge=edge)
+    elif workers > 1:
+        parallel_results = collect_bigquery_references_in_parallel(
+            config=bql_config, files=files, workers=workers, chunk_size=chunk_size, time_window=time_window,
+            cache_dir=cache_dir)
+        for (file, start, end), bigquery_references in parallel_results:
+            logger.info("Read {} [{}, {})".format(file, start, end))
+            builder.merge(bigquery_references=bigquery_references)
+    else:
+        tasks = build_tasks(files=files, chunk_size=chunk_size, time_window=time_window, cache_dir=cache_dir)
+        for file, start, end in tasks:
+            logger.info("Read {} [{}, {})".format(file, start, end))
+            for job_lineage in read_job_lineages(file=file, start=start, end=end):
+                builder.update_with_job_lineage(job_lineage=job_lineage)
+    return builder
+
+
+def load_snapshot(path: str, time_window: TimeWindow) -> GraphSnapshot:
+    """Open a memory-mapped snapshot of a lineage graph, whose edges have been aggregated over time."""
+    if not time_window.is_unbounded():
+        raise click.BadParameter("It can't be used with --snapshot", param_hint="--since/--until")
+    try:
+        return GraphSnapshot(path=path)
+    except ValueError as e:
+        raise click.BadParameter(e.args[0], param_hint="--snapshot")
+
+
+def extract_subgraph(lineage_graph: Union[LineageGraph, GraphSnapshot],
+                     root: List[str],
+                     direction: str,
+                     depth: int) -> LineageGraph:
+    """Extract the subgraph which is reachable from root tables of a lineage graph or a snapshot."""
+    try:
+        roots = [parse_table_id(table_id) for table_id in root]
+        return lineage_graph.subgraph(roots=roots, direction=direction, depth=depth)
+    except (KeyError, ValueError) as e:
+        raise click.BadParameter(e.args[0], param_hint="--root")
+
+
+def sync_edge_store(edge_store: EdgeStore, files: List[str]) -> List[str]:
+    """Synchronize an edge store with files of auditlog."""
+    logger = get_logger()
+    ingested = edge_store.sync(paths=files)
+    for file in ingested:
+        logger.info("Ingested {}".format(file))
+    logger.info("Ingested {} of {} files into {}".format(len(ingested), len(files), edge_store.path))
+    return ingested
 
 
 def find_auditlog_files(data_dir: str) -> List[str]:
-    """Find files of auditlogs."""
-    files = glob.glob(
-        os.path.join(os.path.abspath(data_dir), "**", AUDITLOG_FILE_NAME),
-        recursive=True)
+    """Find files of auditlogs, including compressed ones."""
+    file_names = [AUDITLOG_FILE_NAME, AUDITLOG_PARQUET_FILE_NAME]
+    file_names.extend(AUDITLOG_FILE_NAME + suffix for suffix in COMPRESSION_SUFFIXES.values())
+    files = []
+    for file_name in file_names:
+        files.extend(glob.glob(
+            os.path.join(os.path.abspath(data_dir), "**", file_name),
+            recursive=True))
     return files
@@ -6,6 +6,7 @@ import click_completion
 
 from .data import data
 from .graph import graph
+from .serve import serve
 from .completion import completion
 
 # Initialize click-completion
@@ -29,5 +30,6 @@ def cli(context):
 # Add sub commands
 cli.add_command(data)
 cli.add_command(graph)
+cli.add_command(serve)
 cli.add_command(completion)
 
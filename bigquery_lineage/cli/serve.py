@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=logging-format-interpolation
+from __future__ import absolute_import, division, print_function
+
+import click
+
+from bigquery_lineage.cli.graph import find_auditlog_files
+from bigquery_lineage.config import Config
+from bigquery_lineage.lineage.index import IndexWatcher, LineageIndex
+from bigquery_lineage.lineage.server import DEFAULT_HOST, DEFAULT_PORT, LineageServer
+from bigquery_lineage.logger import get_logger
+
+
+@click.command()
+@click.option("--data_dir", type=click.Path(exists=True), required=True, default="./data")
+@click.option("--config", type=click.Path(exists=True), required=True)
+@click.option("--host", type=str, required=False, default=DEFAULT_HOST,
+              help="The host to listen on")
+@click.option("--port", type=int, required=False, default=DEFAULT_PORT,
+              help="The port to listen on")
+@click.option("--interval", type=float, required=False, default=10.0,
+              help="The seconds between scans of the data dir for new or appended files")
+def serve(data_dir: str, config: str, host: str, port: int, interval: float):
+    """Serve lineage queries over an HTTP/JSON API with an in-memory index."""
+    logger = get_logger()
+
+    bql_config = Config.load(path=config)
+    index = LineageIndex(config=bql_config)
+    applied = index.refresh(files=find_auditlog_files(data_dir=data_dir))
+    logger.info("Loaded {} files into the lineage index: {}".format(len(applied), index.stats()))
+
+    watcher = IndexWatcher(index=index, find_files=lambda: find_auditlog_files(data_dir=data_dir),
+                           interval=interval)
+    watcher.start()
+    server = LineageServer(index=index, host=host, port=port)
+    logger.info("Serve lineage at http://{}:{}".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        server.server_close()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = [COMPRESSION_GZIP, COMPRESSION_ZSTD]
+COMPRESSION_SUFFIXES = {
+    COMPRESSION_GZIP: ".gz",
+    COMPRESSION_ZSTD: ".zst",
+}
+
+# 4MB of uncompressed lines in a frame
+DEFAULT_FRAME_SIZE = 4 * 1024 * 1024
+# 1MB
+DEFAULT_READ_SIZE = 1024 * 1024
+
+
+def get_compression(file: str) -> Optional[str]:
+    """Get the compression of a file by its suffix. It returns None for an uncompressed file."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if file.endswith(suffix):
+            return compression
+    return None
+
+
+def add_compression_suffix(file: str, compression: Optional[str]) -> str:
+    """Add the suffix of a compression to a file name."""
+    if compression is None:
+        return file
+    validate_compression(compression)
+    return file + COMPRESSION_SUFFIXES[compression]
+
+
+def validate_compression(compression: Optional[str]):
+    if compression is None:
+        return
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unsupported compression: {}".format(compression))
+    if compression == COMPRESSION_ZSTD and zstandard is None:
+        raise ImportError("zstandard is required for {}".format(compression))
+
+
+def compress_frame(data: bytes, compression: str) -> bytes:
+    """Compress data into an independently decompressible frame.
+
+    A gzip frame is a gzip member, and a zstd frame is a zstd frame.
+    Concatenated frames are still a valid gzip or zstd file.
+    """
+    if compression == COMPRESSION_GZIP:
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError("Unsupported compression: {}".format(compression))
+
+
+def create_decompressor(compression: str):
+    if compression == COMPRESSION_GZIP:
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError("Unsupported compression: {}".format(compression))
+
+
+class FrameWriter:
+    """A text writer of lines which compresses them into independent frames.
+
+    A frame is cut at the end of a write after `frame_size` bytes of uncompressed text,
+    so that each frame starts at a line as long as lines are written whole.
+    """
+
+    def __init__(self, fp: BinaryIO, compression: str, frame_size: int = DEFAULT_FRAME_SIZE):
+        validate_compression(compression)
+        self._fp = fp
+        self._compression = compression
+        self._frame_size = frame_size
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._frame_size:
+            self.flush_frame()
+
+    def flush_frame(self):
+        if self._buffered == 0:
+            return
+        self._fp.write(compress_frame(b"".join(self._buffer), self._compression))
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self):
+        self.flush_frame()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_decompressed(file: str,
+                      compression: str,
+                      start: int = 0,
+                      end: int = None,
+                      read_size: int = DEFAULT_READ_SIZE) -> Iterator[Tuple[int, bytes]]:
+    """Decompress concatenated frames in a byte range of a file as a stream.
+
+    The range has to start at a frame, and the last frame in the range is read to its end.
+
+    Yields:
+        tuples of the byte offset of the frame and a chunk of decompressed data in it
+    """
+    validate_compression(compression)
+    with open(file, "rb") as fp:
+        fp.seek(start)
+        position = start
+        frame_start = start
+        decompressor = create_decompressor(compression)
+        while end is None or position < end or not decompressor.eof:
+            data = fp.read(read_size)
+            if not data:
+                break
+            position += len(data)
+            while data:
+                chunk = decompressor.decompress(data)
+                if chunk:
+                    yield frame_start, chunk
+                if not decompressor.eof:
+                    break
+                # The frame ends in the data. The rest of it is the next frame.
+                data = decompressor.unused_data
+                frame_start = position - len(data)
+                if end is not None and frame_start >= end:
+                    return
+                decompressor = create_decompressor(compression)
+
+
+def iter_decompressed_lines(file: str,
+                            compression: str,
+                            start: int = 0,
+                            end: int = None) -> Iterator[Tuple[Optional[int], bytes]]:
+    """Iterate lines in concatenated frames in a byte range of a file.
+
+    Yields:
+        tuples of the byte offset of the frame, if the line is the first line of the frame,
+        otherwise None, and the line.
+    """
+    remainder = b""
+    last_frame_start = None
+    boundary = None
+    for frame_start, chunk in iter_decompressed(file=file, compression=compression, start=start, end=end):
+        if frame_start != last_frame_start:
+            last_frame_start = frame_start
+            # A frame starts at a line only if the previous frame ends with a newline.
+            boundary = frame_start if not remainder else None
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield boundary, line + b"\n"
+            boundary = None
+    if remainder:
+        yield boundary, remainder
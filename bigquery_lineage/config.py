@@ -1,13 +1,102 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
-from dataclasses import dataclass
-from typing import Dict, Any, List
+import functools
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Pattern, Tuple
 
 import re
 
 from bigquery_lineage.utils import load_yaml
 
+# The maximum number of verdicts which compiled filters memorize.
+DEFAULT_FILTER_CACHE_SIZE = 1024 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def compile_regexp(regexp: str) -> Pattern:
+    """Compile a regular expression only once."""
+    return re.compile(r'{}'.format(regexp))
+
+
+class AnyRegexp:
+    """Regular expressions which match if any of them matches."""
+
+    def __init__(self, regexps: List[str]):
+        self.regexps = [compile_regexp(regexp) for regexp in regexps]
+
+    def search(self, target: str) -> bool:
+        return any(regexp.search(target) for regexp in self.regexps)
+
+
+def combine_regexps(regexps: List[str]):
+    """Combine regular expressions into a single alternation.
+
+    Regular expressions with groups or inline flags can't be combined safely,
+    because they change the meaning of the others. They are searched one by one instead.
+
+    Returns:
+        an object which has `search`, or None if there is no regular expression.
+    """
+    if not regexps:
+        return None
+    try:
+        if all(compile_regexp(regexp).groups == 0 for regexp in regexps):
+            return re.compile("|".join("(?:{})".format(regexp) for regexp in regexps))
+    except re.error:
+        pass
+    return AnyRegexp(regexps)
+
+
+class CompiledConfigFilters:
+    """Filters whose regular expressions are compiled and whose verdicts are memorized.
+
+    Regular expressions of each field are combined into a single alternation,
+    and verdicts are cached by (project, dataset, table) and by email.
+    """
+
+    def __init__(self,
+                 excluded_tables: List["ConfigFilters.ExcludedTable"],
+                 excluded_principal_emails: List[str],
+                 cache_size: int = DEFAULT_FILTER_CACHE_SIZE):
+        self._excluded_tables = excluded_tables
+        self._excluded_principal_emails = excluded_principal_emails
+        self._cache_size = cache_size
+
+        self._project_regexp = combine_regexps(
+            [x.project_regexp for x in excluded_tables if x.project_regexp is not None])
+        self._dataset_regexp = combine_regexps(
+            [x.dataset_regexp for x in excluded_tables if x.dataset_regexp is not None])
+        self._table_regexp = combine_regexps(
+            [x.table_regexp for x in excluded_tables if x.table_regexp is not None])
+        self._email_regexp = combine_regexps(excluded_principal_emails)
+
+        self._is_excluded_table_key = functools.lru_cache(maxsize=cache_size)(self._match_table_key)
+        self._is_excluded_email = functools.lru_cache(maxsize=cache_size)(self._match_email)
+
+    def __reduce__(self):
+        # The LRU caches can't be pickled. They are rebuilt in a process which unpickles it.
+        return (CompiledConfigFilters,
+                (self._excluded_tables, self._excluded_principal_emails, self._cache_size))
+
+    def _match_table_key(self, key: Tuple[str, str, str]) -> bool:
+        (project, dataset, table) = key
+        return bool(
+            (self._project_regexp is not None and self._project_regexp.search(project))
+            or (self._dataset_regexp is not None and self._dataset_regexp.search(dataset))
+            or (self._table_regexp is not None and self._table_regexp.search(table)))
+
+    def _match_email(self, email: str) -> bool:
+        return bool(self._email_regexp is not None and self._email_regexp.search(email))
+
+    def is_excluded_table(self, project: str, dataset: str, table: str) -> bool:
+        """Check if a table is matched with any of excluded tables."""
+        return self._is_excluded_table_key((project, dataset, table))
+
+    def is_excluded_principal_email(self, email: str) -> bool:
+        """Check if a given email is matched with any of excluded principal emails."""
+        return self._is_excluded_email(email)
+
 
 @dataclass
 class ConfigSource:
@@ -49,7 +138,7 @@ class ConfigFilters:
                 # Skip if regexp is None
                 if regexp is None:
                     continue
-                compiled_regexp = re.compile(r'{}'.format(regexp))
+                compiled_regexp = compile_regexp(regexp)
                 if compiled_regexp.search(target):
                     return True
             return False
@@ -57,24 +146,42 @@ class ConfigFilters:
     # variables
     excluded_tables: List[ExcludedTable] = None
     excluded_principal_emails: List[str] = None
+    _compiled: Optional[CompiledConfigFilters] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def parse(cls, block: Dict[str, Any]):
         excluded_tables = block.get("excluded_tables", [])
-        return ConfigFilters(
+        filters = ConfigFilters(
             excluded_tables=[ConfigFilters.ExcludedTable.parse(b) for b in excluded_tables],
             excluded_principal_emails=block.get("excluded_principal_emails", [])
         )
+        filters.compile()
+        return filters
+
+    def compile(self) -> CompiledConfigFilters:
+        """Compile the filters.
+
+        It should be called again, if the excluded tables or emails are modified.
+        """
+        self._compiled = CompiledConfigFilters(
+            excluded_tables=self.excluded_tables or [],
+            excluded_principal_emails=self.excluded_principal_emails or [])
+        return self._compiled
+
+    @property
+    def compiled(self) -> CompiledConfigFilters:
+        """Get the compiled filters, compiling them at first if necessary."""
+        if self._compiled is None:
+            self.compile()
+        return self._compiled
 
     def is_excluded_table(self, project: str, dataset: str, table: str):
-        """Check if a given email is matched with any of excluded table."""
-        return any([x.match(project=project, dataset=dataset, table=table)
-                    for x in self.excluded_tables])
+        """Check if a given table is matched with any of excluded table."""
+        return self.compiled.is_excluded_table(project=project, dataset=dataset, table=table)
 
     def is_excluded_principal_email(self, email: str):
         """Check if a given email is matched with any of excluded principal emails."""
-        regexps = [re.compile(r'{}'.format(e)) for e in self.excluded_principal_emails]
-        return any([regexp.search(email) for regexp in regexps])
+        return self.compiled.is_excluded_principal_email(email)
 
 
 @dataclass
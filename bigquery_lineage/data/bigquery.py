@@ -1,19 +1,127 @@
 # -*- coding: utf-8 -*-
+# pylint: disable=logging-format-interpolation
 from __future__ import absolute_import, division, print_function
 
+import functools
 import json
 import os
 import pickle
-from typing import List
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import jinja2
 from google.cloud import bigquery
 
-from bigquery_lineage.config import Config
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+from bigquery_lineage.compression import FrameWriter, add_compression_suffix, validate_compression
+from bigquery_lineage.config import Config, ConfigSource
+from bigquery_lineage.data.client_pool import BigQueryClientPool
+from bigquery_lineage.data.planner import (
+    OVER_BUDGET_REFUSE, OVER_BUDGET_SPLIT, OVER_BUDGETS, BudgetExceededError, ExportPlan, check_budget,
+    format_bytes, plan_date_ranges
+)
+from bigquery_lineage.data.sharding import (
+    DEFAULT_RETRY_INTERVAL, DEFAULT_SHARD_RETRIES, SHARD_BYS, Shard, ShardTooLargeError, get_dataset_partition,
+    get_shard_partition, shard_date_range
+)
+from bigquery_lineage.data.watermark import Watermark
 from bigquery_lineage.logger import get_logger
-from bigquery_lineage.utils import serialize_json
+from bigquery_lineage.utils import parse_timestamp, serialize_json
 
 AUDITLOG_FILE_NAME = "auditlog.json"
+AUDITLOG_PARQUET_FILE_NAME = "auditlog.parquet"
+
+QUERY_TEMPLATE = "get_insert_logs_v1.sql"
+INCREMENTAL_QUERY_TEMPLATE = "get_insert_logs_incremental_v1.sql"
+# A template which selects only the columns lineage needs.
+LINEAGE_QUERY_TEMPLATE = "get_lineage_logs_v1.sql"
+
+EXPORT_FORMAT_JSON = "json"
+EXPORT_FORMAT_PARQUET = "parquet"
+EXPORT_FORMATS = [EXPORT_FORMAT_JSON, EXPORT_FORMAT_PARQUET]
+
+# The number of rows in a page of query results.
+DEFAULT_PAGE_SIZE = 10000
+# The number of pages to fetch ahead while writing the current page.
+DEFAULT_PREFETCH_PAGES = 2
+# The number of sources to export concurrently.
+DEFAULT_MAX_WORKERS = 4
+# The buffer size of a file to write query results to.
+DEFAULT_WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+_END_OF_PAGES = object()
+
+
+def prefetch(iterable: Iterable[Any], size: int = DEFAULT_PREFETCH_PAGES) -> Iterator[Any]:
+    """Iterate items while fetching the next items on a background thread.
+
+    Args:
+        iterable: items to fetch, such as pages of query results
+        size: the maximum number of items to fetch ahead
+
+    An exception raised while fetching items is raised to the caller.
+    """
+    items = queue.Queue(maxsize=max(size, 1))
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END_OF_PAGES, None))
+        # pylint: disable=broad-except
+        except Exception as e:
+            put((_END_OF_PAGES, e))
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _END_OF_PAGES:
+                break
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def open_auditlog_writer(path: str,
+                         compression: str = None,
+                         buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+                         append: bool = False):
+    """Open a text writer of lines, which compresses them into independent frames with a compression.
+
+    Appended frames are still a valid compressed file.
+    """
+    if compression is None:
+        return open(path, "a" if append else "w", buffering=buffer_size)
+    # pylint: disable=consider-using-with
+    return FrameWriter(open(path, "ab" if append else "wb", buffering=buffer_size), compression=compression)
 
 
 def build_query_job_config(**kwargs) -> bigquery.QueryJobConfig:
@@ -29,55 +137,625 @@ def build_query_job_config(**kwargs) -> bigquery.QueryJobConfig:
     return job_config
 
 
+@dataclass
+class ExportResult:
+    source: ConfigSource
+    saved_path: str = None
+    error: Exception = None
+    # Dry-run plans of the source and their total bytes
+    plans: List[ExportPlan] = None
+    total_bytes_processed: int = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(template_name: str) -> jinja2.Template:
+    """Get a compiled template of a query. The environment and the templates are loaded only once."""
+    return get_template_environment().get_template(template_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_environment() -> jinja2.Environment:
+    path = os.path.join(os.path.dirname(__file__), "template")
+    template_loader = jinja2.FileSystemLoader(searchpath=path)
+    return jinja2.Environment(loader=template_loader, autoescape=True)
+
+
 class BigQueryDataCollector:
 
     def __init__(self,
                  output: str,
                  bql_config: Config,
-                 job_config: bigquery.QueryJobConfig = build_query_job_config()):
+                 job_config: bigquery.QueryJobConfig = build_query_job_config(),
+                 page_size: int = DEFAULT_PAGE_SIZE,
+                 prefetch_pages: int = DEFAULT_PREFETCH_PAGES,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 incremental: bool = False,
+                 lineage_only: bool = False,
+                 order_by: bool = True,
+                 export_format: str = EXPORT_FORMAT_JSON,
+                 compression: str = None,
+                 client_pool: BigQueryClientPool = None,
+                 max_bytes: int = None,
+                 over_budget: str = OVER_BUDGET_REFUSE,
+                 shard_by: str = None,
+                 max_rows_per_shard: int = None,
+                 shard_retries: int = DEFAULT_SHARD_RETRIES,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL):
+        """
+        Args:
+            max_bytes: the byte budget of a query of a source. Queries are dry-run before they run, if it is given.
+            over_budget: `refuse` to fail a source over the budget, or `split` to split its date range in halves
+                         until each query is within the budget
+            shard_by: shard the date range of a source by `day` or `week` into queries which run concurrently
+                      and write separate part files
+            max_rows_per_shard: a shard which returns as many rows is split, because it may be truncated.
+                                It is the limit in the config by default.
+            shard_retries: the number of retries of a failed shard
+            retry_interval: the seconds to wait before the first retry of a shard
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError("Unsupported export format: {}".format(export_format))
+        if over_budget not in OVER_BUDGETS:
+            raise ValueError("Unsupported over budget action: {}".format(over_budget))
+        if over_budget == OVER_BUDGET_SPLIT and export_format != EXPORT_FORMAT_JSON:
+            raise ValueError("Splitting a source supports only {}".format(EXPORT_FORMAT_JSON))
+        validate_compression(compression)
+        if compression is not None and export_format != EXPORT_FORMAT_JSON:
+            raise ValueError("Compression supports only {}".format(EXPORT_FORMAT_JSON))
+        if incremental is True and export_format != EXPORT_FORMAT_JSON:
+            raise ValueError("The incremental mode supports only {}".format(EXPORT_FORMAT_JSON))
+        if shard_by is not None and shard_by not in SHARD_BYS:
+            raise ValueError("Unsupported shard: {}".format(shard_by))
+        if shard_by is not None and incremental is True:
+            raise ValueError("The incremental mode doesn't support sharding")
         self._output = output
         self._bql_config = bql_config
         self._job_config = job_config
+        self._page_size = page_size
+        self._prefetch_pages = prefetch_pages
+        self._max_workers = max_workers
+        self._incremental = incremental
+        self._lineage_only = lineage_only
+        self._order_by = order_by
+        self._export_format = export_format
+        self._compression = compression
+        # Clients are shared by sources of the same project, and an HTTP session is shared by all of them.
+        if client_pool is None:
+            client_pool = BigQueryClientPool(max_connections=max(max_workers, 1))
+        self._client_pool = client_pool
+        self._max_bytes = max_bytes
+        self._over_budget = over_budget
+        self._dry_run_job_config = build_query_job_config(dry_run=True, use_query_cache=False)
+        self._shard_by = shard_by
+        self._max_rows_per_shard = max_rows_per_shard
+        self._shard_retries = shard_retries
+        self._retry_interval = retry_interval
+        # Slots of concurrent queries of shards, which are shared by all sources.
+        self._query_slots = threading.BoundedSemaphore(max(max_workers, 1))
 
-    def export_logs(self, dry_run: bool = True) -> None:
+    def export_logs(self, dry_run: bool = True) -> List[ExportResult]:
         """Export BigQuery audit logs to files respectively
-        The outputs are files. Each file contains audit logs in a GCP project.
+        The outputs are files. Each file contains audit logs of a source, that is, a dataset in a GCP project.
+
+        Sources are exported concurrently up to `max_workers`.
+        A failure in a source doesn't abort the others.
+        A dry run only plans the queries with dry-run jobs.
         """
+        if dry_run is True:
+            return self.plan_exports()
+
         logger = get_logger()
 
-        for source in self._bql_config.sources:
-            project = source.project
-            dataset = source.dataset
-            query = self.generate_query(
-                project=project,
-                dataset=dataset,
-                start_date=self._bql_config.start,
-                end_date=self._bql_config.end,
-                limit=self._bql_config.limit)
+        sources = self._bql_config.sources or []
+        results = []
+        with ThreadPoolExecutor(max_workers=max(self._max_workers, 1)) as executor:
+            futures = {
+                executor.submit(self.export_source, source=source, dry_run=dry_run): source
+                for source in sources
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    result = ExportResult(source=source, saved_path=future.result())
+                    logger.info("[{}/{}] Exported {}.{}".format(
+                        len(results) + 1, len(sources), source.project, source.dataset))
+                # pylint: disable=broad-except
+                except Exception as e:
+                    result = ExportResult(source=source, error=e)
+                    logger.error("[{}/{}] Failed to export {}.{}: {}".format(
+                        len(results) + 1, len(sources), source.project, source.dataset, e))
+                results.append(result)
+
+        failures = [result for result in results if result.error is not None]
+        if failures:
+            logger.error("Failed to export {} of {} sources: {}".format(
+                len(failures), len(sources),
+                ", ".join("{}.{}".format(x.source.project, x.source.dataset) for x in failures)))
+        return results
+
+    def plan_exports(self) -> List[ExportResult]:
+        """Plan queries of all sources with concurrent dry-run jobs, and report their bytes processed.
+
+        A source over the byte budget is reported as an error in the `refuse` mode.
+        """
+        logger = get_logger()
+
+        sources = self._bql_config.sources or []
+        results = []
+        with ThreadPoolExecutor(max_workers=max(self._max_workers, 1)) as executor:
+            futures = {executor.submit(self.plan_source, source=source): source for source in sources}
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    plans = future.result()
+                # pylint: disable=broad-except
+                except Exception as e:
+                    results.append(ExportResult(source=source, error=e))
+                    logger.error("[{}/{}] Failed to plan {}.{}: {}".format(
+                        len(results), len(sources), source.project, source.dataset, e))
+                    continue
+                result = ExportResult(source=source, plans=plans,
+                                      total_bytes_processed=sum(x.total_bytes_processed or 0 for x in plans))
+                try:
+                    check_budget(plans=plans, max_bytes=self._max_bytes)
+                except BudgetExceededError as e:
+                    result.error = e
+                results.append(result)
+                logger.info("[{}/{}] {}.{} would process {} in {} queries{}".format(
+                    len(results), len(sources), source.project, source.dataset,
+                    format_bytes(result.total_bytes_processed), len(plans),
+                    "" if result.error is None else ": {}".format(result.error)))
+
+        logger.info("Sources would process {} in total".format(
+            format_bytes(sum(x.total_bytes_processed or 0 for x in results))))
+        return results
+
+    def plan_source(self, source: ConfigSource) -> List[ExportPlan]:
+        """Plan queries of a source with dry-run jobs.
+
+        In the `split` mode, a date range over the byte budget is split in halves until each of them fits.
+        """
+        watermark = None
+        if self._incremental is True:
+            watermark = Watermark.load(path=self._output, source=source).timestamp
+
+        def estimate(start_date: str, end_date: str) -> int:
+            query = self.generate_source_query(
+                source=source, watermark=watermark, start_date=start_date, end_date=end_date)
+            query_job = self.execute_query(
+                project=source.project, query=query, job_config=self._dry_run_job_config)
+            return query_job.total_bytes_processed
+
+        return plan_date_ranges(
+            source=source,
+            start_date=self._bql_config.start,
+            end_date=self._bql_config.end,
+            estimate=estimate,
+            max_bytes=self._max_bytes,
+            split=self._over_budget == OVER_BUDGET_SPLIT)
+
+    def plan_source_within_budget(self, source: ConfigSource) -> List[ExportPlan]:
+        """Plan queries of a source before running them.
+
+        Without a byte budget, a source is a single query over the date range in the config.
+
+        Raises:
+            BudgetExceededError: if any query is over the byte budget
+        """
+        if self._max_bytes is None:
+            return [ExportPlan(source=source, start_date=self._bql_config.start, end_date=self._bql_config.end)]
+        plans = self.plan_source(source=source)
+        check_budget(plans=plans, max_bytes=self._max_bytes)
+        return plans
+
+    def export_source(self, source: ConfigSource, dry_run: bool = True) -> Optional[str]:
+        """Export BigQuery audit logs of a source to `<output>/<project>/dataset=<dataset>/<filename>`.
+
+        In the incremental mode, only audit logs newer than the watermark of the source are exported
+        to date-partitioned files, and then the watermark is moved forward.
+        Queries of split date ranges are appended to the file in order.
+
+        Returns:
+            the saved path, or None if it is a dry run.
+        """
+        if dry_run is True:
+            self.plan_source(source=source)
+            return None
+        if self._incremental is True:
+            return self.export_source_incrementally(source=source)
+        if self._shard_by is not None:
+            return self.export_source_in_shards(source=source)
+
+        logger = get_logger()
+
+        # Sources of the same project run concurrently, so each of them has its own file.
+        partition = get_dataset_partition(source.dataset)
+        saved_path = None
+        for i, plan in enumerate(self.plan_source_within_budget(source=source)):
+            query = self.generate_source_query(source=source, start_date=plan.start_date, end_date=plan.end_date)
             logger.info(query)
 
+            logger.info("Execute a query for {}.{} from {} to {}".format(
+                source.project, source.dataset, plan.start_date, plan.end_date))
             query_job = self.execute_query(
-                project=project, query=query, job_config=self._job_config)
-            if dry_run is False:
-                saved_path = self.save_results(path=self._output, query_job=query_job)
-                # pylint: disable=logging-not-lazy
-                logger.info("Saved at %s" % saved_path)
+                project=source.project, query=query, job_config=self._job_config)
+            if self._export_format == EXPORT_FORMAT_PARQUET:
+                saved_path = self.save_results_as_parquet(
+                    path=self._output, query_job=query_job, page_size=self._page_size,
+                    bqstorage_client=self._client_pool.get_bqstorage_client(), partition=partition)
+            else:
+                saved_path = self.save_results(
+                    path=self._output, query_job=query_job,
+                    page_size=self._page_size, prefetch_pages=self._prefetch_pages,
+                    compression=self._compression, append=i > 0, partition=partition)
+        # pylint: disable=logging-not-lazy
+        logger.info("Saved at %s" % saved_path)
+        return saved_path
+
+    def export_source_in_shards(self, source: ConfigSource) -> str:
+        """Export BigQuery audit logs of a source in shards of its date range.
+
+        Shards of all sources run concurrently up to `max_workers`, and each of them is written to
+        `<output>/<project>/dataset=<dataset>/shard=YYYYMMDD-YYYYMMDD/<filename>`.
+        A failed shard is retried on its own, and a shard over a row or byte threshold is split in halves.
+        Part files are staged in a hidden directory next to the directory of the dataset,
+        which replaces it only after all shards succeed. So a failure keeps the previous export.
+
+        Returns:
+            the directory of the part files.
+        """
+        logger = get_logger()
+
+        project_dir = os.path.join(self._output, source.project)
+        dataset_partition = get_dataset_partition(source.dataset)
+        dataset_dir = os.path.join(project_dir, dataset_partition)
+        os.makedirs(project_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(dir=project_dir, prefix=".{}.".format(dataset_partition), suffix=".tmp")
+        partition = os.path.basename(staging_dir)
+        shards = shard_date_range(self._bql_config.start, self._bql_config.end, shard_by=self._shard_by)
+        saved_paths = []
+        try:
+            with ThreadPoolExecutor(max_workers=max(self._max_workers, 1)) as executor:
+                futures = {
+                    executor.submit(self.export_shard, source=source, shard=shard, partition=partition): shard
+                    for shard in shards
+                }
+                # Failed shards are resubmitted after their delays, so that no worker sleeps.
+                retries: List[Tuple[float, Shard]] = []
+                while futures or retries:
+                    now = time.monotonic()
+                    for retry_at, shard in retries:
+                        if retry_at <= now:
+                            futures[executor.submit(
+                                self.export_shard, source=source, shard=shard, partition=partition)] = shard
+                    retries = [x for x in retries if x[0] > now]
+                    timeout = min(x[0] for x in retries) - now if retries else None
+                    if not futures:
+                        time.sleep(timeout)
+                        continue
+                    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        shard = futures.pop(future)
+                        try:
+                            saved_paths.append(future.result())
+                        except ShardTooLargeError as e:
+                            logger.info("Split a shard of {}.{}: {}".format(source.project, source.dataset, e))
+                            for half in shard.split():
+                                futures[executor.submit(
+                                    self.export_shard, source=source, shard=half, partition=partition)] = half
+                        except BudgetExceededError:
+                            for pending in futures:
+                                pending.cancel()
+                            raise
+                        # pylint: disable=broad-except
+                        except Exception as e:
+                            shard.attempts += 1
+                            if shard.attempts > self._shard_retries:
+                                for pending in futures:
+                                    pending.cancel()
+                                raise
+                            logger.warning("Retry a shard of {}.{} from {} to {} ({}/{}): {}".format(
+                                source.project, source.dataset, shard.start_date, shard.end_date,
+                                shard.attempts, self._shard_retries, e))
+                            delay = self._retry_interval * 2 ** (shard.attempts - 1)
+                            retries.append((time.monotonic() + delay, shard))
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        # Part files of a previous export may have other shards.
+        previous_dir = "{}.old".format(staging_dir)
+        if os.path.exists(dataset_dir):
+            os.rename(dataset_dir, previous_dir)
+        os.rename(staging_dir, dataset_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        logger.info("Saved {} shards of {}.{}".format(len(saved_paths), source.project, source.dataset))
+        return dataset_dir
+
+    def export_shard(self, source: ConfigSource, shard: Shard, partition: str = None) -> str:
+        """Export BigQuery audit logs of a source in a shard to a part file.
+
+        Shards of all sources share `max_workers` slots to run queries,
+        because each source runs its shards on its own executor.
+
+        Args:
+            partition: the directory of part files under the directory of the project,
+                       which is the directory of the dataset by default
+
+        Raises:
+            ShardTooLargeError: if the shard has to be split
+            BudgetExceededError: if a single day is over the byte budget
+        """
+        with self._query_slots:
+            return self._export_shard(source=source, shard=shard, partition=partition)
+
+    def _export_shard(self, source: ConfigSource, shard: Shard, partition: str = None) -> str:
+        logger = get_logger()
+
+        query = self.generate_source_query(source=source, start_date=shard.start_date, end_date=shard.end_date)
+        if self._max_bytes is not None:
+            query_job = self.execute_query(project=source.project, query=query, job_config=self._dry_run_job_config)
+            plan = ExportPlan(source=source, start_date=shard.start_date, end_date=shard.end_date,
+                              total_bytes_processed=query_job.total_bytes_processed)
+            if plan.is_over_budget(self._max_bytes):
+                if shard.split() is None:
+                    check_budget(plans=[plan], max_bytes=self._max_bytes)
+                raise ShardTooLargeError("{} to {} would process {}".format(
+                    shard.start_date, shard.end_date, format_bytes(plan.total_bytes_processed)))
+
+        query_job = self.execute_query(project=source.project, query=query, job_config=self._job_config)
+        total_rows = query_job.result(page_size=self._page_size).total_rows
+        max_rows = self._max_rows_per_shard or self._bql_config.limit
+        if max_rows and total_rows is not None and total_rows >= max_rows:
+            if shard.split() is not None:
+                raise ShardTooLargeError("{} to {} returned {} rows".format(
+                    shard.start_date, shard.end_date, total_rows))
+            logger.warning("{}.{} on {} returned {} rows, which may be truncated by the limit".format(
+                source.project, source.dataset, shard.start_date, total_rows))
+
+        if partition is None:
+            partition = get_shard_partition(dataset=source.dataset, shard=shard)
+        else:
+            partition = os.path.join(partition, shard.partition)
+        if self._export_format == EXPORT_FORMAT_PARQUET:
+            return self.save_results_as_parquet(
+                path=self._output, query_job=query_job, page_size=self._page_size,
+                bqstorage_client=self._client_pool.get_bqstorage_client(), partition=partition)
+        return self.save_results(
+            path=self._output, query_job=query_job, page_size=self._page_size,
+            prefetch_pages=self._prefetch_pages, compression=self._compression, partition=partition)
+
+    def export_source_incrementally(self, source: ConfigSource) -> str:
+        """Export BigQuery audit logs of a source newer than its watermark.
+
+        Returns:
+            the directory of the date-partitioned files.
+        """
+        logger = get_logger()
+
+        watermark = Watermark.load(path=self._output, source=source)
+        staged_paths: List[Tuple[str, str]] = []
+        last_timestamp = None
+        try:
+            for plan in self.plan_source_within_budget(source=source):
+                query = self.generate_source_query(source=source, watermark=watermark.timestamp,
+                                                   start_date=plan.start_date, end_date=plan.end_date)
+                logger.info(query)
+
+                logger.info("Execute a query for {}.{} since {} from {} to {}".format(
+                    source.project, source.dataset, watermark.timestamp, plan.start_date, plan.end_date))
+                query_job = self.execute_query(
+                    project=source.project, query=query, job_config=self._job_config)
+                plan_tmp_paths, plan_last_timestamp = self.stage_partitioned_results(
+                    path=self._output, query_job=query_job,
+                    page_size=self._page_size, prefetch_pages=self._prefetch_pages,
+                    compression=self._compression, partition=get_dataset_partition(source.dataset))
+                staged_paths.extend(plan_tmp_paths.items())
+                if plan_last_timestamp is not None \
+                        and (last_timestamp is None or plan_last_timestamp > last_timestamp):
+                    last_timestamp = plan_last_timestamp
+        except BaseException:
+            for _, tmp_path in staged_paths:
+                os.remove(tmp_path)
+            raise
+        # The rows of all queries are appended right before the watermark moves forward,
+        # so that a failure in any query doesn't leave rows behind which a rerun exports again.
+        saved_paths = self.commit_partitioned_results(staged_paths)
+        if last_timestamp is not None:
+            watermark.timestamp = last_timestamp.isoformat()
+            watermark.save(path=self._output)
+        logger.info("Saved {} partitions of {}.{} up to {}".format(
+            len(saved_paths), source.project, source.dataset, watermark.timestamp))
+        return os.path.join(self._output, source.project, get_dataset_partition(source.dataset))
+
+    def generate_source_query(self,
+                              source: ConfigSource,
+                              watermark: str = None,
+                              start_date: str = None,
+                              end_date: str = None) -> str:
+        """Generate a query of a source with the template of the export mode.
+
+        The date range is the one in the config, unless it is given.
+        """
+        if self._lineage_only is True:
+            template_name = LINEAGE_QUERY_TEMPLATE
+        elif self._incremental is True:
+            template_name = INCREMENTAL_QUERY_TEMPLATE
+        else:
+            template_name = QUERY_TEMPLATE
+        return self.generate_query(
+            project=source.project,
+            dataset=source.dataset,
+            start_date=start_date or self._bql_config.start,
+            end_date=end_date or self._bql_config.end,
+            limit=self._bql_config.limit,
+            watermark=watermark,
+            template_name=template_name,
+            # The incremental mode needs the sorted results to move the watermark forward correctly.
+            order_by=self._order_by or self._incremental,
+            incremental=self._incremental)
+
+    @staticmethod
+    def save_partitioned_results(
+            path: str,
+            query_job: bigquery.QueryJob,
+            filename=AUDITLOG_FILE_NAME,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            prefetch_pages: int = DEFAULT_PREFETCH_PAGES,
+            buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+            compression: str = None,
+            partition: str = None) -> Tuple[List[str], Optional[datetime]]:
+        """Append a query result to files partitioned by the date of `timestamp`.
+
+        The rows are staged in temporary files with `stage_partitioned_results` at first,
+        and then appended with `commit_partitioned_results`.
+
+        Returns:
+            the saved paths and the last timestamp in the result.
+        """
+        tmp_paths, last_timestamp = BigQueryDataCollector.stage_partitioned_results(
+            path=path, query_job=query_job, filename=filename, page_size=page_size,
+            prefetch_pages=prefetch_pages, buffer_size=buffer_size, compression=compression, partition=partition)
+        return BigQueryDataCollector.commit_partitioned_results(tmp_paths.items()), last_timestamp
+
+    @staticmethod
+    def stage_partitioned_results(
+            path: str,
+            query_job: bigquery.QueryJob,
+            filename=AUDITLOG_FILE_NAME,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            prefetch_pages: int = DEFAULT_PREFETCH_PAGES,
+            buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+            compression: str = None,
+            partition: str = None) -> Tuple[Dict[str, str], Optional[datetime]]:
+        """Write a query result to unique temporary files partitioned by the date of `timestamp`.
+
+        Each temporary file is next to `<path>/<project>/<partition>/date=YYYY-MM-DD/<filename>`,
+        so that a failure while downloading doesn't leave partial rows behind.
+        Each source has its own `partition`, because sources of the same project run concurrently.
+
+        Returns:
+            the temporary paths by the saved paths, and the last timestamp in the result.
+        """
+        saved_dir = os.path.join(path, query_job.project, partition or "")
+        filename = add_compression_suffix(filename, compression)
+        encoder = json.JSONEncoder(default=serialize_json)
+        tmp_paths: Dict[str, str] = {}
+        files = {}
+        last_timestamp = None
+        # pylint: disable=consider-using-with
+        try:
+            pages = query_job.result(page_size=page_size).pages
+            for page in prefetch(pages, size=prefetch_pages):
+                lines: Dict[str, List[str]] = {}
+                for row in page:
+                    row = dict(row)
+                    timestamp = parse_timestamp(row["timestamp"])
+                    if last_timestamp is None or timestamp > last_timestamp:
+                        last_timestamp = timestamp
+                    saved_path = os.path.join(
+                        saved_dir, "date={}".format(timestamp.date().isoformat()), filename)
+                    lines.setdefault(saved_path, []).append(encoder.encode(row) + "\n")
+                for saved_path, partition_lines in lines.items():
+                    if saved_path not in files:
+                        os.makedirs(os.path.dirname(saved_path), exist_ok=True)
+                        fd, tmp_paths[saved_path] = tempfile.mkstemp(
+                            dir=os.path.dirname(saved_path), prefix="{}.".format(filename), suffix=".tmp")
+                        os.close(fd)
+                        files[saved_path] = open_auditlog_writer(
+                            tmp_paths[saved_path], compression=compression, buffer_size=buffer_size)
+                    files[saved_path].write("".join(partition_lines))
+        except BaseException:
+            for fp in files.values():
+                fp.close()
+            for tmp_path in tmp_paths.values():
+                os.remove(tmp_path)
+            raise
+        for fp in files.values():
+            fp.close()
+        return tmp_paths, last_timestamp
+
+    @staticmethod
+    def commit_partitioned_results(tmp_paths: Iterable[Tuple[str, str]]) -> List[str]:
+        """Append staged temporary files to their saved paths in order, and remove them.
+
+        Compressed frames are appended as they are, because concatenated frames are still a valid file.
+
+        Returns:
+            the saved paths.
+        """
+        saved_paths = set()
+        for saved_path, tmp_path in tmp_paths:
+            with open(tmp_path, "rb") as src, open(saved_path, "ab") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(tmp_path)
+            saved_paths.add(saved_path)
+        return sorted(saved_paths)
 
     @staticmethod
     def save_results(
             path: str,
             query_job: bigquery.QueryJob,
-            filename=AUDITLOG_FILE_NAME) -> str:
-        """Save a query result to a file."""
-        saved_dir = os.path.join(path, query_job.project)
+            filename=AUDITLOG_FILE_NAME,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            prefetch_pages: int = DEFAULT_PREFETCH_PAGES,
+            buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE,
+            compression: str = None,
+            append: bool = False,
+            partition: str = None) -> str:
+        """Save a query result to a file.
+
+        The next pages of the result are fetched on a background thread
+        while the current page is written in a batch.
+        With a compression, the file is written in independently decompressible frames
+        so that it can be parsed in parallel.
+        With `append`, the result is appended to the file.
+        With `partition`, the file is saved in the sub-directory of the project.
+        """
+        saved_dir = os.path.join(path, query_job.project, partition or "")
+        saved_path = os.path.join(saved_dir, add_compression_suffix(filename, compression))
+        os.makedirs(saved_dir, exist_ok=True)
+        encoder = json.JSONEncoder(default=serialize_json)
+        with open_auditlog_writer(saved_path, compression=compression, buffer_size=buffer_size,
+                                  append=append) as fp:
+            pages = query_job.result(page_size=page_size).pages
+            for page in prefetch(pages, size=prefetch_pages):
+                lines = [encoder.encode(dict(row)) + "\n" for row in page]
+                fp.write("".join(lines))
+        return saved_path
+
+    @staticmethod
+    def save_results_as_parquet(
+            path: str,
+            query_job: bigquery.QueryJob,
+            filename=AUDITLOG_PARQUET_FILE_NAME,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            bqstorage_client=None,
+            partition: str = None) -> str:
+        """Save a query result to a Parquet file.
+
+        The result is downloaded as Arrow record batches through the BigQuery Storage Read API,
+        if a client of it is given. Otherwise, it is downloaded through the REST API.
+        With `partition`, the file is saved in the sub-directory of the project.
+        """
+        if pq is None:
+            raise ImportError("pyarrow is required to save results as Parquet")
+        saved_dir = os.path.join(path, query_job.project, partition or "")
         saved_path = os.path.join(saved_dir, filename)
         os.makedirs(saved_dir, exist_ok=True)
-        # pylint: disable=unnecessary-comprehension
-        with open(saved_path, "w") as fp:
-            # results = [dict(row) for row in query_job.result()]
-            for row in query_job.result():
-                row_json = json.dumps(dict(row), default=serialize_json)
-                fp.write(row_json + "\n")
+        rows = query_job.result(page_size=page_size)
+        writer = None
+        try:
+            for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client):
+                if writer is None:
+                    writer = pq.ParquetWriter(saved_path, batch.schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            # Write an empty file for an empty result.
+            pq.write_table(pyarrow.table({}), saved_path)
         return saved_path
 
     @staticmethod
@@ -92,13 +770,17 @@ class BigQueryDataCollector:
             dataset: str,
             start_date: str,
             end_date: str,
-            limit: int = 100000) -> str:
-        """Generate query"""
-        # Get template file
-        path = os.path.join(os.path.dirname(__file__), "template")
-        template_loader = jinja2.FileSystemLoader(searchpath=path)
-        template_env = jinja2.Environment(loader=template_loader, autoescape=True)
-        template = template_env.get_template("get_insert_logs_v1.sql")
+            limit: int = 100000,
+            watermark: str = None,
+            template_name: str = QUERY_TEMPLATE,
+            order_by: bool = True,
+            incremental: bool = False) -> str:
+        """Generate query
+
+        An incremental query has no limit, because the limit could cut off rows which share
+        the last timestamp, and the next query after the watermark would skip the rest of them.
+        """
+        template = get_template(template_name)
 
         # Render queries with the template.
         query = template.render(
@@ -107,15 +789,28 @@ class BigQueryDataCollector:
             start_date=start_date,
             end_date=end_date,
             limit=limit,
+            watermark=watermark,
+            order_by=order_by,
+            incremental=incremental,
         )
         return query
 
-    @staticmethod
     def execute_query(
+            self,
             project: str,
             query: str,
             job_config: bigquery.QueryJobConfig = build_query_job_config()) -> bigquery.QueryJob:
-        """Execute a BigQuery query"""
-        client = bigquery.Client(project=project, default_query_job_config=job_config)
-        query_job = client.query(query)
+        """Execute a BigQuery query with the pooled client of a project
+
+        It is an instance method rather than a static method since the client pool was added,
+        so it has to be called on a collector, and a subclass overrides it as
+        `def execute_query(self, project, query, job_config=None)`.
+        `job_config` is passed to the query rather than as the default config of a new client.
+        """
+        client = self._client_pool.get(project)
+        query_job = client.query(query, job_config=job_config)
         return query_job
+
+    def close(self):
+        """Close the pooled clients."""
+        self._client_pool.close()
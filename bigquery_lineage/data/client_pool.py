@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import threading
+from typing import Callable, Dict
+
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery
+from requests.adapters import HTTPAdapter
+
+try:
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
+
+DEFAULT_MAX_CONNECTIONS = 10
+
+
+def create_bqstorage_client():
+    """Create a client of the BigQuery Storage Read API, if google-cloud-bigquery-storage is installed."""
+    if bigquery_storage is None:
+        return None
+    return bigquery_storage.BigQueryReadClient()
+
+
+def create_authorized_session(credentials, max_connections: int = DEFAULT_MAX_CONNECTIONS) -> AuthorizedSession:
+    """Create an authorized HTTP session whose connection pool is large enough for concurrent exports."""
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    return session
+
+
+class BigQueryClientPool:
+    """A thread-safe pool of BigQuery clients keyed by project.
+
+    Clients share the credentials and an HTTP session with its connection pool,
+    so that exporting hundreds of sources doesn't repeat authentication and TLS handshakes.
+    """
+
+    def __init__(self,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 client_factory: Callable[..., bigquery.Client] = None):
+        """
+        Args:
+            max_connections: the maximum number of connections in the shared HTTP session
+            client_factory: a function to create a client from `project`, `credentials` and `_http`.
+                            It is `bigquery.Client` by default.
+        """
+        self._max_connections = max_connections
+        self._client_factory = client_factory or bigquery.Client
+        self._lock = threading.Lock()
+        self._clients: Dict[str, bigquery.Client] = {}
+        self._credentials = None
+        self._session = None
+        self._bqstorage_client = None
+        self._bqstorage_client_created = False
+
+    def get(self, project: str) -> bigquery.Client:
+        """Get the client of a project, creating it at first."""
+        with self._lock:
+            client = self._clients.get(project)
+            if client is None:
+                # A custom factory resolves its own credentials.
+                if self._session is None and self._client_factory is bigquery.Client:
+                    self._credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+                    self._session = create_authorized_session(self._credentials, self._max_connections)
+                client = self._client_factory(project=project, credentials=self._credentials, _http=self._session)
+                self._clients[project] = client
+            return client
+
+    def get_bqstorage_client(self):
+        """Get the shared client of the BigQuery Storage Read API. It is None, if it isn't installed."""
+        with self._lock:
+            if not self._bqstorage_client_created:
+                self._bqstorage_client = create_bqstorage_client()
+                self._bqstorage_client_created = True
+            return self._bqstorage_client
+
+    def __len__(self):
+        return len(self._clients)
+
+    def close(self):
+        """Close the clients and the shared HTTP session."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from bigquery_lineage.config import ConfigSource
+
+OVER_BUDGET_REFUSE = "refuse"
+OVER_BUDGET_SPLIT = "split"
+OVER_BUDGETS = [OVER_BUDGET_REFUSE, OVER_BUDGET_SPLIT]
+
+DateRange = Tuple[str, str]
+
+
+class BudgetExceededError(Exception):
+    """An error of a source whose queries would process more bytes than a budget."""
+
+
+@dataclass
+class ExportPlan:
+    """A query of a source over an inclusive date range with its estimated bytes."""
+    source: ConfigSource
+    start_date: str
+    end_date: str
+    total_bytes_processed: Optional[int] = None
+
+    def is_over_budget(self, max_bytes: Optional[int]) -> bool:
+        return (max_bytes is not None
+                and self.total_bytes_processed is not None
+                and self.total_bytes_processed > max_bytes)
+
+
+def split_date_range(start_date: str, end_date: str) -> Optional[Tuple[DateRange, DateRange]]:
+    """Split an inclusive date range in halves. It returns None for a single day."""
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if start >= end:
+        return None
+    middle = start + (end - start) // 2
+    return ((start.isoformat(), middle.isoformat()),
+            ((middle + timedelta(days=1)).isoformat(), end.isoformat()))
+
+
+def plan_date_ranges(source: ConfigSource,
+                     start_date: str,
+                     end_date: str,
+                     estimate: Callable[[str, str], int],
+                     max_bytes: int = None,
+                     split: bool = False) -> List[ExportPlan]:
+    """Plan queries of a source with dry runs.
+
+    Args:
+        source: a source to plan
+        start_date: the first date of the source
+        end_date: the last date of the source
+        estimate: a function which dry-runs a query over a date range and returns its bytes processed
+        max_bytes: the byte budget of a query
+        split: split a date range over the budget in halves until each of them is within the budget.
+               A single day over the budget is left as it is.
+
+    Returns:
+        plans in the order of their date ranges
+    """
+    plan = ExportPlan(source=source, start_date=start_date, end_date=end_date,
+                      total_bytes_processed=estimate(start_date, end_date))
+    if not split or not plan.is_over_budget(max_bytes):
+        return [plan]
+    halves = split_date_range(start_date, end_date)
+    if halves is None:
+        return [plan]
+    plans = []
+    for half_start_date, half_end_date in halves:
+        plans.extend(plan_date_ranges(source=source, start_date=half_start_date, end_date=half_end_date,
+                                      estimate=estimate, max_bytes=max_bytes, split=split))
+    return plans
+
+
+def check_budget(plans: List[ExportPlan], max_bytes: Optional[int]):
+    """Raise an error, if any of plans is over a byte budget."""
+    over_budget = [plan for plan in plans if plan.is_over_budget(max_bytes)]
+    if over_budget:
+        raise BudgetExceededError("{} bytes are over the budget of {} bytes: {}".format(
+            sum(plan.total_bytes_processed for plan in over_budget), max_bytes,
+            ", ".join("{}..{}".format(plan.start_date, plan.end_date) for plan in over_budget)))
+
+
+def format_bytes(num_bytes: Optional[int]) -> str:
+    """Format a number of bytes for humans."""
+    if num_bytes is None:
+        return "-"
+    value = float(num_bytes)
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if value < 1024 or unit == "TiB":
+            return "{:.1f} {}".format(value, unit) if unit != "B" else "{} B".format(num_bytes)
+        value /= 1024
+    return "{} B".format(num_bytes)
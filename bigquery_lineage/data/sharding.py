@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import os
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from bigquery_lineage.data.planner import split_date_range
+
+SHARD_BY_DAY = "day"
+SHARD_BY_WEEK = "week"
+SHARD_BYS = [SHARD_BY_DAY, SHARD_BY_WEEK]
+
+# The number of retries of a failed shard
+DEFAULT_SHARD_RETRIES = 2
+# The seconds to wait before the first retry, which doubles at each retry
+DEFAULT_RETRY_INTERVAL = 1.0
+
+
+class ShardTooLargeError(Exception):
+    """An error of a shard which has to be split, because it would exceed a row or byte threshold."""
+
+
+@dataclass
+class Shard:
+    """A query of a source over an inclusive range of `_TABLE_SUFFIX` dates, which is written to a part file."""
+    start_date: str
+    end_date: str
+    # The number of failed attempts
+    attempts: int = 0
+
+    @property
+    def partition(self) -> str:
+        """The directory of the part file under the directory of the dataset."""
+        return "shard={}-{}".format(self.start_date.replace("-", ""), self.end_date.replace("-", ""))
+
+    def split(self) -> Optional[Tuple["Shard", "Shard"]]:
+        """Split a shard in halves. It returns None for a single day."""
+        halves = split_date_range(self.start_date, self.end_date)
+        if halves is None:
+            return None
+        return tuple(Shard(start_date=start_date, end_date=end_date) for start_date, end_date in halves)
+
+
+def get_dataset_partition(dataset: str) -> str:
+    """Get the directory of the part files of a dataset under the directory of its project."""
+    return "dataset={}".format(dataset)
+
+
+def get_shard_partition(dataset: str, shard: Shard) -> str:
+    return os.path.join(get_dataset_partition(dataset), shard.partition)
+
+
+def shard_date_range(start_date: str, end_date: str, shard_by: str) -> List[Shard]:
+    """Shard an inclusive date range by day, or by ISO week from Monday to Sunday.
+
+    Weeks are aligned to Mondays rather than to the start date, so that the shards of
+    overlapping date ranges are the same as much as possible.
+    """
+    if shard_by not in SHARD_BYS:
+        raise ValueError("Unsupported shard: {}".format(shard_by))
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    shards = []
+    while start <= end:
+        if shard_by == SHARD_BY_DAY:
+            shard_end = start
+        else:
+            shard_end = min(start + timedelta(days=6 - start.weekday()), end)
+        shards.append(Shard(start_date=start.isoformat(), end_date=shard_end.isoformat()))
+        start = shard_end + timedelta(days=1)
+    return shards
@@ -0,0 +1,40 @@
+DECLARE start_date, end_date DATE;
+DECLARE watermark TIMESTAMP;
+SET watermark = {% if watermark %}TIMESTAMP("{{ watermark }}"){% else %}NULL{% endif %};
+-- Skip tables older than the watermark.
+SET start_date = GREATEST(DATE("{{ start_date }}"), IFNULL(DATE(watermark), DATE("{{ start_date }}")));
+SET end_date = DATE("{{ end_date }}");
+
+WITH
+auditlog AS (
+  SELECT *
+  FROM `{{ project }}.{{ dataset }}.cloudaudit_googleapis_com_data_access_*`
+  WHERE
+    _TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', start_date)
+                      AND FORMAT_DATE('%Y%m%d', end_date)
+    AND resource.type = "bigquery_resource"
+    AND (watermark IS NULL OR timestamp > watermark)
+)
+, job_compoeted AS (
+  SELECT *
+  FROM auditlog
+  WHERE
+    protopayload_auditlog.methodName = "jobservice.jobcompleted"
+    AND protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatus.state = "DONE"
+)
+, insert AS (
+  SELECT *
+  FROM auditlog
+  WHERE
+    protopayload_auditlog.methodName = "jobservice.insert"
+    AND protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobStatus.state = "DONE"
+)
+, unioned AS (
+  SELECT * FROM job_compoeted
+  UNION ALL
+  SELECT * FROM insert
+)
+
+-- No limit, which could cut off rows sharing the last timestamp behind the next watermark.
+SELECT * FROM unioned
+ORDER BY timestamp
@@ -0,0 +1,126 @@
+DECLARE start_date, end_date DATE;
+DECLARE watermark TIMESTAMP;
+SET watermark = {% if watermark %}TIMESTAMP("{{ watermark }}"){% else %}NULL{% endif %};
+-- Skip tables older than the watermark.
+SET start_date = GREATEST(DATE("{{ start_date }}"), IFNULL(DATE(watermark), DATE("{{ start_date }}")));
+SET end_date = DATE("{{ end_date }}");
+
+-- Select only the leaf columns which lineage needs, so that the other columns are neither scanned nor billed.
+-- The nested shape of the audit logs is kept, so that the same parser can read the results.
+WITH
+auditlog AS (
+  SELECT
+    timestamp,
+    resource.type AS resource_type,
+    resource.labels.project_id AS resource_project_id,
+    protopayload_auditlog.methodName AS method_name,
+    protopayload_auditlog.authenticationInfo.principalEmail AS principal_email,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.eventName AS event_name,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatus.state AS job_state,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.load.sourceUris
+      AS load_source_uris,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.load.destinationTable
+      AS load_destination_table,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.load.createDisposition
+      AS load_create_disposition,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.load.writeDisposition
+      AS load_write_disposition,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.query.query
+      AS query_query,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.query.destinationTable
+      AS query_destination_table,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.query.createDisposition
+      AS query_create_disposition,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobConfiguration.query.writeDisposition
+      AS query_write_disposition,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatistics.createTime AS create_time,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatistics.startTime AS start_time,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatistics.endTime AS end_time,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatistics.referencedTables
+      AS referenced_tables,
+    protopayload_auditlog.servicedata_v1_bigquery.jobCompletedEvent.job.jobStatistics.referencedViews
+      AS referenced_views,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobStatus.state AS insert_job_state,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobConfiguration.load.sourceUris
+      AS insert_load_source_uris,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobConfiguration.load.destinationTable
+      AS insert_load_destination_table,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobConfiguration.query.destinationTable
+      AS insert_query_destination_table,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobStatistics.endTime
+      AS insert_end_time,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobStatistics.referencedTables
+      AS insert_referenced_tables,
+    protopayload_auditlog.servicedata_v1_bigquery.jobInsertResponse.resource.jobStatistics.referencedViews
+      AS insert_referenced_views
+  FROM `{{ project }}.{{ dataset }}.cloudaudit_googleapis_com_data_access_*`
+  WHERE
+    _TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', start_date)
+                      AND FORMAT_DATE('%Y%m%d', end_date)
+    AND resource.type = "bigquery_resource"
+    AND (watermark IS NULL OR timestamp > watermark)
+)
+
+SELECT
+  timestamp,
+  STRUCT(
+    resource_type AS type,
+    STRUCT(resource_project_id AS project_id) AS labels
+  ) AS resource,
+  STRUCT(
+    method_name AS methodName,
+    STRUCT(principal_email AS principalEmail) AS authenticationInfo,
+    STRUCT(
+      STRUCT(
+        event_name AS eventName,
+        STRUCT(
+          STRUCT(
+            STRUCT(
+              load_source_uris AS sourceUris,
+              load_destination_table AS destinationTable,
+              load_create_disposition AS createDisposition,
+              load_write_disposition AS writeDisposition
+            ) AS load,
+            STRUCT(
+              query_query AS query,
+              query_destination_table AS destinationTable,
+              query_create_disposition AS createDisposition,
+              query_write_disposition AS writeDisposition
+            ) AS query
+          ) AS jobConfiguration,
+          STRUCT(
+            create_time AS createTime,
+            start_time AS startTime,
+            end_time AS endTime,
+            referenced_tables AS referencedTables,
+            referenced_views AS referencedViews
+          ) AS jobStatistics
+        ) AS job
+      ) AS jobCompletedEvent,
+      -- An insert response has the same lineage as a completed event.
+      STRUCT(
+        STRUCT(
+          STRUCT(
+            STRUCT(
+              insert_load_source_uris AS sourceUris,
+              insert_load_destination_table AS destinationTable
+            ) AS load,
+            STRUCT(
+              insert_query_destination_table AS destinationTable
+            ) AS query
+          ) AS jobConfiguration,
+          STRUCT(
+            insert_end_time AS endTime,
+            insert_referenced_tables AS referencedTables,
+            insert_referenced_views AS referencedViews
+          ) AS jobStatistics
+        ) AS resource
+      ) AS jobInsertResponse
+    ) AS servicedata_v1_bigquery
+  ) AS protopayload_auditlog
+FROM auditlog
+WHERE
+  (method_name = "jobservice.jobcompleted" AND job_state = "DONE")
+  OR (method_name = "jobservice.insert" AND insert_job_state = "DONE")
+{% if order_by %}ORDER BY timestamp
+{% endif %}{% if not incremental %}LIMIT {{ limit|default(100000, true)}}{% endif %}
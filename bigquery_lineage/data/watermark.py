@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+from dataclasses import dataclass, asdict
+
+from bigquery_lineage.config import ConfigSource
+
+
+def get_watermark_path(path: str, source: ConfigSource) -> str:
+    """Get the path to a watermark of a source."""
+    return os.path.join(path, source.project, "watermark-{}.json".format(source.dataset))
+
+
+@dataclass
+class Watermark:
+    """The last exported timestamp of a source."""
+    project: str
+    dataset: str
+    timestamp: str = None
+
+    @classmethod
+    def load(cls, path: str, source: ConfigSource):
+        """Load a watermark of a source. The timestamp is None, if nothing has been exported yet."""
+        watermark_path = get_watermark_path(path=path, source=source)
+        if not os.path.isfile(watermark_path):
+            return Watermark(project=source.project, dataset=source.dataset)
+        with open(watermark_path, "r") as fp:
+            block = json.load(fp)
+        return Watermark(
+            project=block["project"],
+            dataset=block["dataset"],
+            timestamp=block.get("timestamp", None),
+        )
+
+    def save(self, path: str) -> str:
+        """Save a watermark atomically."""
+        watermark_path = get_watermark_path(path=path, source=ConfigSource(project=self.project, dataset=self.dataset))
+        os.makedirs(os.path.dirname(watermark_path), exist_ok=True)
+        tmp_path = "{}.tmp".format(watermark_path)
+        with open(tmp_path, "w") as fp:
+            json.dump(asdict(self), fp)
+        os.replace(tmp_path, watermark_path)
+        return watermark_path
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=logging-format-interpolation
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from bigquery_lineage.auditlog.auditlog import is_parquet_file, read_lines, read_parquet_blocks
+from bigquery_lineage.auditlog.projection import (
+    TableKey, get_table_key, get_unix_timestamp, iter_jobs, loads
+)
+from bigquery_lineage.auditlog.time_index import TimeWindow
+from bigquery_lineage.config import Config
+from bigquery_lineage.logger import get_logger
+
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import SqlglotError
+    from sqlglot.lineage import lineage as trace_column
+
+    # `SetOperation` is the base of `Union`, `Intersect` and `Except` since sqlglot 25.2.0,
+    # and `Union` is the base of them before it.
+    SET_OPERATION = getattr(exp, "SetOperation", exp.Union)
+except ImportError:
+    sqlglot = None
+
+DIALECT = "bigquery"
+
+# The number of parsed queries to keep in memory
+DEFAULT_CACHE_SIZE = 100000
+
+# A column of a table which may not be fully qualified in a query, such as (("", "dataset", "table"), "column")
+ColumnRef = Tuple[TableKey, str]
+
+# Source columns of each column of the result of a query
+ParsedQuery = Dict[str, Tuple[ColumnRef, ...]]
+
+
+class QueryJob(NamedTuple):
+    """A query job which column lineage is parsed from."""
+    principal_email: str
+    destination: TableKey
+    query: str
+    referenced_tables: Tuple[TableKey, ...]
+    job_count: int = 1
+
+
+class ColumnEdge(NamedTuple):
+    source: TableKey
+    source_column: str
+    destination: TableKey
+    destination_column: str
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query text, so that queries which differ only in whitespace are identical."""
+    return " ".join(query.split()).rstrip(";").rstrip()
+
+
+def hash_query(query: str) -> str:
+    """Get a hash of a normalized query text as a key of parsed queries."""
+    return hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_raw_table_key(table: "exp.Table") -> TableKey:
+    """Get a table key as written in a query, whose project and dataset may be empty."""
+    parts = [part.name for part in table.parts]
+    # A quoted identifier such as `project.dataset.table` is kept as a single part.
+    parts = [name for part in parts for name in part.split(".")]
+    parts = [""] * (3 - len(parts)) + parts[-3:]
+    return parts[0], parts[1], parts[2]
+
+
+def parse_column_lineage(query: str) -> ParsedQuery:
+    """Parse source columns of each result column of a query with sqlglot.
+
+    The result columns of `INSERT` and `CREATE TABLE AS SELECT` are the columns of the destination table.
+    Columns which come only from literals or functions without arguments don't have sources.
+    A query which can't be parsed, such as a script, has no column lineage.
+    """
+    if sqlglot is None:
+        raise ImportError("sqlglot is required to parse column lineage")
+    try:
+        expressions = [expression for expression in sqlglot.parse(query, read=DIALECT) if expression is not None]
+    except SqlglotError:
+        return {}
+    if len(expressions) != 1:
+        return {}
+    expression = expressions[0]
+    columns = None
+    if isinstance(expression, (exp.Insert, exp.Create)):
+        if isinstance(expression.this, exp.Schema):
+            columns = [column.name for column in expression.this.expressions]
+        expression = expression.expression
+    if not isinstance(expression, exp.Query):
+        return {}
+    if columns is not None:
+        # Result columns are mapped to the destination columns by position.
+        select = expression
+        while isinstance(select, SET_OPERATION):
+            select = select.this
+        if not isinstance(select, exp.Select) or len(select.selects) != len(columns):
+            return {}
+        for column, projection in zip(columns, list(select.selects)):
+            projection.replace(exp.alias_(projection.unalias(), column, quoted=True))
+    parsed = {}
+    for column in expression.named_selects:
+        if not column or column == "*":
+            continue
+        try:
+            node = trace_column(column, expression, schema=None, dialect=DIALECT)
+        except SqlglotError:
+            continue
+        sources = []
+        for leaf in node.walk():
+            if leaf.downstream or not isinstance(leaf.source, exp.Table):
+                continue
+            source = (get_raw_table_key(leaf.source), leaf.name.split(".")[-1])
+            # A column of `SELECT *` can't be resolved without the schema of the table.
+            if source[1] != "*" and source not in sources:
+                sources.append(source)
+        parsed[column] = tuple(sorted(sources))
+    return parsed
+
+
+def resolve_table(table: TableKey, referenced_tables: Iterable[TableKey]) -> Optional[TableKey]:
+    """Resolve a table in a query, which may not be fully qualified, with the referenced tables of its job."""
+    if table[0] and table[1]:
+        return table
+    for referenced_table in referenced_tables:
+        if referenced_table[2] == table[2] and (not table[1] or referenced_table[1] == table[1]):
+            return referenced_table
+    return None
+
+
+class ColumnLineageParser:
+    """A parser of column lineage with a cache of parsed queries by a hash of the normalized query text.
+
+    Scheduled queries run the same query text many times, so each distinct query is parsed only once.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, ParsedQuery]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, query: str, query_hash: str = None) -> ParsedQuery:
+        """Parse a query, or get the parsed query from the cache."""
+        key = hash_query(query) if query_hash is None else query_hash
+        parsed = self._cache.get(key)
+        if parsed is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return parsed
+        self.misses += 1
+        parsed = parse_column_lineage(query)
+        self._cache[key] = parsed
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return parsed
+
+
+def project_query_jobs(block: Dict[str, Any]) -> List[QueryJob]:
+    """Project a decoded line of auditlog into query jobs with query texts."""
+    protopayload_auditlog = block["protopayload_auditlog"]
+    query_jobs = []
+    for job, job_count in iter_jobs(protopayload_auditlog):
+        query = (job.get("jobConfiguration") or {}).get("query") or {}
+        destination = get_table_key(query.get("destinationTable"))
+        if destination is None or not query.get("query"):
+            continue
+        job_statistics = job.get("jobStatistics") or {}
+        referenced_tables = [get_table_key(table)
+                             for referenced in (job_statistics.get("referencedTables") or [],
+                                                job_statistics.get("referencedViews") or [])
+                             for table in referenced]
+        query_jobs.append(QueryJob(
+            principal_email=protopayload_auditlog["authenticationInfo"]["principalEmail"],
+            destination=destination,
+            query=query["query"],
+            referenced_tables=tuple(table for table in referenced_tables if table is not None),
+            job_count=job_count,
+        ))
+    return query_jobs
+
+
+def read_query_jobs(file: str, time_window: TimeWindow = None) -> Iterator[QueryJob]:
+    """Read query jobs in a file of auditlog, optionally only jobs in a time window."""
+    if is_parquet_file(file):
+        blocks = read_parquet_blocks(file=file)
+    else:
+        blocks = (loads(line) for line in read_lines(file=file))
+    for block in blocks:
+        if time_window is not None and not time_window.is_unbounded() \
+                and not time_window.contains(get_unix_timestamp(block)):
+            continue
+        yield from project_query_jobs(block)
+
+
+class ColumnLineageBuilder:
+    """Build column lineage from query jobs.
+
+    Jobs are grouped by a hash of the query text with the destination and the referenced tables,
+    so that each distinct query is parsed once no matter how many times it runs.
+    """
+
+    def __init__(self, config: Config, parser: ColumnLineageParser = None):
+        self.config = config
+        self.parser = ColumnLineageParser() if parser is None else parser
+        self.queries: Dict[str, str] = {}
+        self.jobs: Dict[Tuple[str, TableKey, Tuple[TableKey, ...]], int] = {}
+
+    def update(self, query_job: QueryJob):
+        filters = self.config.filters
+        if filters.is_excluded_principal_email(query_job.principal_email):
+            return
+        if filters.is_excluded_table(*query_job.destination):
+            return
+        query_hash = hash_query(query_job.query)
+        self.queries.setdefault(query_hash, query_job.query)
+        key = (query_hash, query_job.destination, query_job.referenced_tables)
+        self.jobs[key] = self.jobs.get(key, 0) + query_job.job_count
+
+    def build(self) -> Dict[ColumnEdge, int]:
+        """Parse the distinct queries and build column edges with the number of jobs."""
+        logger = get_logger()
+        filters = self.config.filters
+        edges = {}
+        for (query_hash, destination, referenced_tables), job_count in self.jobs.items():
+            parsed = self.parser.parse(self.queries[query_hash], query_hash=query_hash)
+            for destination_column, sources in parsed.items():
+                for table, source_column in sources:
+                    source = resolve_table(table, referenced_tables)
+                    if source is None or filters.is_excluded_table(*source):
+                        continue
+                    edge = ColumnEdge(source=source, source_column=source_column,
+                                      destination=destination, destination_column=destination_column)
+                    edges[edge] = edges.get(edge, 0) + job_count
+        logger.info("Parsed {} distinct queries of {} jobs ({} cache hits)".format(
+            self.parser.misses, sum(self.jobs.values()), self.parser.hits))
+        return edges
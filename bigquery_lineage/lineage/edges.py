@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from bigquery_lineage.auditlog.projection import TableKey
+
+# Node IDs are packed into a single integer key of an edge.
+_NODE_ID_BITS = 32
+_NODE_ID_MASK = (1 << _NODE_ID_BITS) - 1
+
+
+class EdgeStats(NamedTuple):
+    """Statistics of an edge."""
+    count: int
+    first_seen: Optional[float]
+    last_seen: Optional[float]
+
+
+class NodeInterner:
+    """Map keys of nodes to dense integer IDs and back."""
+
+    def __init__(self):
+        self._ids: Dict[TableKey, int] = {}
+        self._keys: List[TableKey] = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key: TableKey):
+        return key in self._ids
+
+    def intern(self, key: TableKey) -> int:
+        """Get the ID of a key, assigning a new ID if it is a new key."""
+        node_id = self._ids.get(key)
+        if node_id is None:
+            node_id = len(self._keys)
+            self._ids[key] = node_id
+            self._keys.append(key)
+        return node_id
+
+    def get_id(self, key: TableKey) -> Optional[int]:
+        return self._ids.get(key)
+
+    def get_key(self, node_id: int) -> TableKey:
+        return self._keys[node_id]
+
+    def keys(self) -> List[TableKey]:
+        return list(self._keys)
+
+
+class LineageEdges:
+    """A counted set of edges between interned nodes.
+
+    Memory is bounded by the number of distinct edges rather than the number of jobs.
+    Each edge keeps the number of jobs and the first and last timestamps of them.
+    """
+
+    def __init__(self):
+        self.nodes = NodeInterner()
+        # packed (source ID, destination ID) -> [count, first_seen, last_seen]
+        self._edges: Dict[int, List] = {}
+
+    def __len__(self):
+        return len(self._edges)
+
+    def __iter__(self) -> Iterator[Tuple[TableKey, TableKey]]:
+        """Iterate distinct edges as (source key, destination key)."""
+        get_key = self.nodes.get_key
+        for packed in self._edges:
+            yield get_key(packed >> _NODE_ID_BITS), get_key(packed & _NODE_ID_MASK)
+
+    def __contains__(self, edge: Tuple[TableKey, TableKey]):
+        source_id = self.nodes.get_id(edge[0])
+        destination_id = self.nodes.get_id(edge[1])
+        if source_id is None or destination_id is None:
+            return False
+        return (source_id << _NODE_ID_BITS | destination_id) in self._edges
+
+    def add(self,
+            source: TableKey,
+            destination: TableKey,
+            timestamp: Optional[float] = None,
+            count: int = 1,
+            first_seen: Optional[float] = None,
+            last_seen: Optional[float] = None):
+        """Add an edge.
+
+        Args:
+            source: key of the source node
+            destination: key of the destination node
+            timestamp: timestamp of a job, used as both first_seen and last_seen
+            count: the number of jobs
+            first_seen: the first timestamp of the jobs
+            last_seen: the last timestamp of the jobs
+        """
+        if timestamp is not None:
+            first_seen = timestamp if first_seen is None else first_seen
+            last_seen = timestamp if last_seen is None else last_seen
+        packed = self.nodes.intern(source) << _NODE_ID_BITS | self.nodes.intern(destination)
+        stats = self._edges.get(packed)
+        if stats is None:
+            self._edges[packed] = [count, first_seen, last_seen]
+            return
+        stats[0] += count
+        if first_seen is not None and (stats[1] is None or first_seen < stats[1]):
+            stats[1] = first_seen
+        if last_seen is not None and (stats[2] is None or last_seen > stats[2]):
+            stats[2] = last_seen
+
+    def merge(self, other: "LineageEdges"):
+        """Merge edges of another instance, whose node IDs may differ."""
+        for (source, destination), stats in other.items():
+            self.add(source, destination,
+                     count=stats.count, first_seen=stats.first_seen, last_seen=stats.last_seen)
+
+    def items(self) -> Iterator[Tuple[Tuple[TableKey, TableKey], EdgeStats]]:
+        """Iterate distinct edges with their statistics."""
+        get_key = self.nodes.get_key
+        for packed, (count, first_seen, last_seen) in self._edges.items():
+            edge = (get_key(packed >> _NODE_ID_BITS), get_key(packed & _NODE_ID_MASK))
+            yield edge, EdgeStats(count=count, first_seen=first_seen, last_seen=last_seen)
+
+    def id_items(self) -> Iterator[Tuple[int, int, EdgeStats]]:
+        """Iterate distinct edges as (source ID, destination ID, statistics)."""
+        for packed, (count, first_seen, last_seen) in self._edges.items():
+            yield (packed >> _NODE_ID_BITS, packed & _NODE_ID_MASK,
+                   EdgeStats(count=count, first_seen=first_seen, last_seen=last_seen))
+
+    def get(self, source: TableKey, destination: TableKey) -> Optional[EdgeStats]:
+        """Get statistics of an edge."""
+        source_id = self.nodes.get_id(source)
+        destination_id = self.nodes.get_id(destination)
+        if source_id is None or destination_id is None:
+            return None
+        stats = self._edges.get(source_id << _NODE_ID_BITS | destination_id)
+        if stats is None:
+            return None
+        return EdgeStats(count=stats[0], first_seen=stats[1], last_seen=stats[2])
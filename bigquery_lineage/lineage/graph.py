@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bigquery_lineage.auditlog.projection import GCS_URI_PREFIX, TableKey, get_gcs_key
+from bigquery_lineage.lineage.edges import EdgeStats, LineageEdges
+
+DIRECTION_UPSTREAM = "up"
+DIRECTION_DOWNSTREAM = "down"
+DIRECTION_BOTH = "both"
+DIRECTIONS = [DIRECTION_UPSTREAM, DIRECTION_DOWNSTREAM, DIRECTION_BOTH]
+
+GRANULARITY_TABLE = "table"
+GRANULARITY_DATASET = "dataset"
+GRANULARITY_PROJECT = "project"
+GRANULARITIES = [GRANULARITY_TABLE, GRANULARITY_DATASET, GRANULARITY_PROJECT]
+
+
+def parse_table_id(table_id: str) -> TableKey:
+    """Parse a full table ID such as `project.dataset.table` into a tuple.
+
+    A domain-scoped project such as `example.com:project` is supported,
+    and a GCS URI such as `gs://bucket/path/object` is parsed into a key of a GCS object.
+    """
+    if table_id.startswith(GCS_URI_PREFIX):
+        key = get_gcs_key(table_id)
+        if key is None:
+            raise ValueError("Invalid GCS URI: {}".format(table_id))
+        return key
+    parts = table_id.rsplit(".", 2)
+    if len(parts) != 3 or not all(parts):
+        raise ValueError("Invalid table ID: {}".format(table_id))
+    return parts[0], parts[1], parts[2]
+
+
+def collapse_node(node: TableKey, granularity: str) -> TableKey:
+    """Fold a table into its dataset or project.
+
+    A folded node keeps the shape of a table key, with None in place of the folded parts.
+    """
+    (project, dataset, table) = node
+    if granularity == GRANULARITY_TABLE:
+        return project, dataset, table
+    if granularity == GRANULARITY_DATASET:
+        return project, dataset, None
+    if granularity == GRANULARITY_PROJECT:
+        return project, None, None
+    raise ValueError("Invalid granularity: {}".format(granularity))
+
+
+def traverse(root_ids: Iterable[int],
+             successors: Callable[[int], Iterable[int]],
+             predecessors: Callable[[int], Iterable[int]],
+             direction: str = DIRECTION_DOWNSTREAM,
+             depth: Optional[int] = None) -> Tuple[Set[int], List[Tuple[int, int]]]:
+    """Traverse a graph from roots with BFS over functions which return the neighbors of a node.
+
+    Returns:
+        the IDs of reachable nodes including the roots, and the traversed edges
+        as (source ID, destination ID).
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError("Invalid direction: {}".format(direction))
+    root_ids = list(root_ids)
+    visited = set(root_ids)
+    edges = []
+    if direction in (DIRECTION_DOWNSTREAM, DIRECTION_BOTH):
+        _bfs(root_ids, successors, depth, visited, edges, forward=True)
+    if direction in (DIRECTION_UPSTREAM, DIRECTION_BOTH):
+        _bfs(root_ids, predecessors, depth, visited, edges, forward=False)
+    return visited, edges
+
+
+def _bfs(root_ids: List[int],
+         neighbors: Callable[[int], Iterable[int]],
+         depth: Optional[int],
+         visited: Set[int],
+         edges: List[Tuple[int, int]],
+         forward: bool):
+    levels = {node_id: 0 for node_id in root_ids}
+    queue = deque(root_ids)
+    while queue:
+        node_id = queue.popleft()
+        level = levels[node_id]
+        if depth is not None and level >= depth:
+            continue
+        for neighbor in neighbors(node_id):
+            edges.append((node_id, neighbor) if forward else (neighbor, node_id))
+            if neighbor not in levels:
+                levels[neighbor] = level + 1
+                visited.add(neighbor)
+                queue.append(neighbor)
+
+
+class LineageGraph:
+    """An in-memory lineage graph with adjacency lists.
+
+    Nodes are dense integer IDs, and they are pre-grouped by project and dataset,
+    so that renderers can create each cluster and each node exactly once.
+    A collapsed graph has dataset or project nodes, and its edge counts are summed up.
+    """
+
+    def __init__(self, nodes: List[TableKey] = None, granularity: str = GRANULARITY_TABLE):
+        self.granularity = granularity
+        self.nodes: List[TableKey] = []
+        self._ids: Dict[TableKey, int] = {}
+        self.successors: List[List[int]] = []
+        self.predecessors: List[List[int]] = []
+        self.edge_stats: Dict[Tuple[int, int], EdgeStats] = {}
+        # project -> dataset -> node IDs
+        self.datasets: Dict[str, Dict[str, List[int]]] = {}
+        for node in nodes or []:
+            self.add_node(node)
+
+    @classmethod
+    def from_edges(cls, edges: LineageEdges) -> "LineageGraph":
+        """Build a graph from a counted set of edges, reusing its node IDs."""
+        graph = LineageGraph(nodes=edges.nodes.keys())
+        for source_id, destination_id, stats in edges.id_items():
+            graph.add_edge_by_id(source_id, destination_id, stats)
+        return graph
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add_node(self, node: TableKey) -> int:
+        """Add a node if it doesn't exist, and return its ID."""
+        node_id = self._ids.get(node)
+        if node_id is not None:
+            return node_id
+        node_id = len(self.nodes)
+        self._ids[node] = node_id
+        self.nodes.append(node)
+        self.successors.append([])
+        self.predecessors.append([])
+        (project, dataset, _) = node
+        self.datasets.setdefault(project, {}).setdefault(dataset, []).append(node_id)
+        return node_id
+
+    def get_id(self, node: TableKey) -> Optional[int]:
+        return self._ids.get(node)
+
+    def add_edge(self, source: TableKey, destination: TableKey, stats: EdgeStats = None):
+        self.add_edge_by_id(self.add_node(source), self.add_node(destination), stats)
+
+    def add_edge_by_id(self, source_id: int, destination_id: int, stats: EdgeStats = None):
+        """Add an edge between existing nodes. An existing edge gets its statistics merged."""
+        stats = stats or EdgeStats(count=1, first_seen=None, last_seen=None)
+        key = (source_id, destination_id)
+        existing = self.edge_stats.get(key)
+        if existing is None:
+            self.edge_stats[key] = stats
+            self.successors[source_id].append(destination_id)
+            self.predecessors[destination_id].append(source_id)
+            return
+        self.edge_stats[key] = EdgeStats(
+            count=existing.count + stats.count,
+            first_seen=min((x for x in [existing.first_seen, stats.first_seen] if x is not None), default=None),
+            last_seen=max((x for x in [existing.last_seen, stats.last_seen] if x is not None), default=None))
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """Iterate edges as (source ID, destination ID)."""
+        return iter(self.edge_stats)
+
+    def num_edges(self) -> int:
+        return len(self.edge_stats)
+
+    def traverse(self,
+                 root_ids: Iterable[int],
+                 direction: str = DIRECTION_DOWNSTREAM,
+                 depth: Optional[int] = None) -> Tuple[Set[int], List[Tuple[int, int]]]:
+        """Traverse the graph from roots with BFS.
+
+        Args:
+            root_ids: IDs of the root nodes
+            direction: `up` for upstream, `down` for downstream or `both`
+            depth: the maximum number of hops. It is unlimited, if None.
+
+        Returns:
+            the IDs of reachable nodes including the roots, and the traversed edges
+            as (source ID, destination ID).
+        """
+        return traverse(root_ids=root_ids, successors=self.successors.__getitem__,
+                        predecessors=self.predecessors.__getitem__, direction=direction, depth=depth)
+
+    def find_path(self, source_id: int, destination_id: int) -> Optional[List[int]]:
+        """Find a shortest downstream path between nodes with BFS.
+
+        Returns:
+            the IDs of the nodes on the path including both ends, or None if it is unreachable.
+        """
+        parents = {source_id: None}
+        queue = deque([source_id])
+        while queue:
+            node_id = queue.popleft()
+            if node_id == destination_id:
+                path = []
+                while node_id is not None:
+                    path.append(node_id)
+                    node_id = parents[node_id]
+                return path[::-1]
+            for neighbor in self.successors[node_id]:
+                if neighbor not in parents:
+                    parents[neighbor] = node_id
+                    queue.append(neighbor)
+        return None
+
+    def subgraph(self,
+                 roots: Iterable[TableKey],
+                 direction: str = DIRECTION_DOWNSTREAM,
+                 depth: Optional[int] = None) -> "LineageGraph":
+        """Extract the subgraph which is reachable from roots.
+
+        Raises:
+            KeyError: if a root doesn't exist in the graph
+        """
+        root_ids = []
+        for root in roots:
+            root_id = self.get_id(root)
+            if root_id is None:
+                raise KeyError("No such table in the lineage: {}".format(".".join(root)))
+            root_ids.append(root_id)
+        node_ids, edges = self.traverse(root_ids=root_ids, direction=direction, depth=depth)
+        subgraph = LineageGraph(nodes=[self.nodes[node_id] for node_id in sorted(node_ids)],
+                                granularity=self.granularity)
+        for source_id, destination_id in edges:
+            # An edge can be traversed more than once in a cycle or in both directions.
+            key = (subgraph.get_id(self.nodes[source_id]), subgraph.get_id(self.nodes[destination_id]))
+            if key not in subgraph.edge_stats:
+                subgraph.add_edge_by_id(key[0], key[1], self.edge_stats[(source_id, destination_id)])
+        return subgraph
+
+    def collapse(self, granularity: str) -> "LineageGraph":
+        """Fold table nodes into dataset or project nodes.
+
+        Edges between folded nodes are merged with their counts summed up.
+        Edges within a folded node are dropped.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError("Invalid granularity: {}".format(granularity))
+        collapsed_nodes = [collapse_node(node, granularity) for node in self.nodes]
+        collapsed = LineageGraph(nodes=collapsed_nodes, granularity=granularity)
+        for (source_id, destination_id), stats in self.edge_stats.items():
+            source = collapsed_nodes[source_id]
+            destination = collapsed_nodes[destination_id]
+            if source == destination and granularity != GRANULARITY_TABLE:
+                continue
+            collapsed.add_edge_by_id(collapsed.get_id(source), collapsed.get_id(destination), stats)
+        return collapsed
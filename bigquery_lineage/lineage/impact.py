@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from array import array
+from typing import Iterable, List, Tuple
+
+from bigquery_lineage.lineage.graph import LineageGraph
+
+
+class CSRGraph:
+    """A compact adjacency of a directed graph in the compressed sparse row format.
+
+    The successors of a node `i` are `targets[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, num_nodes: int, edges: Iterable[Tuple[int, int]]):
+        counts = [0] * (num_nodes + 1)
+        edges = list(edges)
+        for source, _ in edges:
+            counts[source + 1] += 1
+        for i in range(num_nodes):
+            counts[i + 1] += counts[i]
+        self.offsets = array("q", counts)
+        targets = [0] * len(edges)
+        positions = counts[:-1]
+        for source, destination in edges:
+            targets[positions[source]] = destination
+            positions[source] += 1
+        self.targets = array("q", targets)
+
+    @classmethod
+    def from_lineage_graph(cls, graph: LineageGraph) -> "CSRGraph":
+        return CSRGraph(num_nodes=len(graph), edges=graph.edges())
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def successors(self, node_id: int):
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+
+def strongly_connected_components(graph: CSRGraph) -> Tuple[array, int]:
+    """Find strongly connected components with the iterative Tarjan's algorithm.
+
+    Returns:
+        the component ID of each node and the number of components.
+        Components are numbered in a reverse topological order, that is,
+        a component has a larger ID than any component reachable from it.
+    """
+    num_nodes = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    unvisited = -1
+    indexes = array("q", [unvisited]) * num_nodes
+    lowlinks = array("q", [0]) * num_nodes
+    components = array("q", [unvisited]) * num_nodes
+    on_stack = bytearray(num_nodes)
+    stack = []
+    num_components = 0
+    index = 0
+    for root in range(num_nodes):
+        if indexes[root] != unvisited:
+            continue
+        # A call stack of (node, the position of the next successor to visit)
+        calls = [(root, offsets[root])]
+        indexes[root] = lowlinks[root] = index
+        index += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while calls:
+            node, position = calls[-1]
+            if position < offsets[node + 1]:
+                calls[-1] = (node, position + 1)
+                successor = targets[position]
+                if indexes[successor] == unvisited:
+                    indexes[successor] = lowlinks[successor] = index
+                    index += 1
+                    stack.append(successor)
+                    on_stack[successor] = 1
+                    calls.append((successor, offsets[successor]))
+                elif on_stack[successor] and indexes[successor] < lowlinks[node]:
+                    lowlinks[node] = indexes[successor]
+                continue
+            calls.pop()
+            if calls:
+                parent = calls[-1][0]
+                if lowlinks[node] < lowlinks[parent]:
+                    lowlinks[parent] = lowlinks[node]
+            if lowlinks[node] == indexes[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    components[member] = num_components
+                    if member == node:
+                        break
+                num_components += 1
+    return components, num_components
+
+
+class ImpactAnalyzer:
+    """Answer transitive downstream closures of tables over a condensed lineage graph.
+
+    Strongly connected components are precomputed, so that cyclic lineage is traversed
+    as a DAG of components, and each traversal visits a component at most once.
+    """
+
+    def __init__(self, graph: LineageGraph):
+        self.graph = graph
+        csr = CSRGraph.from_lineage_graph(graph)
+        self.components, self.num_components = strongly_connected_components(csr)
+        members: List[List[int]] = [[] for _ in range(self.num_components)]
+        for node_id, component in enumerate(self.components):
+            members[component].append(node_id)
+        self.members = members
+        # A component is cyclic, if it has more than one node or a self-loop.
+        self.cyclic = bytearray(self.num_components)
+        component_edges = set()
+        for source, destination in graph.edges():
+            source_component = self.components[source]
+            destination_component = self.components[destination]
+            if source_component == destination_component:
+                self.cyclic[source_component] = 1
+            else:
+                component_edges.add((source_component, destination_component))
+        for component, component_members in enumerate(members):
+            if len(component_members) > 1:
+                self.cyclic[component] = 1
+        self.condensation = CSRGraph(num_nodes=self.num_components, edges=sorted(component_edges))
+
+    def downstream(self, seed_ids: Iterable[int]) -> List[int]:
+        """Get the IDs of nodes reachable from any of the seeds through at least one edge.
+
+        A seed is included, if it is downstream of another seed or it is in a cycle.
+        It is a single traversal from all the seeds at once.
+        """
+        condensation = self.condensation
+        reached = bytearray(self.num_components)
+        queue = []
+        seed_components = {self.components[node_id] for node_id in seed_ids}
+        for component in seed_components:
+            if self.cyclic[component] and not reached[component]:
+                reached[component] = 1
+                queue.append(component)
+        for component in seed_components:
+            for successor in condensation.successors(component):
+                if not reached[successor]:
+                    reached[successor] = 1
+                    queue.append(successor)
+        position = 0
+        while position < len(queue):
+            component = queue[position]
+            position += 1
+            for successor in condensation.successors(component):
+                if not reached[successor]:
+                    reached[successor] = 1
+                    queue.append(successor)
+        return sorted(node_id for component in queue for node_id in self.members[component])
+
+    def cycles(self, node_ids: Iterable[int]) -> List[List[int]]:
+        """Get the cyclic components which contain any of nodes, as lists of node IDs."""
+        components = sorted({self.components[node_id] for node_id in node_ids
+                             if self.cyclic[self.components[node_id]]})
+        return [sorted(self.members[component]) for component in components]
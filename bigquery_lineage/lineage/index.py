@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=logging-format-interpolation
+from __future__ import absolute_import, division, print_function
+
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from bigquery_lineage.auditlog.auditlog import is_parquet_file
+from bigquery_lineage.auditlog.projection import read_job_lineages
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1, get_bigquery_node_id, get_bigquery_node_label
+from bigquery_lineage.compression import get_compression
+from bigquery_lineage.config import Config
+from bigquery_lineage.lineage.edges import EdgeStats, LineageEdges
+from bigquery_lineage.lineage.graph import DIRECTION_DOWNSTREAM, LineageGraph, parse_table_id
+from bigquery_lineage.logger import get_logger
+
+# The number of bytes to read backwards at once to find the end of the last complete line
+_TAIL_READ_SIZE = 64 * 1024
+# The number of leading bytes of a file to tell an appended file from a rewritten one
+_HEAD_SIZE = 1024
+
+
+class FileState(NamedTuple):
+    """The state of an ingested file of auditlog."""
+    size: int
+    mtime: float
+    # The byte offset up to which lines have been ingested
+    offset: int
+    # The leading bytes of the file
+    head: bytes = b""
+
+
+def read_head(file: str, size: int = _HEAD_SIZE) -> bytes:
+    with open(file, "rb") as fp:
+        return fp.read(size)
+
+
+def is_appendable(file: str) -> bool:
+    """Check if new lines of a file can be read from the end of its previous version."""
+    return not is_parquet_file(file) and get_compression(file) is None
+
+
+def find_last_line_end(file: str, start: int, end: int) -> int:
+    """Find the byte offset after the last newline in a byte range of a file.
+
+    A line which is still being written is left for the next time.
+    It returns `start`, if there is no complete line in the range.
+    """
+    with open(file, "rb") as fp:
+        position = end
+        while position > start:
+            read_start = max(position - _TAIL_READ_SIZE, start)
+            fp.seek(read_start)
+            data = fp.read(position - read_start)
+            newline = data.rfind(b"\n")
+            if newline >= 0:
+                return read_start + newline + 1
+            position = read_start
+    return start
+
+
+def get_file_state(file: str, stat: os.stat_result, head: bytes, start: int) -> FileState:
+    """Get the state of a file after the lines from `start` to the last complete line are applied."""
+    end = find_last_line_end(file, start, stat.st_size) if is_appendable(file) else stat.st_size
+    return FileState(size=stat.st_size, mtime=stat.st_mtime, offset=end, head=head[:end])
+
+
+class LineageIndex:
+    """An in-memory lineage graph which is indexed for queries and updated incrementally.
+
+    The graph keeps forward and reverse adjacency lists, and the index maps table names to nodes.
+    New files and lines appended to files are applied incrementally.
+    A file which is rewritten or removed makes the index rebuilt from all files.
+    It is thread-safe, so that an HTTP server can query it while a watcher updates it.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        # The lock of the graph, the names and the states of files, which queries take
+        self._lock = threading.RLock()
+        # The lock which serializes updates, so that they don't apply the same lines twice
+        self._update_lock = threading.Lock()
+        self._graph = LineageGraph()
+        # lower-cased table name -> node IDs
+        self._names: Dict[str, List[int]] = {}
+        self._files: Dict[str, FileState] = {}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "nodes": len(self._graph),
+                "edges": self._graph.num_edges(),
+                "files": len(self._files),
+            }
+
+    def refresh(self, files: List[str]) -> List[str]:
+        """Apply new or modified files of auditlog.
+
+        Returns:
+            the applied files.
+        """
+        logger = get_logger()
+
+        files = sorted(set(files))
+        with self._update_lock:
+            with self._lock:
+                states = dict(self._files)
+            if set(states) - set(files):
+                logger.info("Rebuild the lineage index, because some files have been removed")
+                return self._rebuild(files=files)
+            updates = []
+            for file in files:
+                stat = os.stat(file)
+                state = states.get(file)
+                if state is not None and (state.size, state.mtime) == (stat.st_size, stat.st_mtime):
+                    continue
+                head = read_head(file)
+                if state is not None and not (is_appendable(file) and stat.st_size >= state.offset
+                                              and head.startswith(state.head)):
+                    logger.info("Rebuild the lineage index, because {} has been rewritten".format(file))
+                    return self._rebuild(files=files)
+                start = state.offset if state is not None else 0
+                updates.append((file, start, get_file_state(file=file, stat=stat, head=head, start=start)))
+
+            applied = []
+            for file, start, state in updates:
+                try:
+                    references = self._read_references(file=file, start=start, end=state.offset)
+                # pylint: disable=broad-except
+                except Exception as e:
+                    # A file which is being written is applied next time.
+                    logger.warning("Failed to apply {} [{}, {}): {}".format(file, start, state.offset, e))
+                    continue
+                with self._lock:
+                    self._add_edges(self._graph, self._names, references)
+                    self._files[file] = state
+                applied.append(file)
+            return applied
+
+    def rebuild(self, files: List[str]) -> List[str]:
+        """Rebuild the index from scratch, and swap it at once.
+
+        Returns:
+            the applied files.
+        """
+        with self._update_lock:
+            return self._rebuild(files=files)
+
+    def _rebuild(self, files: List[str]) -> List[str]:
+        graph, names, states = self._build(files=files)
+        with self._lock:
+            self._graph = graph
+            self._names = names
+            self._files = states
+        return sorted(states)
+
+    def _build(self, files: List[str]) -> Tuple[LineageGraph, Dict[str, List[int]], Dict[str, FileState]]:
+        """Build the graph, the names and the states of files from scratch without the lock."""
+        logger = get_logger()
+
+        graph = LineageGraph()
+        names: Dict[str, List[int]] = {}
+        states: Dict[str, FileState] = {}
+        for file in sorted(set(files)):
+            state = get_file_state(file=file, stat=os.stat(file), head=read_head(file), start=0)
+            try:
+                references = self._read_references(file=file, start=0, end=state.offset)
+            # pylint: disable=broad-except
+            except Exception as e:
+                # A file which is being written is applied next time.
+                logger.warning("Failed to apply {} [{}, {}): {}".format(file, 0, state.offset, e))
+                continue
+            self._add_edges(graph, names, references)
+            states[file] = state
+        return graph, names, states
+
+    def apply_file(self, file: str, start: int = 0, end: int = None):
+        """Apply lineage in a byte range of a file.
+
+        The lines are filtered and aggregated before the lock is taken,
+        so that queries are blocked only while the edges are added.
+        """
+        self.apply_edges(self._read_references(file=file, start=start, end=end))
+
+    def apply_edges(self, edges: LineageEdges):
+        """Apply aggregated edges under the lock."""
+        with self._lock:
+            self._add_edges(self._graph, self._names, edges)
+
+    def _read_references(self, file: str, start: int = 0, end: int = None) -> LineageEdges:
+        """Read filtered and aggregated edges in a byte range of a file."""
+        builder = PydotBuilderV1(config=self.config)
+        for job_lineage in read_job_lineages(file=file, start=start, end=end):
+            builder.update_with_job_lineage(job_lineage=job_lineage)
+        return builder.bigquery_references
+
+    @staticmethod
+    def _add_edges(graph: LineageGraph,
+                   names: Dict[str, List[int]],
+                   references: LineageEdges):
+        for (source, destination), stats in references.items():
+            for node in (source, destination):
+                if graph.get_id(node) is None:
+                    node_id = graph.add_node(node)
+                    names.setdefault(get_bigquery_node_label(node).lower(), []).append(node_id)
+            graph.add_edge(source, destination, stats)
+
+    def get_id(self, table_id: str) -> Optional[int]:
+        """Get the ID of a node by a full table ID or a GCS URI.
+
+        Raises:
+            ValueError: if the table ID is invalid
+        """
+        node = parse_table_id(table_id)
+        with self._lock:
+            return self._graph.get_id(node)
+
+    def search(self, name: str) -> List[str]:
+        """Search full IDs of nodes by the name of a table, case-insensitively."""
+        with self._lock:
+            return sorted(get_bigquery_node_id(self._graph.nodes[node_id])
+                          for node_id in self._names.get(name.lower(), []))
+
+    def traverse(self, table_id: str, direction: str = DIRECTION_DOWNSTREAM, depth: int = None) -> Dict:
+        """Get the upstream or downstream nodes and edges of a table.
+
+        Raises:
+            KeyError: if the table doesn't exist in the lineage
+        """
+        with self._lock:
+            root_id = self._get_existing_id(table_id)
+            node_ids, edges = self._graph.traverse(root_ids=[root_id], direction=direction, depth=depth)
+            return {
+                "table": get_bigquery_node_id(self._graph.nodes[root_id]),
+                "direction": direction,
+                "depth": depth,
+                "nodes": sorted(get_bigquery_node_id(self._graph.nodes[node_id]) for node_id in node_ids),
+                "edges": [self._format_edge(source_id, destination_id)
+                          for source_id, destination_id in sorted(set(edges))],
+            }
+
+    def find_path(self, source_table_id: str, destination_table_id: str) -> Optional[List[str]]:
+        """Find a shortest downstream path between tables.
+
+        Raises:
+            KeyError: if any of the tables doesn't exist in the lineage
+        """
+        with self._lock:
+            path = self._graph.find_path(self._get_existing_id(source_table_id),
+                                         self._get_existing_id(destination_table_id))
+            if path is None:
+                return None
+            return [get_bigquery_node_id(self._graph.nodes[node_id]) for node_id in path]
+
+    def _get_existing_id(self, table_id: str) -> int:
+        node_id = self.get_id(table_id)
+        if node_id is None:
+            raise KeyError("No such table in the lineage: {}".format(table_id))
+        return node_id
+
+    def _format_edge(self, source_id: int, destination_id: int) -> Dict:
+        stats: EdgeStats = self._graph.edge_stats[(source_id, destination_id)]
+        return {
+            "source": get_bigquery_node_id(self._graph.nodes[source_id]),
+            "destination": get_bigquery_node_id(self._graph.nodes[destination_id]),
+            "job_count": stats.count,
+            "first_seen": stats.first_seen,
+            "last_seen": stats.last_seen,
+        }
+
+
+class IndexWatcher(threading.Thread):
+    """A background thread which applies new or modified files in a directory to an index periodically."""
+
+    def __init__(self, index: LineageIndex, find_files, interval: float):
+        """
+        Args:
+            index: an index to update
+            find_files: a function which returns files of auditlog to apply
+            interval: the seconds between scans of the files
+        """
+        super().__init__(daemon=True)
+        self.index = index
+        self.find_files = find_files
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        logger = get_logger()
+        while not self._stopped.wait(self.interval):
+            try:
+                applied = self.index.refresh(files=self.find_files())
+            # pylint: disable=broad-except
+            except Exception as e:
+                logger.error("Failed to refresh the lineage index: {}".format(e))
+                continue
+            if applied:
+                logger.info("Applied {} files to the lineage index: {}".format(len(applied), self.index.stats()))
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+from urllib.parse import parse_qs, urlparse
+
+from bigquery_lineage.lineage.graph import DIRECTION_DOWNSTREAM, DIRECTION_UPSTREAM
+from bigquery_lineage.lineage.index import LineageIndex
+from bigquery_lineage.logger import get_logger
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+
+class HTTPError(Exception):
+    """An error which is answered with an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LineageServer(ThreadingHTTPServer):
+    """An HTTP server which answers lineage queries with a shared index."""
+    daemon_threads = True
+
+    def __init__(self, index: LineageIndex, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        super().__init__((host, port), LineageRequestHandler)
+        self.index = index
+
+
+class LineageRequestHandler(BaseHTTPRequestHandler):
+    """A handler of the JSON API of lineage.
+
+    - `GET /health`: the numbers of nodes, edges and files
+    - `GET /search?name=<table>`: full IDs of tables with the name
+    - `GET /upstream?table=<table ID>&depth=<hops>`: upstream nodes and edges of a table
+    - `GET /downstream?table=<table ID>&depth=<hops>`: downstream nodes and edges of a table
+    - `GET /path?from=<table ID>&to=<table ID>`: a shortest downstream path between tables
+    """
+    server: LineageServer
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {
+            "/health": self.get_health,
+            "/search": self.get_search,
+            "/upstream": self.get_upstream,
+            "/downstream": self.get_downstream,
+            "/path": self.get_path,
+        }
+        route = routes.get(url.path)
+        try:
+            if route is None:
+                raise HTTPError(404, "No such endpoint: {}".format(url.path))
+            self.write_json(200, route(params))
+        except HTTPError as e:
+            self.write_json(e.status, {"error": e.message})
+        except KeyError as e:
+            self.write_json(404, {"error": e.args[0]})
+        except ValueError as e:
+            self.write_json(400, {"error": e.args[0]})
+
+    def get_health(self, params: Dict[str, str]) -> Dict[str, Any]:
+        # pylint: disable=unused-argument
+        return self.server.index.stats()
+
+    def get_search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        name = get_required_param(params, "name")
+        return {"name": name, "tables": self.server.index.search(name)}
+
+    def get_upstream(self, params: Dict[str, str]) -> Dict[str, Any]:
+        return self.server.index.traverse(
+            get_required_param(params, "table"), direction=DIRECTION_UPSTREAM, depth=get_depth_param(params))
+
+    def get_downstream(self, params: Dict[str, str]) -> Dict[str, Any]:
+        return self.server.index.traverse(
+            get_required_param(params, "table"), direction=DIRECTION_DOWNSTREAM, depth=get_depth_param(params))
+
+    def get_path(self, params: Dict[str, str]) -> Dict[str, Any]:
+        source = get_required_param(params, "from")
+        destination = get_required_param(params, "to")
+        return {"from": source, "to": destination, "path": self.server.index.find_path(source, destination)}
+
+    def write_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        get_logger().debug("%s - %s", self.address_string(), format % args)
+
+
+def get_required_param(params: Dict[str, str], name: str) -> str:
+    value = params.get(name)
+    if not value:
+        raise HTTPError(400, "Missing parameter: {}".format(name))
+    return value
+
+
+def get_depth_param(params: Dict[str, str]):
+    value = params.get("depth")
+    if value is None:
+        return None
+    try:
+        depth = int(value)
+    except ValueError:
+        raise HTTPError(400, "Invalid depth: {}".format(value))
+    if depth < 0:
+        raise HTTPError(400, "Invalid depth: {}".format(value))
+    return depth
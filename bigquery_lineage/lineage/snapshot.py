@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import bisect
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bigquery_lineage.auditlog.projection import TableKey
+from bigquery_lineage.lineage.edges import EdgeStats
+from bigquery_lineage.lineage.graph import DIRECTION_DOWNSTREAM, GRANULARITIES, LineageGraph, traverse
+
+SNAPSHOT_MAGIC = b"BQLGRAPH"
+SNAPSHOT_VERSION = 2
+
+# The string index of a folded part of a node, such as the table of a dataset node
+NONE_STRING = 0xFFFFFFFF
+
+# Sections in the order of the file, with their typecodes of arrays.
+# - string_offsets: the byte offsets of interned strings in string_data, with the end of the last one
+# - string_data: UTF-8 bytes of project, dataset and table names
+# - nodes: (project, dataset, table) string indexes of each node
+# - edge_offsets: edges of a source node `i` are in `[edge_offsets[i], edge_offsets[i + 1])`
+# - destinations, counts, first_seen, last_seen: per edge. A missing timestamp is NaN.
+# - predecessor_offsets, predecessor_ids: source nodes of a destination node `i` are
+#   `predecessor_ids[predecessor_offsets[i]:predecessor_offsets[i + 1]]`
+SECTIONS = (
+    ("string_offsets", "Q"),
+    ("string_data", "B"),
+    ("nodes", "I"),
+    ("edge_offsets", "Q"),
+    ("destinations", "I"),
+    ("counts", "Q"),
+    ("first_seen", "d"),
+    ("last_seen", "d"),
+    ("predecessor_offsets", "Q"),
+    ("predecessor_ids", "I"),
+)
+
+# magic, version, granularity, the numbers of strings, nodes and edges, and the offset of each section
+_HEADER = struct.Struct("<8sII3Q{}Q".format(len(SECTIONS)))
+
+_ALIGNMENT = 8
+
+
+def _to_little_endian(values: array) -> array:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def write_snapshot(graph: LineageGraph, path: str) -> str:
+    """Write a lineage graph to a versioned binary snapshot atomically.
+
+    Names are interned into a string table, and edges are sorted by source
+    into flat arrays, so that a snapshot can be memory-mapped without parsing.
+    """
+    strings: Dict[str, int] = {}
+    nodes = array("I")
+    for node in graph.nodes:
+        for part in node:
+            if part is None:
+                nodes.append(NONE_STRING)
+            else:
+                nodes.append(strings.setdefault(part, len(strings)))
+    string_data = bytearray()
+    string_offsets = array("Q", [0])
+    for value in strings:
+        string_data.extend(value.encode("utf-8"))
+        string_offsets.append(len(string_data))
+
+    edge_offsets = array("Q", [0]) * (len(graph) + 1)
+    destinations = array("I")
+    counts = array("Q")
+    first_seen = array("d")
+    last_seen = array("d")
+    for (source_id, destination_id), stats in sorted(graph.edge_stats.items()):
+        edge_offsets[source_id + 1] += 1
+        destinations.append(destination_id)
+        counts.append(stats.count)
+        first_seen.append(math.nan if stats.first_seen is None else stats.first_seen)
+        last_seen.append(math.nan if stats.last_seen is None else stats.last_seen)
+    predecessor_offsets = array("Q", [0]) * (len(graph) + 1)
+    predecessor_ids = array("I")
+    for source_id, destination_id in sorted(graph.edge_stats, key=lambda x: (x[1], x[0])):
+        predecessor_offsets[destination_id + 1] += 1
+        predecessor_ids.append(source_id)
+    for i in range(len(graph)):
+        edge_offsets[i + 1] += edge_offsets[i]
+        predecessor_offsets[i + 1] += predecessor_offsets[i]
+
+    sections = {
+        "string_offsets": string_offsets,
+        "string_data": array("B", string_data),
+        "nodes": nodes,
+        "edge_offsets": edge_offsets,
+        "destinations": destinations,
+        "counts": counts,
+        "first_seen": first_seen,
+        "last_seen": last_seen,
+        "predecessor_offsets": predecessor_offsets,
+        "predecessor_ids": predecessor_ids,
+    }
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "wb") as fp:
+        fp.write(b"\0" * _HEADER.size)
+        offsets = []
+        for name, _ in SECTIONS:
+            position = fp.tell()
+            padding = -position % _ALIGNMENT
+            fp.write(b"\0" * padding)
+            offsets.append(position + padding)
+            fp.write(_to_little_endian(sections[name]).tobytes())
+        fp.seek(0)
+        fp.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, GRANULARITIES.index(graph.granularity),
+                              len(strings), len(graph), graph.num_edges(), *offsets))
+    os.replace(tmp_path, path)
+    return path
+
+
+class GraphSnapshot:
+    """A read-only lineage graph on a memory-mapped snapshot.
+
+    Opening a snapshot only reads its header, and arrays are views of the mapped file.
+    Names are decoded when nodes are looked up, and a subgraph is traversed on the views
+    without materializing the whole graph.
+
+    Raises:
+        ValueError: if a file isn't a snapshot, or it is truncated or unsupported
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mmap) < _HEADER.size:
+                raise ValueError("Invalid snapshot: {}".format(path))
+            header = _HEADER.unpack_from(self._mmap, 0)
+            (magic, version, granularity, num_strings, num_nodes, num_edges) = header[:6]
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("Invalid snapshot: {}".format(path))
+            if version != SNAPSHOT_VERSION:
+                raise ValueError("Unsupported snapshot version {}: {}".format(version, path))
+            if granularity >= len(GRANULARITIES):
+                raise ValueError("Unsupported snapshot granularity {}: {}".format(granularity, path))
+            self.granularity = GRANULARITIES[granularity]
+            self.num_nodes = num_nodes
+            self.num_edges = num_edges
+            self._buffer = memoryview(self._mmap)
+            lengths = {
+                "string_offsets": num_strings + 1,
+                "string_data": None,
+                "nodes": 3 * num_nodes,
+                "edge_offsets": num_nodes + 1,
+                "destinations": num_edges,
+                "counts": num_edges,
+                "first_seen": num_edges,
+                "last_seen": num_edges,
+                "predecessor_offsets": num_nodes + 1,
+                "predecessor_ids": num_edges,
+            }
+            self._sections = {}
+            for (name, typecode), offset in zip(SECTIONS, header[6:]):
+                self._sections[name] = (offset, typecode, lengths[name])
+            self.string_offsets = self._view("string_offsets")
+            self.string_data = self._view("string_data", self.string_offsets[-1])
+            self.nodes = self._view("nodes")
+            self.edge_offsets = self._view("edge_offsets")
+            self.destinations = self._view("destinations")
+            self.counts = self._view("counts")
+            self.first_seen = self._view("first_seen")
+            self.last_seen = self._view("last_seen")
+            self.predecessor_offsets = self._view("predecessor_offsets")
+            self.predecessor_ids = self._view("predecessor_ids")
+        except Exception:
+            self.close()
+            raise
+        self._ids: Optional[Dict[TableKey, int]] = None
+
+    def _view(self, name: str, length: int = None):
+        offset, typecode, default_length = self._sections[name]
+        length = default_length if length is None else length
+        end = offset + length * struct.calcsize(typecode)
+        if end > len(self._mmap):
+            raise ValueError("Truncated snapshot: {}".format(self.path))
+        view = self._buffer[offset:end].cast(typecode)
+        if sys.byteorder != "little":
+            values = array(typecode, view)
+            values.byteswap()
+            view.release()
+            return values
+        return view
+
+    def close(self):
+        for name in ["string_offsets", "string_data", "nodes", "edge_offsets",
+                     "destinations", "counts", "first_seen", "last_seen", "predecessor_offsets",
+                     "predecessor_ids", "_buffer"]:
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.num_nodes
+
+    def get_string(self, index: int) -> Optional[str]:
+        if index == NONE_STRING:
+            return None
+        return bytes(self.string_data[self.string_offsets[index]:self.string_offsets[index + 1]]).decode("utf-8")
+
+    def get_node(self, node_id: int) -> TableKey:
+        position = 3 * node_id
+        return (self.get_string(self.nodes[position]),
+                self.get_string(self.nodes[position + 1]),
+                self.get_string(self.nodes[position + 2]))
+
+    def get_id(self, node: TableKey) -> Optional[int]:
+        """Get the ID of a node. The first lookup decodes all the names."""
+        if self._ids is None:
+            self._ids = {self.get_node(node_id): node_id for node_id in range(self.num_nodes)}
+        return self._ids.get(node)
+
+    def successors(self, node_id: int):
+        return self.destinations[self.edge_offsets[node_id]:self.edge_offsets[node_id + 1]]
+
+    def predecessors(self, node_id: int):
+        return self.predecessor_ids[self.predecessor_offsets[node_id]:self.predecessor_offsets[node_id + 1]]
+
+    def find_edge(self, source_id: int, destination_id: int) -> Optional[int]:
+        """Find the index of an edge. Destinations of a source are sorted, so it is a binary search."""
+        start, end = self.edge_offsets[source_id], self.edge_offsets[source_id + 1]
+        edge_index = bisect.bisect_left(self.destinations, destination_id, start, end)
+        if edge_index < end and self.destinations[edge_index] == destination_id:
+            return edge_index
+        return None
+
+    def traverse(self,
+                 root_ids: Iterable[int],
+                 direction: str = DIRECTION_DOWNSTREAM,
+                 depth: Optional[int] = None) -> Tuple[Set[int], List[Tuple[int, int]]]:
+        """Traverse the snapshot from roots with BFS, in the same way as `LineageGraph.traverse`."""
+        return traverse(root_ids=root_ids, successors=self.successors, predecessors=self.predecessors,
+                        direction=direction, depth=depth)
+
+    def subgraph(self,
+                 roots: Iterable[TableKey],
+                 direction: str = DIRECTION_DOWNSTREAM,
+                 depth: Optional[int] = None) -> LineageGraph:
+        """Materialize only the subgraph which is reachable from roots.
+
+        Raises:
+            KeyError: if a root doesn't exist in the snapshot
+        """
+        root_ids = []
+        for root in roots:
+            root_id = self.get_id(root)
+            if root_id is None:
+                raise KeyError("No such table in the lineage: {}".format(".".join(root)))
+            root_ids.append(root_id)
+        node_ids, edges = self.traverse(root_ids=root_ids, direction=direction, depth=depth)
+        subgraph = LineageGraph(nodes=[self.get_node(node_id) for node_id in sorted(node_ids)],
+                                granularity=self.granularity)
+        for source_id, destination_id in edges:
+            # An edge can be traversed more than once in a cycle or in both directions.
+            key = (subgraph.get_id(self.get_node(source_id)), subgraph.get_id(self.get_node(destination_id)))
+            if key not in subgraph.edge_stats:
+                subgraph.add_edge_by_id(key[0], key[1],
+                                        self.get_edge_stats(self.find_edge(source_id, destination_id)))
+        return subgraph
+
+    def get_edge_stats(self, edge_index: int) -> EdgeStats:
+        first_seen = self.first_seen[edge_index]
+        last_seen = self.last_seen[edge_index]
+        return EdgeStats(count=self.counts[edge_index],
+                         first_seen=None if math.isnan(first_seen) else first_seen,
+                         last_seen=None if math.isnan(last_seen) else last_seen)
+
+    def get_strings(self) -> List[Optional[str]]:
+        """Decode all the interned strings at once."""
+        data = bytes(self.string_data)
+        offsets = self.string_offsets.tolist()
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def iter_edges(self) -> Iterator[Tuple[int, int, EdgeStats]]:
+        """Iterate edges as (source ID, destination ID, statistics) in the order of sources."""
+        edge_offsets = self.edge_offsets.tolist()
+        destinations = self.destinations.tolist()
+        counts = self.counts.tolist()
+        first_seens = self.first_seen.tolist()
+        last_seens = self.last_seen.tolist()
+        for source_id, (start, end) in enumerate(zip(edge_offsets, edge_offsets[1:])):
+            for destination_id, count, first_seen, last_seen in zip(
+                    destinations[start:end], counts[start:end], first_seens[start:end], last_seens[start:end]):
+                yield source_id, destination_id, EdgeStats(
+                    count=count,
+                    first_seen=None if math.isnan(first_seen) else first_seen,
+                    last_seen=None if math.isnan(last_seen) else last_seen)
+
+    def to_lineage_graph(self) -> LineageGraph:
+        """Materialize the snapshot as a lineage graph with the same node IDs."""
+        strings = self.get_strings()
+        parts = [None if index == NONE_STRING else strings[index] for index in self.nodes.tolist()]
+        nodes: List[TableKey] = list(zip(parts[0::3], parts[1::3], parts[2::3]))
+        graph = LineageGraph(nodes=nodes, granularity=self.granularity)
+        for source_id, destination_id, stats in self.iter_edges():
+            graph.add_edge_by_id(source_id, destination_id, stats)
+        return graph
+
+
+def read_snapshot(path: str) -> LineageGraph:
+    """Read a snapshot into a lineage graph."""
+    with GraphSnapshot(path) as snapshot:
+        return snapshot.to_lineage_graph()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bigquery_lineage.auditlog.projection import JobLineage, TableKey, read_job_lineages
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_edges (
+    file_id INTEGER NOT NULL,
+    src_project TEXT NOT NULL,
+    src_dataset TEXT NOT NULL,
+    src_table TEXT NOT NULL,
+    dst_project TEXT NOT NULL,
+    dst_dataset TEXT NOT NULL,
+    dst_table TEXT NOT NULL,
+    principal_email TEXT NOT NULL,
+    first_seen REAL,
+    last_seen REAL,
+    job_count INTEGER NOT NULL,
+    PRIMARY KEY (file_id, src_project, src_dataset, src_table,
+                 dst_project, dst_dataset, dst_table, principal_email)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_edges_src
+    ON file_edges (src_project, src_dataset, src_table);
+CREATE INDEX IF NOT EXISTS file_edges_dst
+    ON file_edges (dst_project, dst_dataset, dst_table);
+CREATE VIEW IF NOT EXISTS edges AS
+    SELECT
+        src_project, src_dataset, src_table,
+        dst_project, dst_dataset, dst_table,
+        principal_email,
+        MIN(first_seen) AS first_seen,
+        MAX(last_seen) AS last_seen,
+        SUM(job_count) AS job_count
+    FROM file_edges
+    GROUP BY
+        src_project, src_dataset, src_table,
+        dst_project, dst_dataset, dst_table,
+        principal_email;
+"""
+
+EdgeKey = Tuple[TableKey, TableKey, str]
+
+
+@dataclass
+class StoredEdge:
+    source: TableKey
+    destination: TableKey
+    principal_email: str
+    first_seen: Optional[float] = None
+    last_seen: Optional[float] = None
+    job_count: int = 0
+
+
+def aggregate_job_lineages(job_lineages: Iterable[JobLineage]) -> Dict[EdgeKey, List]:
+    """Aggregate lineage of jobs into deduplicated edges with [first_seen, last_seen, job_count]."""
+    edges = {}
+    for job_lineage in job_lineages:
+        timestamp = job_lineage.timestamp
+        for source in job_lineage.sources:
+            key = (source, job_lineage.destination, job_lineage.principal_email)
+            edge = edges.get(key)
+            if edge is None:
+                edges[key] = [timestamp, timestamp, job_lineage.job_count]
+                continue
+            if timestamp is not None:
+                if edge[0] is None or timestamp < edge[0]:
+                    edge[0] = timestamp
+                if edge[1] is None or timestamp > edge[1]:
+                    edge[1] = timestamp
+            edge[2] += job_lineage.job_count
+    return edges
+
+
+class EdgeStore:
+    """A persisted and deduplicated store of lineage edges in SQLite.
+
+    Edges are kept per ingested file, so that a file which has been re-exported
+    replaces its previous edges instead of counting them twice.
+    Edges are stored without filters, so that changing filters doesn't require re-ingestion.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_ingested(self, path: str) -> bool:
+        """Check if a file has been ingested and hasn't been modified since then."""
+        path = os.path.abspath(path)
+        row = self._connection.execute(
+            "SELECT size, mtime FROM ingested_files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        stat = os.stat(path)
+        return row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def ingest_file(self, path: str) -> int:
+        """Ingest lineage in a file of auditlog, replacing edges of its previous version.
+
+        Returns:
+            the number of distinct edges in the file.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        edges = aggregate_job_lineages(read_job_lineages(file=path))
+        with self._connection:
+            self._remove_file(path)
+            cursor = self._connection.execute(
+                "INSERT INTO ingested_files (path, size, mtime, ingested_at) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, time.time()))
+            file_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO file_edges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((file_id,) + source + destination + (principal_email, first_seen, last_seen, job_count)
+                 for (source, destination, principal_email), (first_seen, last_seen, job_count) in edges.items()))
+        return len(edges)
+
+    def sync(self, paths: List[str]) -> List[str]:
+        """Ingest new or modified files and forget files which no longer exist.
+
+        Returns:
+            the ingested paths.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        with self._connection:
+            for path in set(self.ingested_paths()) - set(paths):
+                self._remove_file(path)
+        ingested = []
+        for path in paths:
+            if not self.is_ingested(path):
+                self.ingest_file(path)
+                ingested.append(path)
+        return ingested
+
+    def ingested_paths(self) -> List[str]:
+        return [row[0] for row in self._connection.execute("SELECT path FROM ingested_files")]
+
+    def _remove_file(self, path: str):
+        row = self._connection.execute("SELECT file_id FROM ingested_files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self._connection.execute("DELETE FROM file_edges WHERE file_id = ?", (row[0],))
+        self._connection.execute("DELETE FROM ingested_files WHERE file_id = ?", (row[0],))
+
+    def iter_edges(self,
+                   source: TableKey = None,
+                   destination: TableKey = None) -> Iterator[StoredEdge]:
+        """Iterate deduplicated edges, optionally only from a source or to a destination.
+
+        Edges are aggregated over all the time, because the store doesn't keep timestamps of jobs.
+        """
+        conditions = []
+        parameters = []
+        if source is not None:
+            conditions.append("src_project = ? AND src_dataset = ? AND src_table = ?")
+            parameters.extend(source)
+        if destination is not None:
+            conditions.append("dst_project = ? AND dst_dataset = ? AND dst_table = ?")
+            parameters.extend(destination)
+        query = "SELECT * FROM edges"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        for row in self._connection.execute(query, parameters):
+            yield StoredEdge(
+                source=tuple(row[0:3]),
+                destination=tuple(row[3:6]),
+                principal_email=row[6],
+                first_seen=row[7],
+                last_seen=row[8],
+                job_count=row[9],
+            )
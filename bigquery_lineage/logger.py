@@ -4,7 +4,9 @@ import logging
 def get_logger(log_level=logging.INFO):
     # Configure logging.
     logger = logging.getLogger()
-    log_handler = logging.StreamHandler()
-    logger.addHandler(log_handler)
+    # Avoid duplicated messages when it is called more than once.
+    if not logger.handlers:
+        log_handler = logging.StreamHandler()
+        logger.addHandler(log_handler)
     logger.setLevel(log_level)
     return logger
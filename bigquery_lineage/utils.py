@@ -3,7 +3,10 @@ from __future__ import absolute_import, division, print_function
 
 import json
 import os
-from datetime import date, datetime
+import re
+import time
+from datetime import date, datetime, timezone
+from typing import Optional, Union
 
 import yaml
 
@@ -50,3 +53,40 @@ def serialize_json(obj):
         # Convert to ISO format
         return obj.isoformat()
     raise TypeError("Type %s not serializable" % type(obj))
+
+
+def parse_timestamp(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """Parse a timestamp in ISO format into a timezone-aware datetime.
+
+    A timestamp without timezone is regarded as UTC.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        timestamp = value
+    else:
+        text = value.strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        timestamp = datetime.fromisoformat(text.replace(" ", "T", 1))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+RELATIVE_TIME_UNITS = {"m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_time_bound(value: Optional[str], now: float = None) -> Optional[float]:
+    """Parse a bound of a time range into UNIX time.
+
+    It accepts a timestamp or a date in ISO format, or a time relative to now
+    such as `30m`, `12h` and `7d`.
+    """
+    if value is None or value == "":
+        return None
+    matched = re.fullmatch(r"(\d+)([mhd])", value.strip())
+    if matched:
+        now = time.time() if now is None else now
+        return now - int(matched.group(1)) * RELATIVE_TIME_UNITS[matched.group(2)]
+    return parse_timestamp(value).timestamp()
@@ -28,9 +28,21 @@ setup(
         "click-completion==0.5.2",
         "dictdiffer==0.8.1",
         "Jinja2>=2.11",
-        "google-cloud-bigquery>=1.26.0",
+        "google-cloud-bigquery>=2.31.0",
         "google-api-python-client>=1.12.1",
     ],
+    extras_require={
+        "parquet": [
+            "pyarrow>=7.0.0",
+            "google-cloud-bigquery-storage>=2.0.0",
+        ],
+        "zstd": [
+            "zstandard>=0.15.0",
+        ],
+        "sql": [
+            "sqlglot>=25.0.0",
+        ],
+    },
     entry_points={
         "console_scripts": [
             "bql = bigquery_lineage.cli.main:cli",
@@ -2,10 +2,12 @@
 # pylint: disable=line-too-long
 from __future__ import absolute_import, division, print_function
 
+import json
 import os
+import tempfile
 import unittest
 
-from bigquery_lineage.auditlog.auditlog import Auditlog
+from bigquery_lineage.auditlog.auditlog import Auditlog, read_auditlog, split_auditlog_file
 from bigquery_lineage.utils import (
     get_project_root, load_json
 )
@@ -54,3 +56,26 @@ class TestAuditLog(unittest.TestCase):
         self.assertEqual(result.project, "dummy-project")
         self.assertEqual(result.dataset, "destination_dataset")
         self.assertEqual(result.table, "destination_table")
+
+
+class TestReadAuditlog(unittest.TestCase):
+
+    def test_split_auditlog_file(self):
+        path = os.path.join(get_project_root(), "tests", "resources",
+                            "auditlog", "job_completed_event", "query.json")
+        line = json.dumps(load_json(path)) + "\n"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, "auditlog.json")
+            with open(file, "w") as fp:
+                for _ in range(10):
+                    fp.write(line)
+            ranges = split_auditlog_file(file=file, chunk_size=len(line) * 3)
+            # The ranges are contiguous and aligned to line boundaries.
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], os.path.getsize(file))
+            for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+                self.assertEqual(end, start)
+                self.assertEqual(end % len(line), 0)
+            # Every line is read exactly once.
+            result = sum(len(list(read_auditlog(file=file, start=start, end=end))) for start, end in ranges)
+            self.assertEqual(result, 10)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import tempfile
+import unittest
+
+from bigquery_lineage.auditlog.auditlog import iter_lines_with_offsets, read_lines
+from bigquery_lineage.auditlog.block_index import (
+    Block, BlockIndex, get_block_index_path, load_or_build_block_index
+)
+from bigquery_lineage.auditlog.parallel import build_tasks
+from bigquery_lineage.auditlog.time_index import TimeWindow
+from bigquery_lineage.compression import COMPRESSION_GZIP, FrameWriter
+from bigquery_lineage.utils import (
+    get_project_root, load_json
+)
+
+# 2020-08-01T00:00:00+00:00
+DAY1 = 1596240000.0
+DAY = 24 * 60 * 60
+
+
+class TestBlockIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(get_project_root(), "tests", "resources",
+                            "auditlog", "job_completed_event", "query.json")
+        self.block = load_json(path)
+        self.file = os.path.join(self.tmp_dir.name, "auditlog.json")
+        # 3 lines for each of 4 days
+        self.lines = []
+        for day in range(4):
+            for _ in range(3):
+                self.lines.append(json.dumps({**self.block, "timestamp": "2020-08-0{}T00:00:00Z".format(day + 1)}))
+        self.write_auditlog(self.lines)
+        self.line_size = len(self.lines[0]) + 1
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_auditlog(self, lines):
+        with open(self.file, "w") as fp:
+            for line in lines:
+                fp.write(line + "\n")
+
+    def test_iter_lines_with_offsets(self):
+        offsets = [offset for offset, _ in iter_lines_with_offsets(self.file)]
+        self.assertEqual(offsets, [self.line_size * i for i in range(12)])
+        # A line which starts in the range is read to its end.
+        lines = list(iter_lines_with_offsets(self.file, start=self.line_size, end=self.line_size + 1))
+        self.assertEqual(lines, [(self.line_size, (self.lines[1] + "\n").encode())])
+
+    def test_build(self):
+        block_index = BlockIndex.build(self.file, block_size=self.line_size * 3)
+        self.assertEqual(len(block_index.blocks), 4)
+        self.assertEqual(block_index.blocks[1], Block(
+            start=self.line_size * 3, end=self.line_size * 6, lines=3,
+            min_timestamp=DAY1 + DAY, max_timestamp=DAY1 + DAY))
+        self.assertEqual(block_index.blocks[-1].end, os.path.getsize(self.file))
+        self.assertEqual(block_index.min_timestamp, DAY1)
+        self.assertEqual(block_index.max_timestamp, DAY1 + 3 * DAY)
+
+    def test_get_ranges(self):
+        block_index = BlockIndex.build(self.file, block_size=self.line_size * 3)
+        # Adjacent blocks are coalesced up to the chunk size.
+        self.assertEqual(block_index.get_ranges(chunk_size=self.line_size * 6),
+                         [(0, self.line_size * 6), (self.line_size * 6, self.line_size * 12)])
+        # Blocks out of the time window are skipped.
+        time_window = TimeWindow(since=DAY1 + DAY, until=DAY1 + 2 * DAY)
+        self.assertEqual(block_index.get_ranges(chunk_size=self.line_size * 12, time_window=time_window),
+                         [(self.line_size * 3, self.line_size * 9)])
+        self.assertTrue(block_index.overlaps(time_window))
+        self.assertFalse(block_index.overlaps(TimeWindow(since=DAY1 + 4 * DAY)))
+
+    def test_load_or_build_block_index(self):
+        block_index = load_or_build_block_index(self.file, block_size=self.line_size * 3)
+        self.assertTrue(os.path.isfile(get_block_index_path(self.file)))
+        self.assertEqual(BlockIndex.load(self.file), block_index)
+
+        # A modified file makes the index stale.
+        self.write_auditlog(self.lines[:3])
+        self.assertIsNone(BlockIndex.load(self.file))
+        self.assertEqual(len(load_or_build_block_index(self.file).blocks), 1)
+
+    def test_build_tasks_with_time_window(self):
+        load_or_build_block_index(self.file, block_size=self.line_size * 3)
+        tasks = build_tasks(files=[self.file], chunk_size=self.line_size * 3,
+                            time_window=TimeWindow(since=DAY1 + 3 * DAY))
+        self.assertEqual(tasks, [(self.file, self.line_size * 9, self.line_size * 12)])
+        # The index splits a file without a time window, too.
+        self.assertEqual(len(build_tasks(files=[self.file], chunk_size=self.line_size * 3)), 4)
+
+    def test_build_tasks_without_writing_sidecars(self):
+        time_window = TimeWindow(since=DAY1 + 3 * DAY)
+        tasks = build_tasks(files=[self.file], chunk_size=self.line_size * 3, time_window=time_window)
+        # A block index is built in memory with the default block size.
+        self.assertEqual(tasks, [(self.file, 0, self.line_size * 12)])
+        self.assertFalse(os.path.exists(get_block_index_path(self.file)))
+
+        # A block index is saved only in a cache directory, and it is loaded from there next time.
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        build_tasks(files=[self.file], chunk_size=self.line_size * 3, time_window=time_window, cache_dir=cache_dir)
+        self.assertFalse(os.path.exists(get_block_index_path(self.file)))
+        self.assertEqual(os.listdir(cache_dir), [os.path.basename(get_block_index_path(self.file, cache_dir))])
+        self.assertIsNotNone(BlockIndex.load(self.file, cache_dir=cache_dir))
+
+    def test_build_with_frames(self):
+        file = os.path.join(self.tmp_dir.name, "auditlog.json.gz")
+        with FrameWriter(open(file, "wb"), compression=COMPRESSION_GZIP, frame_size=self.line_size * 3) as writer:
+            for line in self.lines:
+                writer.write(line + "\n")
+        block_index = BlockIndex.build(file, block_size=1)
+        # A block for each frame of a day
+        self.assertEqual([(x.lines, x.min_timestamp) for x in block_index.blocks],
+                         [(3, DAY1 + i * DAY) for i in range(4)])
+        block_index.save(file)
+        tasks = build_tasks(files=[file], chunk_size=1, time_window=TimeWindow(since=DAY1 + 2 * DAY))
+        self.assertEqual(len(tasks), 2)
+        lines = [line for _, start, end in tasks for line in read_lines(file, start=start, end=end)]
+        self.assertEqual(lines, [(x + "\n").encode() for x in self.lines[6:]])
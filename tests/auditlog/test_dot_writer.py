@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import io
+import unittest
+
+import pydot
+
+from bigquery_lineage.auditlog.dot_writer import quote, write_dot
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.lineage.graph import GRANULARITIES, GRANULARITY_DATASET
+
+
+def summarize(graph, summary=None, path=()):
+    """Summarize nodes and edges by the path of clusters which contain them."""
+    summary = {} if summary is None else summary
+    nodes = sorted(x.get_name().strip('"') for x in graph.get_nodes()
+                   if x.get_name() not in ("node", "graph", "edge") and x.get_name().strip('"').strip("\\n"))
+    edges = sorted((x.get_source().strip('"'), x.get_destination().strip('"')) for x in graph.get_edges())
+    summary[path] = (nodes, edges)
+    for subgraph in graph.get_subgraphs():
+        summarize(subgraph, summary, path + (subgraph.get_name().strip('"'),))
+    return summary
+
+
+class TestDotWriter(unittest.TestCase):
+
+    def setUp(self):
+        config = Config(start="2020-01-01", end="2020-08-01",
+                        filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        self.builder = PydotBuilderV1(config=config)
+        for source, destination in [
+                (("p1", "raw", "events"), ("p1", "raw", "events_clean")),
+                (("p1", "raw", "events"), ("p1", "mart", "daily")),
+                (("p1", "raw", "events_clean"), ("p1", "mart", "daily")),
+                (("p1", "mart", "daily"), ("p2", "report", "kpi")),
+                (("gs://lake", "events/2020", "*.avro"), ("p1", "raw", "events"))]:
+            self.builder.bigquery_references.add(source, destination)
+
+    def test_write_dot_is_consistent_with_pydot(self):
+        for granularity in GRANULARITIES:
+            lineage_graph = self.builder.build_lineage_graph().collapse(granularity=granularity)
+            fp = io.StringIO()
+            write_dot(lineage_graph=lineage_graph, fp=fp)
+            result = pydot.graph_from_dot_data(fp.getvalue())[0]
+            expected = pydot.graph_from_dot_data(self.builder.render(lineage_graph).to_string())[0]
+            self.assertEqual(summarize(result), summarize(expected), granularity)
+
+    def test_write_dot_with_weights(self):
+        lineage_graph = self.builder.build_lineage_graph().collapse(granularity=GRANULARITY_DATASET)
+        fp = io.StringIO()
+        write_dot(lineage_graph=lineage_graph, fp=fp)
+        self.assertIn('"p1.raw" -> "p1.mart" [label="2"];', fp.getvalue())
+        self.assertIn('"p1.mart" -> "p2.report" [label="1"];', fp.getvalue())
+        self.assertIn('"gs://lake/events/2020" -> "p1.raw" [label="1"];', fp.getvalue())
+
+    def test_quote(self):
+        self.assertEqual(quote('a"b\\c'), '"a\\"b\\\\c"')
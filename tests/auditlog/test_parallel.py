@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import tempfile
+import unittest
+
+from bigquery_lineage.auditlog.parallel import (
+    build_tasks, collect_bigquery_references, collect_bigquery_references_in_parallel
+)
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.lineage.edges import LineageEdges
+from bigquery_lineage.utils import (
+    get_project_root, load_json
+)
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config = Config(start="2020-01-01", end="2020-08-01",
+                             filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        resource_dir = os.path.join(get_project_root(), "tests", "resources", "auditlog", "job_completed_event")
+        lines = [json.dumps(load_json(os.path.join(resource_dir, name))) + "\n"
+                 for name in ["query.json", "load.json"]]
+        self.files = []
+        for i in range(2):
+            file = os.path.join(self.tmp_dir.name, "project-{}".format(i), "auditlog.json")
+            os.makedirs(os.path.dirname(file))
+            with open(file, "w") as fp:
+                for _ in range(5):
+                    fp.writelines(lines)
+            self.files.append(file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_tasks(self):
+        tasks = build_tasks(files=self.files, chunk_size=1024)
+        self.assertGreater(len(tasks), len(self.files))
+        self.assertEqual({file for file, _, _ in tasks}, set(self.files))
+
+    def test_collect_bigquery_references_in_parallel(self):
+        expected = LineageEdges()
+        for file in self.files:
+            expected.merge(collect_bigquery_references(config=self.config, file=file))
+        # An edge of the query job and edges of the GCS objects of the load job
+        self.assertEqual(len(expected), 3)
+
+        result = LineageEdges()
+        for _, bigquery_references in collect_bigquery_references_in_parallel(
+                config=self.config, files=self.files, workers=2, chunk_size=1024):
+            result.merge(bigquery_references)
+        # Chunks are merged in the order of completion, so edges are compared regardless of the order.
+        self.assertEqual(dict(result.items()), dict(expected.items()))
+        self.assertEqual(result.get(("dummy-project", "data_quality", "table1"),
+                                    ("dummy-project", "destination_dataset", "destination_table")).count, 10)
+        self.assertEqual(result.get(("gs://datalake",
+                                     "spanner/dag_name=dag1/task_id=ScheduledRepaymentSettings"
+                                     "/year=2020/month=8/day=1/hour=0",
+                                     "20200801000000-*.avro"),
+                                    ("dummy-project", "service", "table")).count, 10)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from bigquery_lineage.auditlog import projection
+from bigquery_lineage.auditlog.auditlog import read_auditlog
+from bigquery_lineage.auditlog.projection import (
+    JobLineage, get_gcs_key, project_job_lineages, read_job_lineages
+)
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.utils import (
+    get_project_root, load_json
+)
+
+
+def get_resource_path(name: str, event: str = "job_completed_event") -> str:
+    return os.path.join(get_project_root(), "tests", "resources", "auditlog", event, name)
+
+
+class TestProjection(unittest.TestCase):
+
+    def test_project_job_lineages_query(self):
+        block = load_json(get_resource_path("query.json"))
+        result = project_job_lineages(block)
+        expected = JobLineage(
+            principal_email="bigquery@dummy-project.iam.gserviceaccount.com",
+            destination=("dummy-project", "destination_dataset", "destination_table"),
+            sources=(("dummy-project", "data_quality", "table1"),),
+            timestamp=datetime(2020, 8, 1, 0, 0, 5, 596000, tzinfo=timezone.utc).timestamp(),
+        )
+        self.assertEqual(result, [expected])
+
+    def test_project_job_lineages_load(self):
+        block = load_json(get_resource_path("load.json"))
+        result = project_job_lineages(block)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].destination, ("dummy-project", "service", "table"))
+        self.assertEqual(result[0].sources[0], (
+            "gs://datalake",
+            "spanner/dag_name=dag1/task_id=ScheduledRepaymentSettings/year=2020/month=8/day=1/hour=0",
+            "20200801000000-*.avro"))
+        self.assertEqual(len(result[0].sources), 2)
+
+    def test_project_job_lineages_insert_response(self):
+        for name in ["query.json", "load.json"]:
+            completed = project_job_lineages(load_json(get_resource_path(name)))
+            inserted = project_job_lineages(load_json(get_resource_path(name, event="job_insert_response")))
+            # A job in an insert response has the same lineage, but it isn't counted twice.
+            self.assertEqual([x._replace(job_count=0) for x in completed], inserted)
+
+    def test_get_gcs_key(self):
+        self.assertEqual(get_gcs_key("gs://bucket/a/b/c.csv"), ("gs://bucket", "a/b", "c.csv"))
+        self.assertEqual(get_gcs_key("gs://bucket/c.csv"), ("gs://bucket", "", "c.csv"))
+        self.assertIsNone(get_gcs_key("gs://bucket"))
+        self.assertIsNone(get_gcs_key("s3://bucket/c.csv"))
+
+    def test_read_job_lineages_is_consistent_with_auditlog(self):
+        config = Config(start="2020-01-01", end="2020-08-01",
+                        filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, "auditlog.json")
+            with open(file, "w") as fp:
+                for name in ["query.json", "load.json", "query.json"]:
+                    fp.write(json.dumps(load_json(get_resource_path(name))) + "\n")
+                for name in ["query.json", "load.json"]:
+                    fp.write(json.dumps(load_json(get_resource_path(name, event="job_insert_response"))) + "\n")
+
+            expected_builder = PydotBuilderV1(config=config)
+            for auditlog in read_auditlog(file=file):
+                expected_builder.update(auditlog=auditlog)
+
+            for orjson in [projection.orjson, None]:
+                with mock.patch.object(projection, "orjson", orjson):
+                    builder = PydotBuilderV1(config=config)
+                    for job_lineage in read_job_lineages(file=file):
+                        builder.update_with_job_lineage(job_lineage=job_lineage)
+                    self.assertEqual(list(builder.bigquery_references.items()),
+                                     list(expected_builder.bigquery_references.items()))
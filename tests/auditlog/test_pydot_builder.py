@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import os
+import unittest
+
+from bigquery_lineage.auditlog.auditlog import Auditlog
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.utils import get_project_root, load_json
+
+
+class TestPydotBuilderV1(unittest.TestCase):
+
+    def setUp(self):
+        config = Config(start="2020-01-01", end="2020-08-01",
+                        filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        self.builder = PydotBuilderV1(config=config)
+        for source, destination in [
+                (("p1", "raw", "events"), ("p1", "raw", "events_clean")),
+                (("p1", "raw", "events"), ("p1", "mart", "daily")),
+                (("p1", "raw", "events_clean"), ("p1", "mart", "daily")),
+                (("p1", "mart", "daily"), ("p2", "report", "kpi"))]:
+            self.builder.bigquery_references.add(source, destination)
+
+    def test_build(self):
+        graph = self.builder.build()
+        subgraph_bq = graph.get_subgraph("cluster_cluster_BigQuery")[0]
+        # An edge across projects belongs to the BigQuery cluster.
+        self.assertEqual([(x.get_source(), x.get_destination()) for x in subgraph_bq.get_edges()],
+                         [('"p1.mart.daily"', '"p2.report.kpi"')])
+
+        subgraph_p1 = subgraph_bq.get_subgraph("cluster_cluster_bq_project_p1")[0]
+        # An edge across datasets in a project belongs to the project cluster.
+        self.assertEqual(len(subgraph_p1.get_edges()), 2)
+        subgraph_raw = subgraph_p1.get_subgraph("cluster_cluster_bq_dataset_p1_raw")[0]
+        # An edge in a dataset belongs to the dataset cluster.
+        self.assertEqual(len(subgraph_raw.get_edges()), 1)
+        # Each node is registered exactly once.
+        self.assertEqual(sorted(x.get_name() for x in subgraph_raw.get_nodes()),
+                         ['"p1.raw.events"', '"p1.raw.events_clean"'])
+
+    def test_build_lineage_graph(self):
+        lineage_graph = self.builder.build_lineage_graph()
+        self.assertEqual(len(lineage_graph), 4)
+        self.assertEqual(lineage_graph.num_edges(), 4)
+
+    def test_update_with_job_completed_event_query(self):
+        path = os.path.join(get_project_root(), "tests", "resources",
+                            "auditlog", "job_completed_event", "query.json")
+        auditlog = Auditlog.parse(block=load_json(path))
+        builder = PydotBuilderV1(config=self.builder.config)
+        builder.update_with_job_completed_event_query(auditlog)
+        self.assertIn((("dummy-project", "data_quality", "table1"),
+                       ("dummy-project", "destination_dataset", "destination_table")),
+                      builder.bigquery_references)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import unittest
+
+from bigquery_lineage.auditlog.projection import JobLineage
+from bigquery_lineage.auditlog.pydot_builder import PydotBuilderV1
+from bigquery_lineage.auditlog.time_index import TimeWindow
+from bigquery_lineage.config import Config, ConfigFilters
+
+
+class TestTimeWindow(unittest.TestCase):
+
+    def test_contains(self):
+        time_window = TimeWindow(since=10.0, until=20.0)
+        self.assertTrue(time_window.contains(10.0))
+        self.assertTrue(time_window.contains(20.0))
+        self.assertFalse(time_window.contains(9.0))
+        self.assertFalse(time_window.contains(21.0))
+        self.assertFalse(time_window.contains(None))
+        self.assertTrue(TimeWindow().contains(None))
+        self.assertTrue(TimeWindow(since=10.0).contains(100.0))
+
+    def test_overlaps(self):
+        time_window = TimeWindow(since=10.0, until=20.0)
+        self.assertTrue(time_window.overlaps(5.0, 10.0))
+        self.assertTrue(time_window.overlaps(15.0, 30.0))
+        self.assertFalse(time_window.overlaps(1.0, 9.0))
+        self.assertFalse(time_window.overlaps(21.0, 30.0))
+        self.assertFalse(time_window.overlaps(None, None))
+        self.assertTrue(TimeWindow().overlaps(None, None))
+
+    def test_builder_with_time_window(self):
+        config = Config(start="2020-01-01", end="2020-08-01",
+                        filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        builder = PydotBuilderV1(config=config, time_window=TimeWindow(since=10.0, until=20.0))
+        for timestamp, table in [(5.0, "a"), (15.0, "b"), (None, "c"), (25.0, "d")]:
+            builder.update_with_job_lineage(JobLineage(
+                principal_email="user@example.com",
+                destination=("p", "d", "dst"),
+                sources=(("p", "d", table),),
+                timestamp=timestamp))
+        self.assertEqual(list(builder.bigquery_references), [(("p", "d", "b"), ("p", "d", "dst"))])
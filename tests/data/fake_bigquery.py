@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+from typing import Any, Callable, Dict, List
+
+
+class FakeRowIterator:
+    """A fake of bigquery.table.RowIterator which serves rows page by page."""
+
+    def __init__(self, rows: List[Dict[str, Any]], page_size: int = None):
+        self.rows = rows
+        self.page_size = page_size or max(len(rows), 1)
+        self.total_rows = len(rows)
+
+    @property
+    def pages(self):
+        for i in range(0, len(self.rows), self.page_size):
+            yield self.rows[i:i + self.page_size]
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        # pylint: disable=unused-argument,import-outside-toplevel
+        import pyarrow
+        for page in self.pages:
+            yield pyarrow.RecordBatch.from_pylist([dict(row) for row in page])
+
+    def __iter__(self):
+        for page in self.pages:
+            for row in page:
+                yield row
+
+
+class FakeQueryJob:
+    """A fake of bigquery.QueryJob."""
+
+    def __init__(self, project: str, rows: List[Dict[str, Any]], total_bytes_processed: int = None):
+        self.project = project
+        self.rows = rows
+        self.total_bytes_processed = total_bytes_processed
+        self.page_sizes = []
+
+    def result(self, page_size: int = None):
+        self.page_sizes.append(page_size)
+        return FakeRowIterator(rows=self.rows, page_size=page_size)
+
+
+class FakeClient:
+    """A fake of bigquery.Client which records queries."""
+
+    def __init__(self, project: str, credentials=None, _http=None, rows: List[Dict[str, Any]] = None,
+                 estimate: Callable[[str], int] = None):
+        """
+        Args:
+            estimate: a function which returns bytes processed by a query
+        """
+        # pylint: disable=unused-argument
+        self.project = project
+        self.rows = rows or []
+        self.estimate = estimate
+        self.queries = []
+        self.closed = False
+
+    def query(self, query: str, job_config=None):
+        self.queries.append((query, job_config))
+        total_bytes_processed = self.estimate(query) if self.estimate is not None else None
+        if job_config is not None and job_config.dry_run:
+            return FakeQueryJob(project=self.project, rows=[], total_bytes_processed=total_bytes_processed)
+        return FakeQueryJob(project=self.project, rows=self.rows, total_bytes_processed=total_bytes_processed)
+
+    def close(self):
+        self.closed = True
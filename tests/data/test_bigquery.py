@@ -1,9 +1,30 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 
+import json
+import os
+import re
+import tempfile
 import unittest
+from datetime import datetime, timezone
 
-from bigquery_lineage.data.bigquery import build_query_job_config, BigQueryDataCollector
+from bigquery_lineage.auditlog.auditlog import read_lines
+from bigquery_lineage.auditlog.projection import read_job_lineages
+from bigquery_lineage.compression import COMPRESSION_GZIP, COMPRESSION_ZSTD, COMPRESSIONS, zstandard
+from bigquery_lineage.config import Config, ConfigSource
+from bigquery_lineage.data.bigquery import (
+    build_query_job_config, get_template, prefetch, BigQueryDataCollector,
+    INCREMENTAL_QUERY_TEMPLATE, LINEAGE_QUERY_TEMPLATE, QUERY_TEMPLATE
+)
+from bigquery_lineage.data.planner import OVER_BUDGET_SPLIT
+from bigquery_lineage.data.watermark import Watermark
+from bigquery_lineage.utils import get_project_root, load_json
+from tests.data.fake_bigquery import FakeQueryJob
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 
 class TestBigQueryDataCollector(unittest.TestCase):
@@ -33,3 +54,269 @@ class TestBigQueryDataCollector(unittest.TestCase):
         self.assertTrue(dataset in query)
         self.assertTrue(start_date in query)
         self.assertTrue(end_date in query)
+
+    def test_get_template(self):
+        # A template is loaded and compiled only once.
+        self.assertIs(get_template(QUERY_TEMPLATE), get_template(QUERY_TEMPLATE))
+        self.assertIsNot(get_template(QUERY_TEMPLATE), get_template(LINEAGE_QUERY_TEMPLATE))
+
+    def test_save_results(self):
+        rows = [{"i": i, "timestamp": datetime(year=2020, month=1, day=1)} for i in range(25)]
+        query_job = FakeQueryJob(project="dummy-project-1", rows=rows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            saved_path = BigQueryDataCollector.save_results(
+                path=tmp_dir, query_job=query_job, page_size=10, prefetch_pages=1)
+            self.assertEqual(saved_path, os.path.join(tmp_dir, "dummy-project-1", "auditlog.json"))
+            with open(saved_path, "r") as fp:
+                result = [json.loads(line) for line in fp]
+        self.assertEqual(query_job.page_sizes, [10])
+        self.assertEqual([x["i"] for x in result], list(range(25)))
+        self.assertEqual(result[0]["timestamp"], "2020-01-01T00:00:00")
+
+    def test_export_logs_concurrently(self):
+        sources = [ConfigSource(project="dummy-project-{}".format(i), dataset="audit_log") for i in range(5)]
+        bql_config = Config(start="2020-01-01", end="2020-01-31", sources=sources)
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                if project == "dummy-project-2":
+                    raise RuntimeError("failed to execute a query")
+                return FakeQueryJob(project=project, rows=[{"project": project}])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=bql_config, max_workers=3)
+            results = collector.export_logs(dry_run=False)
+            # A failure in a source doesn't abort the others.
+            results = {result.source.project: result for result in results}
+            self.assertEqual(len(results), 5)
+            self.assertIsInstance(results["dummy-project-2"].error, RuntimeError)
+            for i in [0, 1, 3, 4]:
+                result = results["dummy-project-{}".format(i)]
+                self.assertIsNone(result.error)
+                self.assertTrue(os.path.isfile(result.saved_path))
+
+    def test_export_logs_of_datasets_in_a_project(self):
+        datasets = ["audit_log_{}".format(i) for i in range(4)]
+        sources = [ConfigSource(project="dummy-project-1", dataset=dataset) for dataset in datasets]
+        bql_config = Config(start="2020-01-01", end="2020-01-31", sources=sources)
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                dataset = [x for x in datasets if "{}.{}.".format(project, x) in query][0]
+                return FakeQueryJob(project=project, rows=[{"dataset": dataset, "i": i} for i in range(1000)])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=bql_config, max_workers=4, page_size=10)
+            results = collector.export_logs(dry_run=False)
+            # Sources of the same project are written to their own files concurrently.
+            self.assertEqual(len({result.saved_path for result in results}), len(datasets))
+            for result in results:
+                self.assertIsNone(result.error)
+                self.assertEqual(result.saved_path, os.path.join(
+                    tmp_dir, "dummy-project-1", "dataset={}".format(result.source.dataset), "auditlog.json"))
+                with open(result.saved_path, "r") as fp:
+                    rows = [json.loads(line) for line in fp]
+                self.assertEqual(rows, [{"dataset": result.source.dataset, "i": i} for i in range(1000)])
+
+    def test_generate_query_incremental(self):
+        query = BigQueryDataCollector.generate_query(
+            project="dummy-project-1",
+            dataset="test_dataset",
+            start_date="2020-01-01",
+            end_date="2020-01-31",
+            watermark="2020-01-15T01:02:03+00:00",
+            template_name=INCREMENTAL_QUERY_TEMPLATE,
+        )
+        self.assertTrue('TIMESTAMP("2020-01-15T01:02:03+00:00")' in query)
+        # A limit could cut off rows which share the last timestamp.
+        self.assertFalse("LIMIT" in query)
+        query = BigQueryDataCollector.generate_query(
+            project="dummy-project-1",
+            dataset="test_dataset",
+            start_date="2020-01-01",
+            end_date="2020-01-31",
+            template_name=INCREMENTAL_QUERY_TEMPLATE,
+        )
+        self.assertTrue("SET watermark = NULL;" in query)
+
+    def test_export_logs_incrementally(self):
+        source = ConfigSource(project="dummy-project-1", dataset="audit_log")
+        bql_config = Config(start="2020-01-01", end="2020-01-31", sources=[source])
+        runs = [
+            [{"i": 0, "timestamp": datetime(2020, 1, 1, 23, tzinfo=timezone.utc)},
+             {"i": 1, "timestamp": datetime(2020, 1, 2, 1, tzinfo=timezone.utc)}],
+            [{"i": 2, "timestamp": datetime(2020, 1, 2, 2, tzinfo=timezone.utc)}],
+            [],
+        ]
+        queries = []
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                queries.append(query)
+                return FakeQueryJob(project=project, rows=runs[len(queries) - 1])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=bql_config, incremental=True)
+            for _ in runs:
+                results = collector.export_logs(dry_run=False)
+                self.assertIsNone(results[0].error)
+
+            self.assertTrue("SET watermark = NULL;" in queries[0])
+            self.assertTrue('TIMESTAMP("2020-01-02T01:00:00+00:00")' in queries[1])
+            self.assertTrue('TIMESTAMP("2020-01-02T02:00:00+00:00")' in queries[2])
+            watermark = Watermark.load(path=tmp_dir, source=source)
+            self.assertEqual(watermark.timestamp, "2020-01-02T02:00:00+00:00")
+
+            result = {}
+            for date in ["2020-01-01", "2020-01-02"]:
+                saved_path = os.path.join(tmp_dir, "dummy-project-1", "dataset=audit_log", "date={}".format(date),
+                                          "auditlog.json")
+                with open(saved_path, "r") as fp:
+                    result[date] = [json.loads(line)["i"] for line in fp]
+            self.assertEqual(result, {"2020-01-01": [0], "2020-01-02": [1, 2]})
+
+    def test_export_logs_incrementally_in_split_queries(self):
+        source = ConfigSource(project="dummy-project-1", dataset="audit_log")
+        bql_config = Config(start="2020-01-01", end="2020-01-02", sources=[source])
+        failures = []
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                dates = re.findall(r'DATE\("(\d{4}-\d{2}-\d{2})"\)', query)[1:3]
+                if job_config is not None and job_config.dry_run:
+                    return FakeQueryJob(project=project, rows=[], total_bytes_processed=100 * len(set(dates)))
+                if dates[0] == "2020-01-02" and not failures:
+                    failures.append(dates[0])
+                    raise RuntimeError("failed to execute a query")
+                day = int(dates[0][-2:])
+                return FakeQueryJob(project=project, rows=[
+                    {"i": day, "timestamp": datetime(2020, 1, day, tzinfo=timezone.utc)}])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=bql_config, incremental=True,
+                                          max_bytes=100, over_budget=OVER_BUDGET_SPLIT)
+            results = collector.export_logs(dry_run=False)
+            self.assertIsInstance(results[0].error, RuntimeError)
+            # Neither rows of the succeeded query nor temporary files are left without the watermark.
+            dataset_dir = os.path.join(tmp_dir, "dummy-project-1", "dataset=audit_log")
+            self.assertEqual([files for _, _, files in os.walk(dataset_dir) if files], [])
+            self.assertIsNone(Watermark.load(path=tmp_dir, source=source).timestamp)
+
+            results = collector.export_logs(dry_run=False)
+            self.assertIsNone(results[0].error)
+            result = {}
+            for day in [1, 2]:
+                with open(os.path.join(dataset_dir, "date=2020-01-0{}".format(day), "auditlog.json"), "r") as fp:
+                    result[day] = [json.loads(line)["i"] for line in fp]
+            self.assertEqual(result, {1: [1], 2: [2]})
+            self.assertEqual(Watermark.load(path=tmp_dir, source=source).timestamp, "2020-01-02T00:00:00+00:00")
+
+    def test_export_logs_incrementally_of_datasets_in_a_project(self):
+        datasets = ["audit_log_{}".format(i) for i in range(4)]
+        sources = [ConfigSource(project="dummy-project-1", dataset=dataset) for dataset in datasets]
+        bql_config = Config(start="2020-01-01", end="2020-01-31", sources=sources)
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                dataset = [x for x in datasets if "{}.{}.".format(project, x) in query][0]
+                rows = [{"dataset": dataset, "i": i, "timestamp": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+                        for i in range(1000)]
+                return FakeQueryJob(project=project, rows=rows)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=bql_config, incremental=True,
+                                          max_workers=4, page_size=10)
+            results = collector.export_logs(dry_run=False)
+            # Rows of the same date in datasets of the same project are saved separately.
+            for result in results:
+                self.assertIsNone(result.error)
+                saved_path = os.path.join(result.saved_path, "date=2020-01-01", "auditlog.json")
+                with open(saved_path, "r") as fp:
+                    rows = [json.loads(line) for line in fp]
+                self.assertEqual([(x["dataset"], x["i"]) for x in rows],
+                                 [(result.source.dataset, i) for i in range(1000)])
+                self.assertEqual(os.listdir(os.path.dirname(saved_path)), ["auditlog.json"])
+
+    def test_generate_query_lineage_only(self):
+        kwargs = dict(
+            project="dummy-project-1",
+            dataset="test_dataset",
+            start_date="2020-01-01",
+            end_date="2020-01-31",
+            template_name=LINEAGE_QUERY_TEMPLATE,
+        )
+        query = BigQueryDataCollector.generate_query(**kwargs)
+        self.assertTrue("dummy-project-1.test_dataset" in query)
+        self.assertFalse("SELECT *" in query)
+        self.assertTrue("ORDER BY timestamp" in query)
+        query = BigQueryDataCollector.generate_query(order_by=False, **kwargs)
+        self.assertFalse("ORDER BY timestamp" in query)
+        self.assertTrue("LIMIT" in query)
+        query = BigQueryDataCollector.generate_query(incremental=True, **kwargs)
+        self.assertFalse("LIMIT" in query)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_save_results_as_parquet(self):
+        resource_dir = os.path.join(get_project_root(), "tests", "resources", "auditlog", "job_completed_event")
+        rows = [load_json(os.path.join(resource_dir, name)) for name in ["query.json", "load.json"]] * 3
+        query_job = FakeQueryJob(project="dummy-project-1", rows=rows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            saved_path = BigQueryDataCollector.save_results_as_parquet(
+                path=tmp_dir, query_job=query_job, page_size=4)
+            self.assertEqual(saved_path, os.path.join(tmp_dir, "dummy-project-1", "auditlog.parquet"))
+            json_path = BigQueryDataCollector.save_results(path=tmp_dir, query_job=query_job)
+            self.assertEqual(list(read_job_lineages(file=saved_path)), list(read_job_lineages(file=json_path)))
+
+    def test_save_results_compressed(self):
+        resource_dir = os.path.join(get_project_root(), "tests", "resources", "auditlog", "job_completed_event")
+        rows = [load_json(os.path.join(resource_dir, name)) for name in ["query.json", "load.json"]] * 3
+        query_job = FakeQueryJob(project="dummy-project-1", rows=rows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = BigQueryDataCollector.save_results(path=tmp_dir, query_job=query_job)
+            for compression in COMPRESSIONS:
+                if compression == COMPRESSION_ZSTD and zstandard is None:
+                    continue
+                saved_path = BigQueryDataCollector.save_results(
+                    path=tmp_dir, query_job=query_job, page_size=2, compression=compression)
+                self.assertTrue(saved_path.endswith(".gz" if compression == COMPRESSION_GZIP else ".zst"))
+                self.assertLess(os.path.getsize(saved_path), os.path.getsize(json_path))
+                self.assertEqual(list(read_job_lineages(file=saved_path)), list(read_job_lineages(file=json_path)))
+
+    def test_save_partitioned_results_compressed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i in range(2):
+                rows = [{"i": i, "timestamp": datetime(2020, 1, 1, tzinfo=timezone.utc)}]
+                BigQueryDataCollector.save_partitioned_results(
+                    path=tmp_dir, query_job=FakeQueryJob(project="dummy-project-1", rows=rows),
+                    compression=COMPRESSION_GZIP)
+            # Appended frames are read as a file.
+            saved_path = os.path.join(tmp_dir, "dummy-project-1", "date=2020-01-01", "auditlog.json.gz")
+            self.assertEqual([json.loads(line)["i"] for line in read_lines(saved_path)], [0, 1])
+            self.assertEqual(os.listdir(os.path.dirname(saved_path)), ["auditlog.json.gz"])
+
+    def test_compression_requires_json(self):
+        with self.assertRaises(ValueError):
+            BigQueryDataCollector(output="/tmp", bql_config=Config(start="2020-01-01", end="2020-01-31"),
+                                  export_format="parquet", compression=COMPRESSION_GZIP)
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_prefetch(self):
+        self.assertEqual(list(prefetch(iter(range(100)), size=3)), list(range(100)))
+
+    def test_prefetch_raises_error(self):
+        def pages():
+            yield 1
+            raise ValueError("failed to fetch a page")
+
+        iterator = prefetch(pages(), size=1)
+        self.assertEqual(next(iterator), 1)
+        with self.assertRaises(ValueError):
+            next(iterator)
+
+    def test_prefetch_stops_when_abandoned(self):
+        iterator = prefetch(iter(range(100)), size=1)
+        self.assertEqual(next(iterator), 0)
+        # Closing the generator must not block on the background thread.
+        iterator.close()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from bigquery_lineage.config import Config, ConfigSource
+from bigquery_lineage.data.bigquery import BigQueryDataCollector
+from bigquery_lineage.data.client_pool import BigQueryClientPool
+from tests.data.fake_bigquery import FakeClient
+
+
+class TestBigQueryClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+
+        def client_factory(project, credentials=None, _http=None):
+            client = FakeClient(project=project, credentials=credentials, _http=_http,
+                                rows=[{"project": project}])
+            self.created.append(client)
+            return client
+
+        self.client_pool = BigQueryClientPool(client_factory=client_factory)
+
+    def test_get(self):
+        projects = ["dummy-project-{}".format(i % 3) for i in range(30)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(self.client_pool.get, projects))
+        self.assertEqual(len(self.created), 3)
+        self.assertEqual(len(self.client_pool), 3)
+        for project, client in zip(projects, clients):
+            self.assertIs(client, self.client_pool.get(project))
+
+    def test_close(self):
+        self.client_pool.get("dummy-project-1")
+        self.client_pool.close()
+        self.assertTrue(self.created[0].closed)
+        self.assertEqual(len(self.client_pool), 0)
+
+    def test_export_logs_with_pooled_clients(self):
+        sources = [ConfigSource(project="dummy-project-1", dataset="audit_log_{}".format(i)) for i in range(4)]
+        bql_config = Config(start="2020-01-01", end="2020-01-31", sources=sources)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = BigQueryDataCollector(output=tmp_dir, bql_config=bql_config, client_pool=self.client_pool)
+            results = collector.export_logs(dry_run=False)
+            collector.close()
+        self.assertTrue(all(result.error is None for result in results))
+        # Sources in the same project share a client.
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(len(self.created[0].queries), 4)
+        self.assertTrue(self.created[0].closed)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import re
+import tempfile
+import unittest
+from datetime import date
+
+from bigquery_lineage.config import Config, ConfigSource
+from bigquery_lineage.data.bigquery import BigQueryDataCollector
+from bigquery_lineage.data.client_pool import BigQueryClientPool
+from bigquery_lineage.data.planner import (
+    OVER_BUDGET_SPLIT, BudgetExceededError, ExportPlan, check_budget, format_bytes, plan_date_ranges,
+    split_date_range
+)
+from tests.data.fake_bigquery import FakeClient
+
+# 100 bytes a day
+BYTES_PER_DAY = 100
+
+
+def estimate_query(query: str) -> int:
+    """Estimate bytes processed by a query from the dates in it."""
+    start_date, end_date = [date.fromisoformat(x) for x in re.findall(r'DATE\("(\d{4}-\d{2}-\d{2})"\)', query)[:2]]
+    return ((end_date - start_date).days + 1) * BYTES_PER_DAY
+
+
+def estimate_date_range(start_date: str, end_date: str) -> int:
+    return ((date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1) * BYTES_PER_DAY
+
+
+class TestPlanner(unittest.TestCase):
+
+    def test_split_date_range(self):
+        self.assertEqual(split_date_range("2020-01-01", "2020-01-31"),
+                         (("2020-01-01", "2020-01-16"), ("2020-01-17", "2020-01-31")))
+        self.assertEqual(split_date_range("2020-01-01", "2020-01-02"),
+                         (("2020-01-01", "2020-01-01"), ("2020-01-02", "2020-01-02")))
+        self.assertIsNone(split_date_range("2020-01-01", "2020-01-01"))
+
+    def test_plan_date_ranges(self):
+        source = ConfigSource(project="dummy-project-1", dataset="audit_log")
+        # Without splitting, a source is a single query.
+        plans = plan_date_ranges(source=source, start_date="2020-01-01", end_date="2020-01-08",
+                                 estimate=estimate_date_range, max_bytes=300)
+        self.assertEqual([(x.start_date, x.end_date, x.total_bytes_processed) for x in plans],
+                         [("2020-01-01", "2020-01-08", 800)])
+        # Each split query is within the budget, and they cover the date range in order.
+        plans = plan_date_ranges(source=source, start_date="2020-01-01", end_date="2020-01-08",
+                                 estimate=estimate_date_range, max_bytes=300, split=True)
+        self.assertEqual([(x.start_date, x.end_date) for x in plans],
+                         [("2020-01-01", "2020-01-02"), ("2020-01-03", "2020-01-04"),
+                          ("2020-01-05", "2020-01-06"), ("2020-01-07", "2020-01-08")])
+        check_budget(plans=plans, max_bytes=300)
+        # A single day over the budget can't be split.
+        plans = plan_date_ranges(source=source, start_date="2020-01-01", end_date="2020-01-02",
+                                 estimate=estimate_date_range, max_bytes=50, split=True)
+        self.assertEqual(len(plans), 2)
+        with self.assertRaises(BudgetExceededError):
+            check_budget(plans=plans, max_bytes=50)
+
+    def test_is_over_budget(self):
+        plan = ExportPlan(source=None, start_date="2020-01-01", end_date="2020-01-01", total_bytes_processed=100)
+        self.assertFalse(plan.is_over_budget(None))
+        self.assertFalse(plan.is_over_budget(100))
+        self.assertTrue(plan.is_over_budget(99))
+
+    def test_format_bytes(self):
+        self.assertEqual(format_bytes(None), "-")
+        self.assertEqual(format_bytes(512), "512 B")
+        self.assertEqual(format_bytes(3 * 1024 * 1024), "3.0 MiB")
+        self.assertEqual(format_bytes(2 * 1024 ** 5), "2048.0 TiB")
+
+
+class TestBigQueryDataCollectorPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = {}
+
+        def client_factory(project, credentials=None, _http=None):
+            client = FakeClient(project=project, credentials=credentials, _http=_http,
+                                rows=[{"project": project}], estimate=estimate_query)
+            self.clients[project] = client
+            return client
+
+        self.client_pool = BigQueryClientPool(client_factory=client_factory)
+        sources = [ConfigSource(project="dummy-project-{}".format(i), dataset="audit_log") for i in range(3)]
+        self.bql_config = Config(start="2020-01-01", end="2020-01-08", sources=sources)
+
+    def test_plan_exports(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = BigQueryDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                              client_pool=self.client_pool, max_bytes=500)
+            results = collector.export_logs(dry_run=True)
+            self.assertEqual(os.listdir(tmp_dir), [])
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertEqual(result.total_bytes_processed, 800)
+            self.assertIsInstance(result.error, BudgetExceededError)
+        # Only dry-run jobs run.
+        for client in self.clients.values():
+            self.assertTrue(all(job_config.dry_run for _, job_config in client.queries))
+
+    def test_refuse_over_budget(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = BigQueryDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                              client_pool=self.client_pool, max_bytes=500)
+            results = collector.export_logs(dry_run=False)
+        for result in results:
+            self.assertIsInstance(result.error, BudgetExceededError)
+        for client in self.clients.values():
+            self.assertEqual(len(client.queries), 1)
+
+    def test_split_over_budget(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = BigQueryDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                              client_pool=self.client_pool, max_bytes=500,
+                                              over_budget=OVER_BUDGET_SPLIT)
+            results = collector.export_logs(dry_run=False)
+            for result in results:
+                self.assertIsNone(result.error)
+                with open(result.saved_path, "r") as fp:
+                    rows = [json.loads(line) for line in fp]
+                # The results of the split queries are appended to a file.
+                self.assertEqual(rows, [{"project": result.source.project}] * 2)
+        for client in self.clients.values():
+            queries = [query for query, job_config in client.queries if not job_config.dry_run]
+            self.assertEqual(len(queries), 2)
+            self.assertTrue('DATE("2020-01-04")' in queries[0])
+            self.assertTrue('DATE("2020-01-05")' in queries[1])
+
+    def test_split_requires_json(self):
+        with self.assertRaises(ValueError):
+            BigQueryDataCollector(output="dummy", bql_config=self.bql_config,
+                                  export_format="parquet", over_budget=OVER_BUDGET_SPLIT)
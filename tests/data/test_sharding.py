@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+
+from bigquery_lineage.config import Config, ConfigSource
+from bigquery_lineage.data.bigquery import BigQueryDataCollector
+from bigquery_lineage.data.planner import BudgetExceededError
+from bigquery_lineage.data.sharding import SHARD_BY_DAY, SHARD_BY_WEEK, Shard, shard_date_range
+from tests.data.fake_bigquery import FakeQueryJob
+
+
+def get_query_dates(query: str):
+    start_date, end_date = [date.fromisoformat(x) for x in re.findall(r'DATE\("(\d{4}-\d{2}-\d{2})"\)', query)[:2]]
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+class TestShardDateRange(unittest.TestCase):
+
+    def test_shard_by_day(self):
+        shards = shard_date_range("2020-01-30", "2020-02-01", shard_by=SHARD_BY_DAY)
+        self.assertEqual([(x.start_date, x.end_date) for x in shards],
+                         [("2020-01-30", "2020-01-30"), ("2020-01-31", "2020-01-31"), ("2020-02-01", "2020-02-01")])
+
+    def test_shard_by_week(self):
+        # 2020-01-01 is a Wednesday.
+        shards = shard_date_range("2020-01-01", "2020-01-14", shard_by=SHARD_BY_WEEK)
+        self.assertEqual([(x.start_date, x.end_date) for x in shards],
+                         [("2020-01-01", "2020-01-05"), ("2020-01-06", "2020-01-12"), ("2020-01-13", "2020-01-14")])
+        self.assertEqual(shards[0].partition, "shard=20200101-20200105")
+
+    def test_split(self):
+        self.assertEqual(Shard("2020-01-01", "2020-01-05").split(),
+                         (Shard("2020-01-01", "2020-01-03"), Shard("2020-01-04", "2020-01-05")))
+        self.assertIsNone(Shard("2020-01-01", "2020-01-01").split())
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            shard_date_range("2020-01-01", "2020-01-14", shard_by="month")
+
+
+class TestBigQueryDataCollectorShard(unittest.TestCase):
+
+    def setUp(self):
+        self.source = ConfigSource(project="dummy-project-1", dataset="audit_log")
+        # A row a day, and the limit truncates a query over more than 4 days.
+        self.bql_config = Config(start="2020-01-01", end="2020-01-14", limit=4, sources=[self.source])
+
+    def test_export_in_shards(self):
+        queries = []
+        failures = []
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                dates = get_query_dates(query)
+                queries.append((dates[0], dates[-1]))
+                if dates[0] == date(2020, 1, 13) and not failures:
+                    failures.append(dates[0])
+                    raise RuntimeError("failed to execute a query")
+                rows = [{"date": x.isoformat()} for x in dates][:4]
+                return FakeQueryJob(project=project, rows=rows)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                          shard_by=SHARD_BY_WEEK, retry_interval=0)
+            results = collector.export_logs(dry_run=False)
+            self.assertIsNone(results[0].error)
+            self.assertEqual(results[0].saved_path,
+                             os.path.join(tmp_dir, "dummy-project-1", "dataset=audit_log"))
+            rows = []
+            for saved_path in glob.glob(os.path.join(results[0].saved_path, "shard=*", "auditlog.json")):
+                with open(saved_path, "r") as fp:
+                    rows.extend(json.loads(line)["date"] for line in fp)
+        # No day is truncated or duplicated.
+        self.assertEqual(sorted(rows), [(date(2020, 1, 1) + timedelta(days=i)).isoformat() for i in range(14)])
+        # The failed shard is retried on its own.
+        self.assertEqual(queries.count((date(2020, 1, 13), date(2020, 1, 14))), 2)
+        # The truncated shards are split.
+        self.assertIn((date(2020, 1, 1), date(2020, 1, 3)), queries)
+        self.assertIn((date(2020, 1, 6), date(2020, 1, 9)), queries)
+
+    def test_export_in_shards_removes_stale_shards(self):
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                return FakeQueryJob(project=project, rows=[{"date": x.isoformat()} for x in get_query_dates(query)])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stale_path = os.path.join(tmp_dir, "dummy-project-1", "dataset=audit_log", "shard=20191231-20191231")
+            os.makedirs(stale_path)
+            collector = FakeDataCollector(output=tmp_dir, bql_config=self.bql_config, shard_by=SHARD_BY_DAY)
+            results = collector.export_logs(dry_run=False)
+            self.assertIsNone(results[0].error)
+            self.assertFalse(os.path.exists(stale_path))
+            self.assertEqual(len(os.listdir(results[0].saved_path)), 14)
+
+    def test_export_in_shards_keeps_previous_export_on_failure(self):
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                if date(2020, 1, 14) in get_query_dates(query):
+                    raise RuntimeError("failed to execute a query")
+                return FakeQueryJob(project=project, rows=[{"date": x.isoformat()} for x in get_query_dates(query)])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            project_dir = os.path.join(tmp_dir, "dummy-project-1")
+            previous_path = os.path.join(project_dir, "dataset=audit_log", "auditlog.json")
+            os.makedirs(os.path.dirname(previous_path))
+            with open(previous_path, "w") as fp:
+                fp.write("{}\n")
+            collector = FakeDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                          shard_by=SHARD_BY_DAY, shard_retries=0)
+            results = collector.export_logs(dry_run=False)
+            self.assertIsInstance(results[0].error, RuntimeError)
+            self.assertTrue(os.path.isfile(previous_path))
+            # No staged part file is left.
+            self.assertEqual(os.listdir(project_dir), ["dataset=audit_log"])
+
+    def test_export_in_shards_shares_query_slots(self):
+        sources = [ConfigSource(project="dummy-project-1", dataset="audit_log_{}".format(i)) for i in range(3)]
+        bql_config = Config(start="2020-01-01", end="2020-01-14", sources=sources)
+        lock = threading.Lock()
+        running = []
+        max_running = []
+
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                with lock:
+                    running.append(query)
+                    max_running.append(len(running))
+                time.sleep(0.01)
+                with lock:
+                    running.remove(query)
+                return FakeQueryJob(project=project, rows=[])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=bql_config, shard_by=SHARD_BY_DAY,
+                                          max_workers=2)
+            results = collector.export_logs(dry_run=False)
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertLessEqual(max(max_running), 2)
+
+    def test_export_in_shards_gives_up(self):
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                raise RuntimeError("failed to execute a query")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                          shard_by=SHARD_BY_WEEK, shard_retries=1, retry_interval=0)
+            results = collector.export_logs(dry_run=False)
+        self.assertIsInstance(results[0].error, RuntimeError)
+
+    def test_export_in_shards_over_budget(self):
+        class FakeDataCollector(BigQueryDataCollector):
+            def execute_query(self, project, query, job_config=None):
+                dates = get_query_dates(query)
+                if date(2020, 1, 10) in dates:
+                    total_bytes_processed = 1000
+                else:
+                    total_bytes_processed = 100 * len(dates)
+                return FakeQueryJob(project=project, rows=[], total_bytes_processed=total_bytes_processed)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            collector = FakeDataCollector(output=tmp_dir, bql_config=self.bql_config,
+                                          shard_by=SHARD_BY_WEEK, max_bytes=300)
+            results = collector.export_logs(dry_run=False)
+        # A single day over the budget can't be split.
+        self.assertIsInstance(results[0].error, BudgetExceededError)
+
+    def test_incremental_does_not_support_sharding(self):
+        with self.assertRaises(ValueError):
+            BigQueryDataCollector(output="dummy", bql_config=self.bql_config, incremental=True,
+                                  shard_by=SHARD_BY_DAY)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import copy
+import json
+import os
+import tempfile
+import unittest
+
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.lineage.columns import (
+    ColumnEdge, ColumnLineageBuilder, ColumnLineageParser, hash_query, normalize_query, parse_column_lineage,
+    read_query_jobs, resolve_table, sqlglot
+)
+from bigquery_lineage.utils import (
+    get_project_root, load_json
+)
+
+QUERY = """
+WITH totals AS (
+  SELECT user_id, SUM(amount) AS total FROM `p.sales.orders` GROUP BY user_id
+)
+SELECT u.id AS user_id, u.name, t.total * 2 AS doubled, CURRENT_DATE() AS snapshot_date
+FROM users.accounts AS u
+JOIN totals AS t ON u.id = t.user_id
+"""
+
+
+class TestColumns(unittest.TestCase):
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  SELECT a\n\tFROM  t ;\n"), "SELECT a FROM t")
+        self.assertEqual(hash_query("SELECT a FROM t"), hash_query("SELECT a\nFROM t;"))
+        self.assertNotEqual(hash_query("SELECT a FROM t"), hash_query("SELECT b FROM t"))
+
+    def test_resolve_table(self):
+        referenced_tables = [("p", "sales", "orders"), ("p", "users", "accounts")]
+        self.assertEqual(resolve_table(("q", "d", "t"), referenced_tables), ("q", "d", "t"))
+        self.assertEqual(resolve_table(("", "users", "accounts"), referenced_tables), ("p", "users", "accounts"))
+        self.assertEqual(resolve_table(("", "", "orders"), referenced_tables), ("p", "sales", "orders"))
+        self.assertIsNone(resolve_table(("", "other", "orders"), referenced_tables))
+
+    @unittest.skipIf(sqlglot is None, "sqlglot is not installed")
+    def test_parse_column_lineage(self):
+        self.assertEqual(parse_column_lineage(QUERY), {
+            "user_id": ((("", "users", "accounts"), "id"),),
+            "name": ((("", "users", "accounts"), "name"),),
+            "doubled": ((("p", "sales", "orders"), "amount"),),
+            "snapshot_date": (),
+        })
+        # Columns of the destination are mapped by position.
+        self.assertEqual(parse_column_lineage("INSERT INTO d.t (a, b) SELECT x, y + z FROM p.d.s"), {
+            "a": ((("p", "d", "s"), "x"),),
+            "b": ((("p", "d", "s"), "y"), (("p", "d", "s"), "z")),
+        })
+        self.assertEqual(
+            parse_column_lineage("INSERT INTO d.t (a, b) SELECT x AS c, y FROM p.d.s UNION ALL SELECT m, n FROM p.d.u"),
+            {"a": ((("p", "d", "s"), "x"), (("p", "d", "u"), "m")),
+             "b": ((("p", "d", "s"), "y"), (("p", "d", "u"), "n"))})
+        self.assertEqual(parse_column_lineage("CREATE TABLE d.t AS SELECT x AS a FROM p.d.s"),
+                         {"a": ((("p", "d", "s"), "x"),)})
+        self.assertEqual(parse_column_lineage("DECLARE x INT64; SELECT 1"), {})
+        self.assertEqual(parse_column_lineage("SELECT FROM WHERE ("), {})
+
+    @unittest.skipIf(sqlglot is None, "sqlglot is not installed")
+    def test_parser_cache(self):
+        parser = ColumnLineageParser(cache_size=1)
+        parser.parse("SELECT a FROM p.d.t")
+        parser.parse("SELECT a\n  FROM p.d.t;")
+        self.assertEqual((parser.misses, parser.hits), (1, 1))
+        parser.parse("SELECT b FROM p.d.t")
+        parser.parse("SELECT a FROM p.d.t")
+        self.assertEqual((parser.misses, parser.hits), (3, 1))
+
+    @unittest.skipIf(sqlglot is None, "sqlglot is not installed")
+    def test_build_column_lineage(self):
+        template = load_json(os.path.join(
+            get_project_root(), "tests", "resources", "auditlog", "job_completed_event", "query.json"))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = os.path.join(tmp_dir, "auditlog.json")
+            with open(file, "w") as fp:
+                for i in range(5):
+                    block = copy.deepcopy(template)
+                    job = block["protopayload_auditlog"]["servicedata_v1_bigquery"]["jobCompletedEvent"]["job"]
+                    # Scheduled runs of the same query differ only in whitespace.
+                    job["jobConfiguration"]["query"]["query"] = QUERY + " " * i
+                    job["jobStatistics"]["referencedTables"] = [
+                        {"projectId": "p", "datasetId": "sales", "tableId": "orders"},
+                        {"projectId": "p", "datasetId": "users", "tableId": "accounts"},
+                    ]
+                    fp.write(json.dumps(block) + "\n")
+            config = Config(start="2020-01-01", end="2020-08-01",
+                            filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+            builder = ColumnLineageBuilder(config=config)
+            for query_job in read_query_jobs(file=file):
+                builder.update(query_job=query_job)
+        edges = builder.build()
+        self.assertEqual(builder.parser.misses, 1)
+        destination = ("dummy-project", "destination_dataset", "destination_table")
+        self.assertEqual(edges, {
+            ColumnEdge(("p", "users", "accounts"), "id", destination, "user_id"): 5,
+            ColumnEdge(("p", "users", "accounts"), "name", destination, "name"): 5,
+            ColumnEdge(("p", "sales", "orders"), "amount", destination, "doubled"): 5,
+        })
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import pickle
+import unittest
+
+from bigquery_lineage.lineage.edges import EdgeStats, LineageEdges
+
+
+class TestLineageEdges(unittest.TestCase):
+
+    def test_add(self):
+        edges = LineageEdges()
+        for timestamp in [30.0, 10.0, 20.0, None]:
+            edges.add(("p", "d", "src"), ("p", "d", "dst"), timestamp=timestamp)
+        edges.add(("p", "d", "dst"), ("p", "d", "mart"), timestamp=5.0)
+
+        self.assertEqual(len(edges), 2)
+        self.assertEqual(len(edges.nodes), 3)
+        self.assertEqual(list(edges), [(("p", "d", "src"), ("p", "d", "dst")), (("p", "d", "dst"), ("p", "d", "mart"))])
+        self.assertIn((("p", "d", "src"), ("p", "d", "dst")), edges)
+        self.assertNotIn((("p", "d", "dst"), ("p", "d", "src")), edges)
+        self.assertEqual(edges.get(("p", "d", "src"), ("p", "d", "dst")),
+                         EdgeStats(count=4, first_seen=10.0, last_seen=30.0))
+        self.assertIsNone(edges.get(("p", "d", "mart"), ("p", "d", "src")))
+
+    def test_merge(self):
+        edges1 = LineageEdges()
+        edges1.add(("p", "d", "a"), ("p", "d", "b"), timestamp=1.0)
+        edges2 = LineageEdges()
+        # The node IDs differ from edges1.
+        edges2.add(("p", "d", "c"), ("p", "d", "a"), timestamp=5.0)
+        edges2.add(("p", "d", "a"), ("p", "d", "b"), count=2, first_seen=0.5, last_seen=3.0)
+        edges1.merge(pickle.loads(pickle.dumps(edges2)))
+
+        self.assertEqual(edges1.get(("p", "d", "a"), ("p", "d", "b")),
+                         EdgeStats(count=3, first_seen=0.5, last_seen=3.0))
+        self.assertEqual(edges1.get(("p", "d", "c"), ("p", "d", "a")),
+                         EdgeStats(count=1, first_seen=5.0, last_seen=5.0))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import unittest
+
+from bigquery_lineage.lineage.edges import EdgeStats, LineageEdges
+from bigquery_lineage.lineage.graph import (
+    DIRECTION_BOTH, DIRECTION_DOWNSTREAM, DIRECTION_UPSTREAM, GRANULARITY_DATASET, GRANULARITY_PROJECT,
+    GRANULARITY_TABLE, LineageGraph, parse_table_id
+)
+
+
+class TestLineageGraph(unittest.TestCase):
+
+    def test_from_edges(self):
+        edges = LineageEdges()
+        edges.add(("p1", "raw", "events"), ("p1", "mart", "daily"), timestamp=1.0)
+        edges.add(("p1", "raw", "events"), ("p1", "mart", "daily"), timestamp=2.0)
+        edges.add(("p1", "mart", "daily"), ("p2", "report", "kpi"), timestamp=3.0)
+        graph = LineageGraph.from_edges(edges)
+
+        self.assertEqual(len(graph), 3)
+        self.assertEqual(graph.num_edges(), 2)
+        events = graph.get_id(("p1", "raw", "events"))
+        daily = graph.get_id(("p1", "mart", "daily"))
+        kpi = graph.get_id(("p2", "report", "kpi"))
+        self.assertEqual(graph.successors[events], [daily])
+        self.assertEqual(graph.predecessors[kpi], [daily])
+        self.assertEqual(graph.edge_stats[(events, daily)], EdgeStats(count=2, first_seen=1.0, last_seen=2.0))
+        self.assertEqual(graph.datasets, {
+            "p1": {"raw": [events], "mart": [daily]},
+            "p2": {"report": [kpi]},
+        })
+
+    def test_add_edge_merges_stats(self):
+        graph = LineageGraph()
+        graph.add_edge(("p", "d", "a"), ("p", "d", "b"), EdgeStats(count=1, first_seen=5.0, last_seen=5.0))
+        graph.add_edge(("p", "d", "a"), ("p", "d", "b"), EdgeStats(count=2, first_seen=1.0, last_seen=None))
+        self.assertEqual(graph.num_edges(), 1)
+        self.assertEqual(graph.successors[0], [1])
+        self.assertEqual(graph.edge_stats[(0, 1)], EdgeStats(count=3, first_seen=1.0, last_seen=5.0))
+
+
+class TestSubgraph(unittest.TestCase):
+
+    def setUp(self):
+        # raw.a -> stg.b -> mart.c -> report.d, and raw.x -> mart.c
+        self.graph = LineageGraph()
+        for source, destination in [
+                (("p", "raw", "a"), ("p", "stg", "b")),
+                (("p", "stg", "b"), ("p", "mart", "c")),
+                (("p", "mart", "c"), ("p", "report", "d")),
+                (("p", "raw", "x"), ("p", "mart", "c")),
+                (("q", "other", "y"), ("q", "other", "z"))]:
+            self.graph.add_edge(source, destination)
+
+    def test_parse_table_id(self):
+        self.assertEqual(parse_table_id("p.d.t"), ("p", "d", "t"))
+        self.assertEqual(parse_table_id("example.com:p.d.t"), ("example.com:p", "d", "t"))
+        self.assertEqual(parse_table_id("gs://bucket/a/b.csv"), ("gs://bucket", "a", "b.csv"))
+        with self.assertRaises(ValueError):
+            parse_table_id("d.t")
+        with self.assertRaises(ValueError):
+            parse_table_id("gs://bucket")
+
+    def test_subgraph_upstream(self):
+        subgraph = self.graph.subgraph(roots=[("p", "mart", "c")], direction=DIRECTION_UPSTREAM)
+        self.assertEqual(sorted(subgraph.nodes),
+                         [("p", "mart", "c"), ("p", "raw", "a"), ("p", "raw", "x"), ("p", "stg", "b")])
+        self.assertEqual(subgraph.num_edges(), 3)
+
+    def test_subgraph_downstream_with_depth(self):
+        subgraph = self.graph.subgraph(roots=[("p", "raw", "a")], direction=DIRECTION_DOWNSTREAM, depth=2)
+        self.assertEqual(sorted(subgraph.nodes), [("p", "mart", "c"), ("p", "raw", "a"), ("p", "stg", "b")])
+        self.assertEqual(subgraph.num_edges(), 2)
+
+    def test_subgraph_both(self):
+        subgraph = self.graph.subgraph(roots=[("p", "stg", "b")], direction=DIRECTION_BOTH, depth=1)
+        self.assertEqual(sorted(subgraph.nodes), [("p", "mart", "c"), ("p", "raw", "a"), ("p", "stg", "b")])
+        # raw.x is upstream of a downstream table, so it isn't reachable.
+        subgraph = self.graph.subgraph(roots=[("p", "stg", "b")], direction=DIRECTION_BOTH)
+        self.assertEqual(len(subgraph), 4)
+        self.assertEqual(subgraph.num_edges(), 3)
+
+    def test_subgraph_with_cycle(self):
+        self.graph.add_edge(("p", "report", "d"), ("p", "raw", "a"))
+        subgraph = self.graph.subgraph(roots=[("p", "raw", "a")], direction=DIRECTION_BOTH)
+        self.assertEqual(len(subgraph), 5)
+        self.assertEqual(subgraph.num_edges(), 5)
+
+    def test_subgraph_unknown_root(self):
+        with self.assertRaises(KeyError):
+            self.graph.subgraph(roots=[("p", "raw", "unknown")])
+
+
+class TestCollapse(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = LineageGraph()
+        self.graph.add_edge(("p", "raw", "a"), ("p", "raw", "b"), EdgeStats(count=1, first_seen=1.0, last_seen=1.0))
+        self.graph.add_edge(("p", "raw", "a"), ("p", "mart", "c"), EdgeStats(count=2, first_seen=2.0, last_seen=3.0))
+        self.graph.add_edge(("p", "raw", "b"), ("p", "mart", "c"), EdgeStats(count=3, first_seen=1.0, last_seen=2.0))
+        self.graph.add_edge(("p", "mart", "c"), ("q", "report", "d"), EdgeStats(count=4, first_seen=5.0, last_seen=5.0))
+
+    def test_collapse_to_datasets(self):
+        collapsed = self.graph.collapse(granularity=GRANULARITY_DATASET)
+        self.assertEqual(collapsed.granularity, GRANULARITY_DATASET)
+        self.assertEqual(collapsed.nodes, [("p", "raw", None), ("p", "mart", None), ("q", "report", None)])
+        # The edge in the raw dataset is dropped.
+        self.assertEqual(dict(collapsed.edge_stats), {
+            (0, 1): EdgeStats(count=5, first_seen=1.0, last_seen=3.0),
+            (1, 2): EdgeStats(count=4, first_seen=5.0, last_seen=5.0),
+        })
+
+    def test_collapse_to_projects(self):
+        collapsed = self.graph.collapse(granularity=GRANULARITY_PROJECT)
+        self.assertEqual(collapsed.nodes, [("p", None, None), ("q", None, None)])
+        self.assertEqual(dict(collapsed.edge_stats), {(0, 1): EdgeStats(count=4, first_seen=5.0, last_seen=5.0)})
+
+    def test_collapse_to_tables(self):
+        collapsed = self.graph.collapse(granularity=GRANULARITY_TABLE)
+        self.assertEqual(collapsed.nodes, self.graph.nodes)
+        self.assertEqual(collapsed.edge_stats, self.graph.edge_stats)
+
+    def test_collapse_with_invalid_granularity(self):
+        with self.assertRaises(ValueError):
+            self.graph.collapse(granularity="column")
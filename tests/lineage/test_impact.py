@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import random
+import unittest
+
+from bigquery_lineage.lineage.graph import DIRECTION_DOWNSTREAM, LineageGraph
+from bigquery_lineage.lineage.impact import CSRGraph, ImpactAnalyzer, strongly_connected_components
+
+
+def create_graph(edges) -> LineageGraph:
+    graph = LineageGraph()
+    for source, destination in edges:
+        graph.add_edge(("p", "d", source), ("p", "d", destination))
+    return graph
+
+
+class TestImpact(unittest.TestCase):
+
+    def test_csr_graph(self):
+        csr = CSRGraph(num_nodes=4, edges=[(2, 0), (0, 1), (0, 3), (2, 1)])
+        self.assertEqual(len(csr), 4)
+        self.assertEqual(csr.num_edges(), 4)
+        self.assertEqual(list(csr.successors(0)), [1, 3])
+        self.assertEqual(list(csr.successors(1)), [])
+        self.assertEqual(sorted(csr.successors(2)), [0, 1])
+
+    def test_strongly_connected_components(self):
+        # a -> b -> c -> a is a cycle, and c -> d -> d has a self-loop.
+        graph = create_graph([("a", "b"), ("b", "c"), ("c", "a"), ("c", "d"), ("d", "d"), ("e", "a")])
+        components, num_components = strongly_connected_components(CSRGraph.from_lineage_graph(graph))
+        self.assertEqual(num_components, 3)
+        ids = {node[2]: node_id for node_id, node in enumerate(graph.nodes)}
+        self.assertEqual(len({components[ids[x]] for x in "abc"}), 1)
+        # Components are in a reverse topological order.
+        self.assertGreater(components[ids["e"]], components[ids["a"]])
+        self.assertGreater(components[ids["a"]], components[ids["d"]])
+
+    def test_downstream(self):
+        graph = create_graph([("a", "b"), ("b", "c"), ("c", "b"), ("c", "d"), ("x", "a"), ("y", "z")])
+        analyzer = ImpactAnalyzer(graph)
+
+        def downstream(*names):
+            node_ids = analyzer.downstream(graph.get_id(("p", "d", name)) for name in names)
+            return sorted(graph.nodes[node_id][2] for node_id in node_ids)
+
+        self.assertEqual(downstream("a"), ["b", "c", "d"])
+        # A seed in a cycle is downstream of itself.
+        self.assertEqual(downstream("b"), ["b", "c", "d"])
+        # A seed downstream of another seed is included.
+        self.assertEqual(downstream("x", "a", "y"), ["a", "b", "c", "d", "z"])
+        self.assertEqual(downstream("d"), [])
+        cycles = analyzer.cycles(analyzer.downstream([graph.get_id(("p", "d", "a"))]))
+        self.assertEqual([sorted(graph.nodes[node_id][2] for node_id in cycle) for cycle in cycles], [["b", "c"]])
+
+    def test_downstream_is_consistent_with_traverse(self):
+        rng = random.Random(0)
+        names = ["t{}".format(i) for i in range(200)]
+        graph = create_graph([(rng.choice(names), rng.choice(names)) for _ in range(400)])
+        analyzer = ImpactAnalyzer(graph)
+        for _ in range(20):
+            seed_ids = rng.sample(range(len(graph)), 5)
+            expected = set()
+            for seed_id in seed_ids:
+                _, edges = graph.traverse(root_ids=[seed_id], direction=DIRECTION_DOWNSTREAM)
+                expected.update(destination for _, destination in edges)
+            self.assertEqual(analyzer.downstream(seed_ids), sorted(expected))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import copy
+import json
+import os
+import tempfile
+import unittest
+
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.lineage.graph import DIRECTION_UPSTREAM
+from bigquery_lineage.lineage.index import LineageIndex, find_last_line_end
+from bigquery_lineage.utils import (
+    get_project_root, load_json
+)
+
+
+def create_block(template, source: str, destination: str):
+    """Create a line of a query job from a table to a table."""
+    block = copy.deepcopy(template)
+    job = block["protopayload_auditlog"]["servicedata_v1_bigquery"]["jobCompletedEvent"]["job"]
+    (project, dataset, table) = source.split(".")
+    job["jobStatistics"]["referencedTables"] = [{"projectId": project, "datasetId": dataset, "tableId": table}]
+    (project, dataset, table) = destination.split(".")
+    job["jobConfiguration"]["query"]["destinationTable"] = {
+        "projectId": project, "datasetId": dataset, "tableId": table}
+    return block
+
+
+class TestLineageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.template = load_json(os.path.join(
+            get_project_root(), "tests", "resources", "auditlog", "job_completed_event", "query.json"))
+        self.config = Config(start="2020-01-01", end="2020-08-01",
+                             filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        self.file = os.path.join(self.tmp_dir.name, "p", "auditlog.json")
+        os.makedirs(os.path.dirname(self.file))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_edges(self, edges, mode: str = "w", partial: str = ""):
+        with open(self.file, mode) as fp:
+            for source, destination in edges:
+                fp.write(json.dumps(create_block(self.template, source, destination)) + "\n")
+            fp.write(partial)
+
+    def test_refresh(self):
+        index = LineageIndex(config=self.config)
+        self.write_edges([("p.raw.a", "p.stg.b"), ("p.stg.b", "p.mart.c")])
+        self.assertEqual(index.refresh([self.file]), [self.file])
+        self.assertEqual(index.stats(), {"nodes": 3, "edges": 2, "files": 1})
+        # An unchanged file is skipped.
+        self.assertEqual(index.refresh([self.file]), [])
+
+        # Appended lines are applied, but a line which is being written is left for the next time.
+        partial = json.dumps(create_block(self.template, "p.mart.c", "p.report.e"))
+        self.write_edges([("p.raw.x", "p.stg.b")], mode="a", partial=partial[:100])
+        self.assertEqual(index.refresh([self.file]), [self.file])
+        self.assertEqual(index.stats()["edges"], 3)
+        with open(self.file, "a") as fp:
+            fp.write(partial[100:] + "\n")
+        self.assertEqual(index.refresh([self.file]), [self.file])
+        self.assertEqual(index.stats(), {"nodes": 5, "edges": 4, "files": 1})
+        self.assertEqual(index.traverse("p.raw.a")["edges"][0]["job_count"], 1)
+
+        # A rewritten file makes the index rebuilt.
+        self.write_edges([("p.raw.a", "p.stg.b")] * 2)
+        os.utime(self.file, (0, 0))
+        self.assertEqual(index.refresh([self.file]), [self.file])
+        self.assertEqual(index.stats(), {"nodes": 2, "edges": 1, "files": 1})
+        self.assertEqual(index.traverse("p.raw.a")["edges"][0]["job_count"], 2)
+
+        # A removed file makes the index rebuilt.
+        self.assertEqual(index.refresh([]), [])
+        self.assertEqual(index.stats(), {"nodes": 0, "edges": 0, "files": 0})
+
+    def test_queries(self):
+        index = LineageIndex(config=self.config)
+        self.write_edges([("p.raw.a", "p.stg.b"), ("p.stg.b", "p.mart.c"), ("q.raw.a", "p.mart.c")])
+        index.refresh([self.file])
+
+        self.assertEqual(index.search("A"), ["p.raw.a", "q.raw.a"])
+        self.assertEqual(index.search("z"), [])
+        result = index.traverse("p.mart.c", direction=DIRECTION_UPSTREAM, depth=1)
+        self.assertEqual(result["nodes"], ["p.mart.c", "p.stg.b", "q.raw.a"])
+        self.assertEqual([(x["source"], x["destination"]) for x in result["edges"]],
+                         [("p.stg.b", "p.mart.c"), ("q.raw.a", "p.mart.c")])
+        self.assertEqual(index.find_path("p.raw.a", "p.mart.c"), ["p.raw.a", "p.stg.b", "p.mart.c"])
+        self.assertIsNone(index.find_path("p.mart.c", "p.raw.a"))
+        with self.assertRaises(KeyError):
+            index.traverse("p.raw.z")
+        with self.assertRaises(ValueError):
+            index.traverse("z")
+
+    def test_find_last_line_end(self):
+        with open(self.file, "wb") as fp:
+            fp.write(b"a\nbb\nccc")
+        self.assertEqual(find_last_line_end(self.file, 0, 8), 5)
+        self.assertEqual(find_last_line_end(self.file, 5, 8), 5)
+        self.assertEqual(find_last_line_end(self.file, 0, 2), 2)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import threading
+import unittest
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from bigquery_lineage.config import Config, ConfigFilters
+from bigquery_lineage.lineage.edges import LineageEdges
+from bigquery_lineage.lineage.index import LineageIndex
+from bigquery_lineage.lineage.server import LineageServer
+
+
+class TestLineageServer(unittest.TestCase):
+
+    def setUp(self):
+        config = Config(start="2020-01-01", end="2020-08-01",
+                        filters=ConfigFilters(excluded_tables=[], excluded_principal_emails=[]))
+        index = LineageIndex(config=config)
+        edges = LineageEdges()
+        edges.add(("p", "raw", "a"), ("p", "stg", "b"))
+        edges.add(("p", "stg", "b"), ("p", "mart", "c"))
+        index.apply_edges(edges)
+        self.server = LineageServer(index=index, host="127.0.0.1", port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def get(self, path: str):
+        url = "http://{}:{}{}".format(*self.server.server_address[:2], path)
+        try:
+            with urlopen(url) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_health(self):
+        self.assertEqual(self.get("/health"), (200, {"nodes": 3, "edges": 2, "files": 0}))
+
+    def test_search(self):
+        self.assertEqual(self.get("/search?name=b"), (200, {"name": "b", "tables": ["p.stg.b"]}))
+
+    def test_upstream_and_downstream(self):
+        status, body = self.get("/upstream?table=p.mart.c")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["nodes"], ["p.mart.c", "p.raw.a", "p.stg.b"])
+        status, body = self.get("/downstream?table=p.raw.a&depth=1")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["nodes"], ["p.raw.a", "p.stg.b"])
+        self.assertEqual(body["edges"][0]["job_count"], 1)
+
+    def test_path(self):
+        status, body = self.get("/path?from=p.raw.a&to=p.mart.c")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["path"], ["p.raw.a", "p.stg.b", "p.mart.c"])
+
+    def test_errors(self):
+        self.assertEqual(self.get("/upstream")[0], 400)
+        self.assertEqual(self.get("/upstream?table=p.raw.a&depth=x")[0], 400)
+        self.assertEqual(self.get("/upstream?table=invalid")[0], 400)
+        self.assertEqual(self.get("/upstream?table=p.raw.z")[0], 404)
+        self.assertEqual(self.get("/unknown")[0], 404)
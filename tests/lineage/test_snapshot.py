@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import os
+import struct
+import tempfile
+import unittest
+
+from bigquery_lineage.lineage.edges import EdgeStats
+from bigquery_lineage.lineage.graph import (
+    DIRECTION_BOTH, DIRECTION_DOWNSTREAM, DIRECTION_UPSTREAM, GRANULARITY_DATASET, LineageGraph
+)
+from bigquery_lineage.lineage.snapshot import GraphSnapshot, read_snapshot, write_snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "graph.bqlgraph")
+        self.graph = LineageGraph()
+        self.graph.add_edge(("p", "raw", "a"), ("p", "stg", "b"), EdgeStats(count=3, first_seen=1.5, last_seen=9.0))
+        self.graph.add_edge(("p", "stg", "b"), ("p", "mart", "c"), EdgeStats(count=1, first_seen=None, last_seen=None))
+        self.graph.add_edge(("p", "raw", "a"), ("p", "mart", "c"))
+        self.graph.add_edge(("gs://bucket", "dir", "*.avro"), ("p", "raw", "a"))
+        self.graph.add_node(("q", "ds", "lonely"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assertSameGraph(self, actual: LineageGraph, expected: LineageGraph):
+        self.assertEqual(actual.granularity, expected.granularity)
+        self.assertEqual(actual.nodes, expected.nodes)
+        self.assertEqual(actual.edge_stats, expected.edge_stats)
+        self.assertEqual(actual.datasets, expected.datasets)
+
+    def test_round_trip(self):
+        write_snapshot(graph=self.graph, path=self.path)
+        self.assertSameGraph(read_snapshot(self.path), self.graph)
+        collapsed = self.graph.collapse(GRANULARITY_DATASET)
+        write_snapshot(graph=collapsed, path=self.path)
+        self.assertSameGraph(read_snapshot(self.path), collapsed)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_graph_snapshot(self):
+        write_snapshot(graph=self.graph, path=self.path)
+        with GraphSnapshot(self.path) as snapshot:
+            self.assertEqual((len(snapshot), snapshot.num_edges), (5, 4))
+            # Each name is interned once, although "p" is the project of 3 nodes.
+            self.assertEqual(len(snapshot.get_strings()), 13)
+            node_id = snapshot.get_id(("p", "raw", "a"))
+            self.assertEqual(snapshot.get_node(node_id), ("p", "raw", "a"))
+            self.assertEqual(sorted(snapshot.get_node(x) for x in snapshot.successors(node_id)),
+                             [("p", "mart", "c"), ("p", "stg", "b")])
+            self.assertIsNone(snapshot.get_id(("p", "raw", "z")))
+            stats = {(source_id, destination_id): stats for source_id, destination_id, stats in snapshot.iter_edges()}
+            self.assertEqual(stats, self.graph.edge_stats)
+
+    def test_subgraph(self):
+        self.graph.add_edge(("p", "mart", "c"), ("p", "raw", "a"))
+        write_snapshot(graph=self.graph, path=self.path)
+        with GraphSnapshot(self.path) as snapshot:
+            node_id = snapshot.get_id(("p", "raw", "a"))
+            self.assertEqual(sorted(snapshot.get_node(x) for x in snapshot.predecessors(node_id)),
+                             [("gs://bucket", "dir", "*.avro"), ("p", "mart", "c")])
+            for direction in [DIRECTION_UPSTREAM, DIRECTION_DOWNSTREAM, DIRECTION_BOTH]:
+                for depth in [None, 1]:
+                    self.assertSameGraph(
+                        snapshot.subgraph(roots=[("p", "stg", "b")], direction=direction, depth=depth),
+                        self.graph.subgraph(roots=[("p", "stg", "b")], direction=direction, depth=depth))
+            with self.assertRaises(KeyError):
+                snapshot.subgraph(roots=[("p", "raw", "z")])
+
+    def test_invalid_snapshot(self):
+        with open(self.path, "wb") as fp:
+            fp.write(b"not a snapshot" * 10)
+        with self.assertRaisesRegex(ValueError, "Invalid snapshot"):
+            GraphSnapshot(self.path)
+
+        write_snapshot(graph=self.graph, path=self.path)
+        with open(self.path, "r+b") as fp:
+            fp.seek(8)
+            fp.write(struct.pack("<I", 999))
+        with self.assertRaisesRegex(ValueError, "Unsupported snapshot version 999"):
+            GraphSnapshot(self.path)
+
+        write_snapshot(graph=self.graph, path=self.path)
+        with open(self.path, "r+b") as fp:
+            fp.seek(12)
+            fp.write(struct.pack("<I", 7))
+        with self.assertRaisesRegex(ValueError, "Unsupported snapshot granularity 7"):
+            GraphSnapshot(self.path)
+
+        write_snapshot(graph=self.graph, path=self.path)
+        with open(self.path, "r+b") as fp:
+            fp.truncate(os.path.getsize(self.path) - 8)
+        with self.assertRaisesRegex(ValueError, "Truncated snapshot"):
+            GraphSnapshot(self.path)
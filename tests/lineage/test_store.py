@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import tempfile
+import unittest
+
+from bigquery_lineage.lineage.store import EdgeStore
+from bigquery_lineage.utils import (
+    get_project_root, load_json
+)
+
+
+class TestEdgeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(get_project_root(), "tests", "resources",
+                            "auditlog", "job_completed_event", "query.json")
+        self.block = load_json(path)
+        self.store_path = os.path.join(self.tmp_dir.name, "lineage.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_auditlog(self, name: str, timestamps):
+        file = os.path.join(self.tmp_dir.name, name, "auditlog.json")
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "w") as fp:
+            for timestamp in timestamps:
+                fp.write(json.dumps({**self.block, "timestamp": timestamp}) + "\n")
+        return file
+
+    def test_sync(self):
+        file1 = self.write_auditlog("p1", ["2020-08-01T00:00:00+00:00", "2020-08-02T00:00:00+00:00"])
+        file2 = self.write_auditlog("p2", ["2020-07-31T00:00:00+00:00"])
+        with EdgeStore(path=self.store_path) as store:
+            self.assertEqual(store.sync([file1, file2]), [file1, file2])
+            edges = list(store.iter_edges())
+            self.assertEqual(len(edges), 1)
+            self.assertEqual(edges[0].source, ("dummy-project", "data_quality", "table1"))
+            self.assertEqual(edges[0].destination, ("dummy-project", "destination_dataset", "destination_table"))
+            self.assertEqual(edges[0].job_count, 3)
+            self.assertEqual(edges[0].first_seen, 1596153600.0)
+            self.assertEqual(edges[0].last_seen, 1596326400.0)
+
+        # Files which have been ingested are skipped.
+        with EdgeStore(path=self.store_path) as store:
+            self.assertEqual(store.sync([file1, file2]), [])
+            self.assertEqual(list(store.iter_edges())[0].job_count, 3)
+
+        # A modified file replaces its previous edges, and a removed file is forgotten.
+        file1 = self.write_auditlog("p1", ["2020-08-01T00:00:00+00:00"] * 5)
+        os.utime(file1, (0, 0))
+        with EdgeStore(path=self.store_path) as store:
+            self.assertEqual(store.sync([file1]), [file1])
+            edges = list(store.iter_edges())
+            self.assertEqual(edges[0].job_count, 5)
+            self.assertEqual(store.ingested_paths(), [file1])
+
+    def test_iter_edges_by_table(self):
+        file = self.write_auditlog("p1", ["2020-08-01T00:00:00+00:00"])
+        with EdgeStore(path=self.store_path) as store:
+            store.sync([file])
+            result = list(store.iter_edges(destination=("dummy-project", "destination_dataset", "destination_table")))
+            self.assertEqual(len(result), 1)
+            result = list(store.iter_edges(source=("dummy-project", "destination_dataset", "destination_table")))
+            self.assertEqual(result, [])
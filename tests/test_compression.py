@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+
+import gzip
+import os
+import tempfile
+import unittest
+
+from bigquery_lineage.compression import (
+    COMPRESSION_GZIP, COMPRESSION_ZSTD, COMPRESSIONS, FrameWriter,
+    add_compression_suffix, get_compression, iter_decompressed_lines, zstandard
+)
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.lines = [b"line-%d\n" % i for i in range(30)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_compressions(self):
+        return [x for x in COMPRESSIONS if x != COMPRESSION_ZSTD or zstandard is not None]
+
+    def write_frames(self, compression: str) -> str:
+        file = os.path.join(self.tmp_dir.name, add_compression_suffix("auditlog.json", compression))
+        with FrameWriter(open(file, "wb"), compression=compression, frame_size=20) as writer:
+            for i in range(0, len(self.lines), 3):
+                writer.write(b"".join(self.lines[i:i + 3]).decode())
+        return file
+
+    def test_get_compression(self):
+        self.assertEqual(get_compression("auditlog.json.gz"), COMPRESSION_GZIP)
+        self.assertEqual(get_compression("auditlog.json.zst"), COMPRESSION_ZSTD)
+        self.assertIsNone(get_compression("auditlog.json"))
+        with self.assertRaises(ValueError):
+            add_compression_suffix("auditlog.json", "bz2")
+
+    def test_iter_decompressed_lines(self):
+        for compression in self.get_compressions():
+            file = self.write_frames(compression)
+            result = list(iter_decompressed_lines(file, compression=compression))
+            self.assertEqual([line for _, line in result], self.lines, compression)
+            # Each write of 3 lines over 20 bytes is a frame.
+            frames = [offset for offset, _ in result if offset is not None]
+            self.assertEqual(len(frames), 10, compression)
+
+            # A range which starts at a frame reads its frames to the end.
+            result = list(iter_decompressed_lines(file, compression=compression, start=frames[2], end=frames[4]))
+            self.assertEqual([line for _, line in result], self.lines[6:12], compression)
+
+    def test_gzip_frames_are_a_gzip_file(self):
+        file = self.write_frames(COMPRESSION_GZIP)
+        with gzip.open(file, "rb") as fp:
+            self.assertEqual(fp.readlines(), self.lines)
+
+    def test_lines_across_frames(self):
+        file = os.path.join(self.tmp_dir.name, "auditlog.json.gz")
+        with open(file, "wb") as fp:
+            fp.write(gzip.compress(b"a\nb"))
+            fp.write(gzip.compress(b"c\nd\n"))
+            fp.write(gzip.compress(b"e\n"))
+        result = list(iter_decompressed_lines(file, compression=COMPRESSION_GZIP))
+        self.assertEqual([line for _, line in result], [b"a\n", b"bc\n", b"d\n", b"e\n"])
+        # The second frame doesn't start at a line.
+        self.assertEqual([offset is not None for offset, _ in result], [True, False, False, True])
@@ -2,6 +2,7 @@
 from __future__ import absolute_import, division, print_function
 
 import os
+import pickle
 import unittest
 
 from bigquery_lineage.utils import (
@@ -76,3 +77,43 @@ class TestConfigFilters(unittest.TestCase):
         ]
         expected = [True, False, True]
         self.assertEqual(result, expected)
+
+    def test_compiled_filters_are_consistent_with_excluded_tables(self):
+        excluded_tables = [
+            ConfigFilters.ExcludedTable(project_regexp="^dummy-project-01$", dataset_regexp="^tmp_"),
+            ConfigFilters.ExcludedTable(table_regexp="^_.*$"),
+            # A regular expression with groups isn't combined with others.
+            ConfigFilters.ExcludedTable(table_regexp=r"^(z)\1_"),
+        ]
+        filters = ConfigFilters(excluded_tables=excluded_tables, excluded_principal_emails=[])
+        target_table_ids = [
+            ("dummy-project-01", "dataset", "table"),
+            ("dummy-project-02", "tmp_dataset", "table"),
+            ("dummy-project-02", "dataset", "_table"),
+            ("dummy-project-02", "dataset", "zz_table"),
+            ("dummy-project-02", "dataset", "z_table"),
+        ]
+        for project, dataset, table in target_table_ids:
+            expected = any(x.match(project=project, dataset=dataset, table=table) for x in excluded_tables)
+            result = filters.is_excluded_table(project=project, dataset=dataset, table=table)
+            self.assertEqual(result, expected)
+
+    def test_compiled_filters_memorize_verdicts(self):
+        filters = ConfigFilters.parse({
+            "excluded_tables": [{"dataset_regexp": "^tmp_"}],
+            "excluded_principal_emails": ["@example\\.com"],
+        })
+        for _ in range(3):
+            self.assertTrue(filters.is_excluded_table(project="p", dataset="tmp_d", table="t"))
+            self.assertTrue(filters.is_excluded_principal_email("tom@example.com"))
+        # pylint: disable=protected-access
+        self.assertEqual(filters.compiled._is_excluded_table_key.cache_info().hits, 2)
+        self.assertEqual(filters.compiled._is_excluded_email.cache_info().hits, 2)
+
+    def test_compiled_filters_can_be_pickled(self):
+        filters = ConfigFilters.parse({"excluded_principal_emails": ["@example\\.com"]})
+        filters.is_excluded_principal_email("tom@example.com")
+        unpickled = pickle.loads(pickle.dumps(filters))
+        self.assertEqual(unpickled, filters)
+        self.assertTrue(unpickled.is_excluded_principal_email("tom@example.com"))
+        self.assertFalse(unpickled.is_excluded_principal_email("tom@example.org"))
@@ -4,10 +4,10 @@ from __future__ import absolute_import, division, print_function
 import json
 import os
 import unittest
-from datetime import datetime
+from datetime import datetime, timezone
 
 from bigquery_lineage.utils import (
-    get_project_root, serialize_json, load_json
+    get_project_root, serialize_json, load_json, parse_timestamp, parse_time_bound
 )
 
 
@@ -29,3 +29,19 @@ class TestUtils(unittest.TestCase):
         result = json.loads(converted)
         self.assertEqual(result["date"], "2020-01-01T00:00:00")
 
+    def test_parse_timestamp(self):
+        expected = datetime(year=2020, month=8, day=1, hour=1, minute=25, second=38, tzinfo=timezone.utc)
+        self.assertEqual(parse_timestamp("2020-08-01T01:25:38+00:00"), expected)
+        self.assertEqual(parse_timestamp("2020-08-01T01:25:38Z"), expected)
+        self.assertEqual(parse_timestamp("2020-08-01 01:25:38"), expected)
+        self.assertEqual(parse_timestamp(expected), expected)
+        self.assertIsNone(parse_timestamp(None))
+
+    def test_parse_time_bound(self):
+        self.assertEqual(parse_time_bound("2020-08-01"), 1596240000.0)
+        self.assertEqual(parse_time_bound("2020-08-01T00:00:00Z"), 1596240000.0)
+        self.assertEqual(parse_time_bound("7d", now=1596240000.0), 1596240000.0 - 7 * 24 * 60 * 60)
+        self.assertEqual(parse_time_bound("12h", now=1596240000.0), 1596240000.0 - 12 * 60 * 60)
+        self.assertIsNone(parse_time_bound(None))
+        with self.assertRaises(ValueError):
+            parse_time_bound("yesterday")